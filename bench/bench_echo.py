@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the echo throughput, in messages per second, of a
+server side websocket receiving many small text messages.
+
+    $ python bench/bench_echo.py
+    $ python bench/bench_echo.py --count 50000 --size 16
+
+Two ways of reading from the connection are compared:
+
+* ``hinted``: one ``recv`` call for each piece the frame parser
+  asks for (header, then payload), which is how ws4py used to read.
+* ``recv_into``: up to ``reading_buffer_size`` bytes are read at
+  once into the connection's preallocated buffer.
+
+Both endpoints run in the same process over a socket pair.
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ws4py.framing import Frame, FrameParser, OPCODE_TEXT, OPCODE_CLOSE
+from ws4py.websocket import EchoWebSocket
+
+class HintedReadsEchoWebSocket(EchoWebSocket):
+    def _recv(self):
+        data = self.sock.recv(self.stream._frames.needed)
+        self._recv_buffer = bytearray(data)
+        self._recv_view = memoryview(self._recv_buffer)
+        return len(data)
+
+MODES = [('hinted', HintedReadsEchoWebSocket), ('recv_into', EchoWebSocket)]
+
+def measure(handler_cls, count, size):
+    server, client = socket.socketpair()
+    ws = handler_cls(server, heartbeat_freq=None)
+    th = threading.Thread(target=ws.run)
+    th.daemon = True
+    th.start()
+
+    payload = b'x' * size
+    frame = Frame(opcode=OPCODE_TEXT, body=payload, fin=1,
+                  masking_key=os.urandom(4)).build()
+    batch = 256
+
+    def write():
+        sent = 0
+        while sent < count:
+            n = min(batch, count - sent)
+            client.sendall(frame * n)
+            sent += n
+
+    start = time.time()
+    writer = threading.Thread(target=write)
+    writer.daemon = True
+    writer.start()
+
+    parser = FrameParser()
+    received = 0
+    while received < count:
+        data = client.recv(65536)
+        if not data:
+            raise RuntimeError("Connection closed after %d messages" % received)
+        parser.feed(data)
+        for record in parser:
+            received += 1
+    elapsed = time.time() - start
+
+    writer.join()
+    client.sendall(Frame(opcode=OPCODE_CLOSE, body=b'\x03\xe8', fin=1,
+                         masking_key=os.urandom(4)).build())
+    th.join(5)
+    client.close()
+    return count / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=20000,
+                        help="number of messages echoed per run")
+    parser.add_argument('--size', type=int, default=32,
+                        help="payload size of each message in bytes")
+    parser.add_argument('--runs', type=int, default=3,
+                        help="runs per mode, the best one is reported")
+    args = parser.parse_args()
+
+    for name, handler_cls in MODES:
+        best = max(measure(handler_cls, args.count, args.size)
+                   for i in range(args.runs))
+        print("%-10s %10.0f msg/s" % (name, best))
+
+if __name__ == '__main__':
+    main()
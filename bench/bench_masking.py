@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the throughput, in MB/s, of each masking backend
+available in :mod:`ws4py.masking` for payloads going from
+16 bytes up to 16 MiB.
+
+    $ python bench/bench_masking.py
+    $ python bench/bench_masking.py --backend wideword --duration 0.5
+
+The legacy byte per byte implementation is very slow on large
+payloads, use ``--max-size`` to keep the run short.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ws4py import masking
+
+SIZES = [16 << (2 * i) for i in range(11)]  # 16 B .. 16 MiB
+
+def measure(func, key, data, duration):
+    iterations = 0
+    start = time.time()
+    elapsed = 0.0
+    while elapsed < duration:
+        func(key, data)
+        iterations += 1
+        elapsed = time.time() - start
+    return (len(data) * iterations) / elapsed / (1024 * 1024)
+
+def human_size(size):
+    for unit in ['B', 'KiB', 'MiB']:
+        if size < 1024:
+            return "%d %s" % (size, unit)
+        size //= 1024
+    return "%d GiB" % size
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backend', action='append',
+                        choices=masking.available_backends(),
+                        help="backend to measure (default: all available)")
+    parser.add_argument('--duration', type=float, default=0.2,
+                        help="seconds spent per backend and size")
+    parser.add_argument('--max-size', type=int, default=SIZES[-1],
+                        help="largest payload size in bytes")
+    args = parser.parse_args()
+
+    backends = args.backend or masking.available_backends()
+    key = os.urandom(4)
+
+    print("%-10s %s" % ("size", " ".join(["%12s" % b for b in backends])))
+    for size in SIZES:
+        if size > args.max_size:
+            break
+        data = os.urandom(size)
+        row = []
+        for name in backends:
+            masking.set_backend(name)
+            row.append("%7.1f MB/s" % measure(masking.mask, key, data, args.duration))
+        print("%-10s %s" % (human_size(size), " ".join(row)))
+
+if __name__ == '__main__':
+    main()
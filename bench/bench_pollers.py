@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the cost of one poll loop iteration, in microseconds,
+of each poller available in :mod:`ws4py.manager` while watching
+many idle connections and a smaller number of active ones.
+
+    $ python bench/bench_pollers.py
+    $ python bench/bench_pollers.py --idle 10000 --active 1000 --poller poll
+
+Each connection is a socket pair so twice as many file
+descriptors as connections are opened, the soft limit is raised
+up to the hard one when needed. An iteration polls once, with
+every active connection readable, and reads what they received.
+Registering all the connections is timed as well.
+
+The select poller is skipped once file descriptors go
+past ``FD_SETSIZE``.
+"""
+import argparse
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ws4py import manager
+
+FD_SETSIZE = 1024
+
+def available_pollers():
+    pollers = [('select', manager.SelectPoller)]
+    if hasattr(manager.select, 'poll'):
+        pollers.append(('poll', manager.PollPoller))
+    if hasattr(manager.select, 'epoll'):
+        pollers.append(('epoll', manager.EPollPoller))
+    if hasattr(manager.select, 'kqueue'):
+        pollers.append(('kqueue', manager.KQueuePoller))
+    if manager.selectors is not None:
+        pollers.append(('selectors', manager.SelectorsPoller))
+    return pollers
+
+def raise_fd_limit(needed):
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY or soft >= needed:
+        return
+    if hard != resource.RLIM_INFINITY and hard < needed:
+        sys.exit("%d file descriptors are needed but only %d are allowed" % (needed, hard))
+    resource.setrlimit(resource.RLIMIT_NOFILE, (needed, hard))
+
+def measure(poller_class, idle, active, iterations):
+    pairs = [socket.socketpair() for i in range(idle + active)]
+    try:
+        if pairs[-1][1].fileno() >= FD_SETSIZE and poller_class is manager.SelectPoller:
+            return None
+
+        for a, b in pairs:
+            a.setblocking(False)
+        active_pairs = pairs[-active:] if active else []
+
+        poller = poller_class(timeout=1.0)
+        try:
+            start = time.time()
+            for a, b in pairs:
+                poller.register(a.fileno())
+            registering = time.time() - start
+
+            by_fd = dict((a.fileno(), a) for a, b in active_pairs)
+            elapsed = 0.0
+            for i in range(iterations):
+                for a, b in active_pairs:
+                    b.send(b'x')
+
+                start = time.time()
+                for fd, events in poller.poll_events():
+                    by_fd[fd].recv(64)
+                elapsed += time.time() - start
+        finally:
+            poller.release()
+    finally:
+        for a, b in pairs:
+            a.close()
+            b.close()
+
+    return registering / len(pairs), elapsed / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--poller', action='append',
+                        choices=[name for name, cls in available_pollers()],
+                        help="poller to measure (default: all available)")
+    parser.add_argument('--idle', type=int, default=10000,
+                        help="number of idle connections")
+    parser.add_argument('--active', type=int, default=1000,
+                        help="number of connections readable on every iteration")
+    parser.add_argument('--iterations', type=int, default=200,
+                        help="poll loop iterations per poller")
+    args = parser.parse_args()
+
+    raise_fd_limit(2 * (args.idle + args.active) + 64)
+
+    print("%d idle and %d active connections" % (args.idle, args.active))
+    print("%-10s %16s %16s" % ("poller", "register (us)", "iteration (us)"))
+    for name, poller_class in available_pollers():
+        if args.poller and name not in args.poller:
+            continue
+        result = measure(poller_class, args.idle, args.active, args.iterations)
+        if result is None:
+            print("%-10s %16s %16s" % (name, "n/a", "n/a"))
+            continue
+        registering, iteration = result
+        print("%-10s %16.2f %16.1f" % (name, registering * 1e6, iteration * 1e6))
+
+if __name__ == '__main__':
+    main()
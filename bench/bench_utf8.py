@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Measures the throughput, in MiB per second, of the UTF-8
+validation of text messages received as several fragments.
+
+    $ python bench/bench_utf8.py
+    $ python bench/bench_utf8.py --size 4 --fragment 16384 --corpus multilingual
+
+Two ways of validating are compared:
+
+* ``dfa``: the byte by byte DFA which ws4py used to run on
+  every text frame.
+* ``fast``: what :meth:`ws4py.utf8validator.Utf8Validator.validate`
+  does, an ASCII check then the incremental decoder of
+  :mod:`codecs`, the DFA only locating errors. On Python 2, it
+  is the DFA.
+
+The ``invalid`` corpus is the multilingual one with an invalid
+byte in its last fragment so that every fragment is validated.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ws4py.utf8validator import Utf8Validator
+
+ASCII = u'The quick brown fox jumps over the lazy dog. '
+MULTILINGUAL = u'Fran\xe7ais Ελληνικά ' \
+               u'Русский 中文 ' \
+               u'日本語 \U0001f600 '
+
+MODES = [('dfa', Utf8Validator.validate_dfa), ('fast', Utf8Validator.validate)]
+
+def corpus(name, size):
+    text = ASCII if name == 'ascii' else MULTILINGUAL
+    data = text.encode('utf-8')
+    data = bytearray(data * (size // len(data) + 1))[:size]
+    # don't end in the middle of a character
+    while data[-1] & 0xc0 == 0x80:
+        data.pop()
+    if data[-1] & 0x80:
+        data.pop()
+    if name == 'invalid':
+        data[-2] = 0xff
+    return data
+
+def measure(validate, data, fragment, repeat):
+    chunks = [data[i:i + fragment] for i in range(0, len(data), fragment)]
+    v = Utf8Validator()
+    start = time.time()
+    for i in range(repeat):
+        v.reset()
+        for chunk in chunks:
+            if not validate(v, chunk)[0]:
+                break
+    elapsed = time.time() - start
+    return len(data) * repeat / elapsed / (1 << 20)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', action='append', choices=['ascii', 'multilingual', 'invalid'],
+                        help="corpus to validate (default: all)")
+    parser.add_argument('--size', type=int, default=1,
+                        help="size of each message in MiB")
+    parser.add_argument('--fragment', type=int, default=65536,
+                        help="size of each fragment in bytes")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="times each message is validated")
+    args = parser.parse_args()
+
+    print("%d MiB messages in fragments of %d bytes" % (args.size, args.fragment))
+    print("%-14s %12s %12s" % ("corpus", "dfa (MiB/s)", "fast (MiB/s)"))
+    for name in ['ascii', 'multilingual', 'invalid']:
+        if args.corpus and name not in args.corpus:
+            continue
+        data = corpus(name, args.size << 20)
+        results = [measure(validate, data, args.fragment, args.repeat)
+                   for mode, validate in MODES]
+        print("%-14s %12.1f %12.1f" % tuple([name] + results))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+try:
+    from unittest.mock import MagicMock
+except ImportError:
+    from mock import MagicMock
+
+from ws4py.backplane import UnixSocketBackplane
+from ws4py.messaging import PreparedMessage
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while not predicate() and time.time() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+@unittest.skipUnless(hasattr(socket, 'AF_UNIX'), "Unix domain sockets are required")
+class UnixSocketBackplaneTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.backplanes = []
+
+    def tearDown(self):
+        for backplane in self.backplanes:
+            backplane.close()
+        shutil.rmtree(self.directory)
+
+    def attach(self, name, **kwargs):
+        backplane = UnixSocketBackplane(self.directory, name=name, **kwargs)
+        manager = MagicMock()
+        backplane.attach(manager)
+        self.backplanes.append(backplane)
+        self.assertIs(manager.backplane, backplane)
+        return backplane, manager
+
+    def test_messages_reach_the_other_processes_once(self):
+        a, manager_a = self.attach('a')
+        b, manager_b = self.attach('b')
+        c, manager_c = self.attach('c')
+
+        big = os.urandom(200000)
+        a.publish(PreparedMessage(u'hello'))
+        a.publish(PreparedMessage(big, binary=True))
+
+        for manager in (manager_b, manager_c):
+            self.assertTrue(wait_for(lambda: manager.fanout.call_count == 2))
+            first, second = [args[0][0] for args in manager.fanout.call_args_list]
+            self.assertIsInstance(first, PreparedMessage)
+            self.assertEqual(first.message.data, b'hello')
+            self.assertFalse(first.message.is_binary)
+            self.assertEqual(second.message.data, big)
+            self.assertTrue(second.message.is_binary)
+            self.assertEqual(b''.join(second.parts),
+                             b''.join(PreparedMessage(big, binary=True).parts))
+        self.assertFalse(manager_a.fanout.called)
+
+    def test_stale_sockets_are_removed(self):
+        a, manager_a = self.attach('a')
+        stale = os.path.join(self.directory, 'dead.sock')
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.bind(stale)
+        s.close()
+
+        a.publish(PreparedMessage(u'hello'))
+        self.assertFalse(os.path.exists(stale))
+
+    def test_closed_backplane_removes_its_socket(self):
+        a, manager_a = self.attach('a')
+        b, manager_b = self.attach('b')
+        self.assertTrue(os.path.exists(b.path))
+
+        b.close()
+        self.assertFalse(os.path.exists(b.path))
+        self.assertIsNone(b.manager)
+        a.publish(PreparedMessage(u'hello'))
+        b.publish(PreparedMessage(u'hello'))
+        time.sleep(0.1)
+        self.assertFalse(manager_a.fanout.called)
+        self.assertFalse(manager_b.fanout.called)
+
+    def test_invalid_frames_only_drop_their_connection(self):
+        a, manager_a = self.attach('a')
+        b, manager_b = self.attach('b')
+
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(2)
+        s.connect(b.path)
+        # reserved opcode
+        s.sendall(b'\x83\x00')
+        self.assertTrue(wait_for(lambda: s.recv(1) == b''))
+        s.close()
+
+        self.assertTrue(b._thread.is_alive())
+        a.publish(PreparedMessage(u'hello'))
+        self.assertTrue(wait_for(lambda: manager_b.fanout.call_count == 1))
+
+    def test_stuck_peers_do_not_block_publishing(self):
+        a, manager_a = self.attach('a', max_queued=1 << 20)
+        b, manager_b = self.attach('b')
+
+        # a process which never reads
+        stuck = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stuck.bind(os.path.join(self.directory, 'stuck.sock'))
+        stuck.listen(1)
+        try:
+            big = os.urandom(1 << 18)
+            started = time.time()
+            for _ in range(8):
+                a.publish(PreparedMessage(big, binary=True))
+                for peer in a._peers.values():
+                    self.assertLessEqual(peer.size, 1 << 20)
+            self.assertLess(time.time() - started, 1.0)
+
+            a.publish(PreparedMessage(u'done'))
+            self.assertTrue(wait_for(lambda: manager_b.fanout.called and
+                                     manager_b.fanout.call_args[0][0].message.data == b'done'))
+        finally:
+            stuck.close()
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite()
+    loader = unittest.TestLoader()
+    for testcase in [UnixSocketBackplaneTest]:
+        tests = loader.loadTestsFromTestCase(testcase)
+        suite.addTests(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -11,6 +11,7 @@ except ImportError:
 
 from ws4py import WS_KEY
 from ws4py.exc import HandshakeError
+from ws4py.extensions import PerMessageDeflate
 from ws4py.framing import Frame, OPCODE_TEXT, OPCODE_CLOSE
 from ws4py.client import WebSocketBaseClient
 from ws4py.client.threadedclient import WebSocketClient
@@ -153,6 +154,53 @@ class BasicClientTest(unittest.TestCase):
         f.parser.close()
         self.assertIn(b'boom', f.unmask(f.body))
 
+    @patch('ws4py.client.socket')
+    def test_permessage_deflate(self, sock):
+
+        s = MagicMock()
+        sock.socket.return_value = s
+        sock.getaddrinfo.return_value = [(socket.AF_INET, socket.SOCK_STREAM, 0, "",
+                                          ("127.0.0.1", 80, 0, 0))]
+
+        c = WebSocketBaseClient(url="ws://127.0.0.1/", extensions=['permessage-deflate'])
+        self.assertIn(('Sec-WebSocket-Extensions', 'permessage-deflate; client_max_window_bits'),
+                      c.handshake_headers)
+
+        s.recv.return_value = b"\r\n".join([
+            b"HTTP/1.1 101 Switching Protocols",
+            b"Connection: Upgrade",
+            b"Sec-Websocket-Accept: " + b64encode(sha1(c.key + WS_KEY).digest()),
+            b"Sec-WebSocket-Extensions: permessage-deflate; server_no_context_takeover",
+            b"Upgrade: websocket",
+            b"\r\n"
+        ])
+
+        c.connect()
+        self.assertIsInstance(c.extensions[0], PerMessageDeflate)
+        self.assertIs(c.stream.deflate, c.extensions[0])
+        self.assertFalse(c.stream.deflate.is_server)
+        self.assertTrue(c.stream.deflate.server_no_context_takeover)
+
+    @patch('ws4py.client.socket')
+    def test_unexpected_extension(self, sock):
+
+        s = MagicMock()
+        sock.socket.return_value = s
+        sock.getaddrinfo.return_value = [(socket.AF_INET, socket.SOCK_STREAM, 0, "",
+                                          ("127.0.0.1", 80, 0, 0))]
+
+        c = WebSocketBaseClient(url="ws://127.0.0.1/")
+        s.recv.return_value = b"\r\n".join([
+            b"HTTP/1.1 101 Switching Protocols",
+            b"Connection: Upgrade",
+            b"Sec-Websocket-Accept: " + b64encode(sha1(c.key + WS_KEY).digest()),
+            b"Sec-WebSocket-Extensions: permessage-deflate",
+            b"Upgrade: websocket",
+            b"\r\n"
+        ])
+
+        self.assertRaises(HandshakeError, c.connect)
+
     @patch('ws4py.client.socket')
     def test_empty_response(self, sock):
 
@@ -237,7 +285,14 @@ class ThreadedClientTest(unittest.TestCase):
 
         self.client = WebSocketClient(url="ws://127.0.0.1/")
 
-    def _exchange1(self, *args, **kwargs):
+    def _recv_into(self, chunks):
+        def recv_into(view):
+            chunk = next(chunks)
+            view[:len(chunk)] = chunk
+            return len(chunk)
+        return recv_into
+
+    def _handshake(self, *args, **kwargs):
         yield b"\r\n".join([
             b"HTTP/1.1 101 Switching Protocols",
             b"Connection: Upgrade",
@@ -250,6 +305,7 @@ class ThreadedClientTest(unittest.TestCase):
             b"\r\n"
         ])
 
+    def _exchange1(self, *args, **kwargs):
         for i in range(100):
             time.sleep(0.1)
             yield Frame(opcode=OPCODE_TEXT, body=b'hello',
@@ -260,14 +316,15 @@ class ThreadedClientTest(unittest.TestCase):
                     fin=1).build()
 
     def test_thread_is_started_once_connected(self):
-        self.sock.recv.side_effect = self._exchange1()
+        self.sock.recv.side_effect = self._handshake()
+        self.sock.recv_into.side_effect = self._recv_into(self._exchange1())
         self.assertFalse(self.client._th.is_alive())
 
         self.client.connect()
         time.sleep(0.5)
         self.assertTrue(self.client._th.is_alive())
 
-        self.sock.recv.side_effect = self._exchange2()
+        self.sock.recv_into.side_effect = self._recv_into(self._exchange2())
         time.sleep(0.5)
         self.assertFalse(self.client._th.is_alive())
 
@@ -277,14 +334,15 @@ class ThreadedClientTest(unittest.TestCase):
         self.sock.pending = lambda: False
         self.client._is_secure = True
 
-        self.sock.recv.side_effect = self._exchange1()
+        self.sock.recv.side_effect = self._handshake()
+        self.sock.recv_into.side_effect = self._recv_into(self._exchange1())
         self.assertFalse(self.client._th.is_alive())
 
         self.client.connect()
         time.sleep(0.5)
         self.assertTrue(self.client._th.is_alive())
 
-        self.sock.recv.side_effect = self._exchange2()
+        self.sock.recv_into.side_effect = self._recv_into(self._exchange2())
         time.sleep(0.5)
         self.assertFalse(self.client._th.is_alive())
 
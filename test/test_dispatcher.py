@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+import unittest
+
+try:
+    from unittest.mock import MagicMock
+except ImportError:
+    from mock import MagicMock
+
+from ws4py.dispatcher import Dispatcher
+
+class DispatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.dispatcher = Dispatcher(max_workers=4)
+
+    def tearDown(self):
+        self.dispatcher.shutdown()
+
+    def test_callbacks_keep_their_order_per_websocket(self):
+        websockets = [MagicMock(), MagicMock(), MagicMock()]
+        received = dict((ws, []) for ws in websockets)
+
+        def handle(ws, i):
+            time.sleep(0.001 * (i % 3))
+            received[ws].append(i)
+
+        for i in range(30):
+            for ws in websockets:
+                self.dispatcher.submit(ws, handle, ws, i)
+        self.dispatcher.shutdown()
+
+        for ws in websockets:
+            self.assertEqual(received[ws], list(range(30)))
+        self.assertEqual(len(self.dispatcher), 0)
+        self.assertEqual(self.dispatcher.pending(websockets[0]), 0)
+
+    def test_slow_websocket_does_not_hold_up_others(self):
+        slow, fast = MagicMock(), MagicMock()
+        blocked = threading.Event()
+        done = threading.Event()
+
+        self.dispatcher.submit(slow, blocked.wait, 5)
+        self.dispatcher.submit(slow, lambda: None)
+        self.dispatcher.submit(fast, done.set)
+
+        self.assertTrue(done.wait(1))
+        self.assertEqual(self.dispatcher.pending(slow), 1)
+        blocked.set()
+
+    def test_failing_callback_closes_its_websocket(self):
+        ws = MagicMock()
+        called = threading.Event()
+
+        def fail():
+            raise RuntimeError()
+        self.dispatcher.submit(ws, fail)
+        self.dispatcher.submit(ws, called.set)
+
+        self.assertTrue(called.wait(1))
+        ws.close.assert_called_once_with(code=1011, reason='Internal error')
+
+    def test_callbacks_are_dropped_once_shutdown(self):
+        self.dispatcher.shutdown()
+        callback = MagicMock()
+        self.dispatcher.submit(MagicMock(), callback)
+        self.assertFalse(callback.called)
+        self.assertEqual(len(self.dispatcher), 0)
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite()
+    loader = unittest.TestLoader()
+    for testcase in [DispatcherTest]:
+        tests = loader.loadTestsFromTestCase(testcase)
+        suite.addTests(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
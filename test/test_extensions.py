@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+try:
+    from unittest.mock import patch
+except ImportError:
+    from mock import patch
+
+from ws4py.exc import HandshakeError
+from ws4py.extensions import PerMessageDeflate, parse_extension, \
+     negotiate_extensions
+from ws4py.framing import Frame, OPCODE_TEXT, OPCODE_BINARY, \
+     OPCODE_CONTINUATION, OPCODE_PING
+from ws4py.streaming import Stream, MessageReceived, StreamError
+from ws4py.messaging import Message, TextMessage, BinaryMessage
+from ws4py.compat import ord
+
+def negotiate(server=None, client=None):
+    server = server or PerMessageDeflate()
+    client = client or PerMessageDeflate()
+    accepted = negotiate_extensions(client.offer(), [server])
+    name, params = parse_extension(str(accepted[0]))
+    return accepted[0], client.accept_response(params)
+
+class WSExtensionNegotiationTest(unittest.TestCase):
+    def test_parse_extension(self):
+        self.assertEqual(parse_extension('permessage-deflate'),
+                         ('permessage-deflate', []))
+        self.assertEqual(parse_extension(' permessage-deflate; client_max_window_bits;'
+                                         ' server_max_window_bits="10" '),
+                         ('permessage-deflate', [('client_max_window_bits', None),
+                                                 ('server_max_window_bits', '10')]))
+
+    def test_negotiate_by_name(self):
+        accepted = negotiate_extensions('permessage-deflate; client_max_window_bits, ext1',
+                                        ['ext1', 'permessage-deflate'])
+        self.assertEqual(len(accepted), 2)
+        self.assertIsInstance(accepted[0], PerMessageDeflate)
+        self.assertTrue(accepted[0].is_server)
+        self.assertEqual(str(accepted[0]), 'permessage-deflate')
+        self.assertEqual(accepted[1], 'ext1')
+
+    def test_unsupported_extensions_are_ignored(self):
+        self.assertEqual(negotiate_extensions('permessage-deflate, ext1', ['ext2']), [])
+        self.assertEqual(negotiate_extensions(None, ['permessage-deflate']), [])
+
+    def test_first_acceptable_offer_is_used(self):
+        accepted = negotiate_extensions('permessage-deflate; server_max_window_bits=8,'
+                                        'permessage-deflate; server_max_window_bits=10,'
+                                        'permessage-deflate',
+                                        ['permessage-deflate'])
+        self.assertEqual(len(accepted), 1)
+        self.assertEqual(str(accepted[0]), 'permessage-deflate; server_max_window_bits=10')
+
+    def test_invalid_offers_are_declined(self):
+        ext = PerMessageDeflate()
+        for params in [[('unknown', None)],
+                       [('server_no_context_takeover', '1')],
+                       [('server_max_window_bits', None)],
+                       [('server_max_window_bits', '16')],
+                       [('client_max_window_bits', '7')],
+                       [('client_no_context_takeover', None),
+                        ('client_no_context_takeover', None)]]:
+            self.assertIsNone(ext.accept(params))
+
+    def test_server_parameters(self):
+        server = PerMessageDeflate(client_no_context_takeover=True,
+                                   server_max_window_bits=12,
+                                   client_max_window_bits=10)
+        client = PerMessageDeflate(server_no_context_takeover=True)
+        server_ext, client_ext = negotiate(server, client)
+        self.assertEqual(str(server_ext), 'permessage-deflate; server_no_context_takeover;'
+                         ' client_no_context_takeover; server_max_window_bits=12;'
+                         ' client_max_window_bits=10')
+        self.assertFalse(client_ext.is_server)
+        self.assertTrue(client_ext.server_no_context_takeover)
+        self.assertTrue(client_ext.client_no_context_takeover)
+        self.assertEqual(client_ext.server_max_window_bits, 12)
+        self.assertEqual(client_ext.client_max_window_bits, 10)
+
+    def test_client_rejects_invalid_responses(self):
+        client = PerMessageDeflate(server_no_context_takeover=True,
+                                   server_max_window_bits=10)
+        for params in [[],
+                       [('server_no_context_takeover', None), ('unknown', None)],
+                       [('server_no_context_takeover', None), ('server_max_window_bits', '12')],
+                       [('server_no_context_takeover', None), ('client_max_window_bits', '8')]]:
+            self.assertRaises(HandshakeError, client.accept_response, params)
+
+    def test_invalid_window_bits(self):
+        self.assertRaises(ValueError, PerMessageDeflate, server_max_window_bits=8)
+        self.assertRaises(ValueError, PerMessageDeflate, client_max_window_bits=16)
+
+class WSPerMessageDeflateTest(unittest.TestCase):
+    def test_compressed_message_roundtrip(self):
+        server, client = negotiate()
+        data = b'{"hello": "world"}' * 100
+
+        s = Stream(expect_masking=True)
+        s.deflate = server
+        for i in range(3):
+            f = TextMessage(data).single(mask=True, deflate=client)
+            self.assertTrue(len(f) < len(data) / 10)
+            events = s.feed(f)
+            self.assertEqual(len(events), 1)
+            self.assertIsInstance(events[0], MessageReceived)
+            self.assertEqual(events[0].message.data, data)
+
+    def test_no_context_takeover(self):
+        server, client = negotiate(client=PerMessageDeflate(client_no_context_takeover=True))
+        data = os.urandom(256)
+
+        first = BinaryMessage(data).single(deflate=client)
+        second = BinaryMessage(data).single(deflate=client)
+        self.assertEqual(first, second)
+
+        server, client = negotiate()
+        first = BinaryMessage(data).single(deflate=client)
+        second = BinaryMessage(data).single(deflate=client)
+        self.assertTrue(len(second) < len(first))
+
+    def test_compressed_fragments(self):
+        server, client = negotiate()
+        s = Stream(expect_masking=False)
+        s.deflate = client
+
+        m = TextMessage(u'\xe9t\xe9 '.encode('utf-8') * 50)
+        frames = [m.fragment(first=True, deflate=server),
+                  m.fragment(deflate=server),
+                  m.fragment(last=True, deflate=server)]
+        self.assertTrue(ord(frames[0][0]) & 0x40)
+        self.assertFalse(ord(frames[1][0]) & 0x40)
+        self.assertEqual(s.feed(b''.join(frames[:2])), [])
+        events = s.feed(frames[2])
+        self.assertEqual(events[0].message.data, m.data * 3)
+
+    def test_uncompressed_messages_are_accepted(self):
+        server, client = negotiate()
+        s = Stream(expect_masking=False)
+        s.deflate = client
+        events = s.feed(TextMessage(b'hello').single())
+        self.assertEqual(events[0].message.data, b'hello')
+
+    def test_rsv1_requires_negotiation(self):
+        server, client = negotiate()
+        f = TextMessage(b'hello').single(deflate=server)
+        events = Stream(expect_masking=False).feed(f)
+        self.assertIsInstance(events[0], StreamError)
+        self.assertEqual(events[0].message.code, 1002)
+
+    def test_rsv1_on_control_or_continuation_frames(self):
+        for opcode, fin in [(OPCODE_PING, 1), (OPCODE_CONTINUATION, 1)]:
+            s = Stream(expect_masking=False)
+            s.deflate = negotiate()[1]
+            if opcode == OPCODE_CONTINUATION:
+                s.feed(Frame(opcode=OPCODE_BINARY, body=b'a', fin=0).build())
+            events = s.feed(Frame(opcode=opcode, body=b'', fin=fin, rsv1=1).build())
+            self.assertIsInstance(events[0], StreamError)
+            self.assertEqual(events[0].message.code, 1002)
+
+    def test_max_message_size_once_inflated(self):
+        server, client = negotiate()
+        s = Stream(expect_masking=False)
+        s.deflate = client
+        s.max_message_size = 4096
+
+        f = BinaryMessage(b'\x00' * 4096).single(deflate=server)
+        events = s.feed(f)
+        self.assertEqual(events[0].message.data, b'\x00' * 4096)
+
+        f = BinaryMessage(b'\x00' * (1 << 20)).single(deflate=server)
+        self.assertTrue(len(f) < 4096)
+        events = s.feed(f)
+        self.assertIsInstance(events[0], StreamError)
+        self.assertEqual(events[0].message.code, 1009)
+
+    def test_large_compressed_frame_is_inflated_into_the_spool(self):
+        server, client = negotiate()
+        s = Stream(expect_masking=False)
+        s.deflate = client
+        s.spool_threshold = 1024
+
+        data = b'\x00' * (1 << 22)
+        f = BinaryMessage(data).single(deflate=server)
+        written = []
+        extend = Message.extend
+        def recording_extend(m, chunk):
+            written.append(len(chunk))
+            extend(m, chunk)
+
+        with patch.object(Message, 'extend', recording_extend):
+            events = []
+            for offset in range(0, len(f), 2048):
+                events.extend(s.feed(f[offset:offset + 2048]))
+
+        self.assertEqual(len(events), 1)
+        m = events[0].message
+        self.assertTrue(m.spooled)
+        self.assertEqual(sum(written), len(data))
+        self.assertTrue(max(written) <= 65536)
+        self.assertEqual(m.data.read(), data)
+        m.data = None
+
+        s.max_message_size = 1 << 20
+        events = s.feed(BinaryMessage(data).single(deflate=server))
+        self.assertIsInstance(events[0], StreamError)
+        self.assertEqual(events[0].message.code, 1009)
+
+    def test_invalid_compressed_data(self):
+        s = Stream(expect_masking=False)
+        s.deflate = negotiate()[1]
+        events = s.feed(Frame(opcode=OPCODE_TEXT, body=b'\xff\xff\xff', fin=1, rsv1=1).build())
+        self.assertIsInstance(events[0], StreamError)
+        self.assertEqual(events[0].message.code, 1007)
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite()
+    loader = unittest.TestLoader()
+    for testcase in [WSExtensionNegotiationTest, WSPerMessageDeflateTest]:
+        tests = loader.loadTestsFromTestCase(testcase)
+        suite.addTests(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -5,10 +5,11 @@ import types
 import random
 from struct import pack, unpack
 
-from ws4py.framing import Frame, \
+from ws4py.framing import Frame, FrameParser, FrameChunk, \
      OPCODE_CONTINUATION, OPCODE_TEXT, \
      OPCODE_BINARY, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG
-from ws4py.exc import FrameTooLargeException, ProtocolException
+from ws4py.exc import FrameTooLargeException, MessageTooLargeException, \
+     ProtocolException
 from ws4py.compat import *
 
 def map_on_bytes(f, bytes):
@@ -89,6 +90,20 @@ class WSFrameBuilderTest(unittest.TestCase):
         else: spec_says = '\x81\x857\xfa!=\x7f\x9fMQX'
         self.assertEqual(f.build(), spec_says)
 
+    def test_build_parts(self):
+        body = b'Hello'
+        f = Frame(opcode=OPCODE_TEXT, body=body, fin=1)
+        header, payload = f.build_parts()
+        self.assertEqual(header, b'\x81\x05')
+        self.assertIs(payload, body)
+
+        if py3k: mask = b"7\xfa!="
+        else: mask = "7\xfa!="
+        f = Frame(opcode=OPCODE_TEXT, body=body, masking_key=mask, fin=1)
+        header, payload = f.build_parts()
+        self.assertEqual(header + payload, f.build())
+        self.assertEqual(header, b'\x81\x857\xfa!=')
+
     def test_frame_too_large(self):
         f = Frame(opcode=OPCODE_TEXT, body=b'', fin=1)
         # fake huge length
@@ -298,10 +313,160 @@ class WSFrameParserTest(unittest.TestCase):
         f.parser.send(bytes[10:])
         self.assertEqual(f.body, body)
 
+class WSBufferedFrameParserTest(unittest.TestCase):
+    def test_frames_are_parsed_from_a_single_buffer(self):
+        mask = os.urandom(4)
+        data = Frame(opcode=OPCODE_TEXT, body=b'hello', fin=0, masking_key=mask).build() + \
+               Frame(opcode=OPCODE_PING, body=b'ping', fin=1, masking_key=mask).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=b' there', fin=1, masking_key=mask).build()
+        p = FrameParser()
+        p.feed(data)
+        frames = list(p)
+        self.assertEqual([f.opcode for f in frames],
+                         [OPCODE_TEXT, OPCODE_PING, OPCODE_CONTINUATION])
+        self.assertEqual([f.fin for f in frames], [0, 1, 1])
+        self.assertEqual([f.masking_key for f in frames], [mask] * 3)
+        for frame, body in zip(frames, [b'hello', b'ping', b' there']):
+            self.assertIsInstance(frame.payload, memoryview)
+            self.assertEqual(bytes(Frame(masking_key=mask).unmask(frame.payload)), body)
+        self.assertEqual(p.buffered, 0)
+        self.assertEqual(p.needed, 2)
+
+    def test_frame_fed_byte_by_byte(self):
+        body = os.urandom(300)
+        data = Frame(opcode=OPCODE_BINARY, body=body, fin=1).build()
+        # 2 bytes for the header, 2 more for the 16-bit length
+        expected_needed = [1, 2, 1] + list(range(len(data) - 4, 0, -1))
+        p = FrameParser()
+        for index in range(len(data) - 1):
+            p.feed(data[index:index+1])
+            self.assertTrue(p.next_frame() is None)
+            self.assertEqual(p.needed, expected_needed[index])
+        p.feed(data[-1:])
+        frame = p.next_frame()
+        self.assertEqual(frame.payload.tobytes(), body)
+        self.assertTrue(frame.masking_key is None)
+
+    def test_needed_bytes(self):
+        body = b'*' * 65536
+        data = Frame(opcode=OPCODE_BINARY, body=body, fin=1, masking_key=os.urandom(4)).build()
+        p = FrameParser()
+        self.assertEqual(p.needed, 2)
+        p.feed(data[:2])
+        self.assertTrue(p.next_frame() is None)
+        self.assertEqual(p.needed, 12)
+        p.feed(data[2:14])
+        self.assertTrue(p.next_frame() is None)
+        self.assertEqual(p.needed, 65536)
+        p.feed(data[14:])
+        self.assertEqual(len(p.next_frame().payload), 65536)
+
+    def test_16_and_63_bit_lengths(self):
+        for size in [126, 65535, 65536, 70000]:
+            body = os.urandom(size)
+            p = FrameParser()
+            p.feed(Frame(opcode=OPCODE_BINARY, body=body, fin=1).build())
+            self.assertEqual(p.next_frame().payload.tobytes(), body)
+
+    def test_payload_views_survive_more_bytes(self):
+        first = Frame(opcode=OPCODE_BINARY, body=b'first', fin=1).build()
+        second = Frame(opcode=OPCODE_BINARY, body=b'second', fin=1).build()
+        p = FrameParser()
+        p.feed(first + second[:3])
+        frame = p.next_frame()
+        self.assertTrue(p.next_frame() is None)
+        p.feed(second[3:])
+        self.assertEqual(p.next_frame().payload.tobytes(), b'second')
+        self.assertEqual(frame.payload.tobytes(), b'first')
+
+    def test_invalid_headers(self):
+        for first_byte in [0xc1, 0xa1, 0x91, 0x83, 0x8b, 0x09]:
+            p = FrameParser()
+            p.feed(pack('!BB', first_byte, 0))
+            self.assertRaises(ProtocolException, p.next_frame)
+
+        p = FrameParser()
+        p.feed(pack('!BB', 0x89, 126))
+        self.assertRaises(FrameTooLargeException, p.next_frame)
+
+        p = FrameParser()
+        p.feed(pack('!BBQ', 0x82, 127, 1 << 63))
+        self.assertRaises(FrameTooLargeException, p.next_frame)
+
+    def test_allowed_rsv(self):
+        p = FrameParser(allowed_rsv=0x4)
+        p.feed(pack('!BB', 0xc1, 0))
+        self.assertEqual(p.next_frame().rsv, 0x4)
+
+        p.feed(pack('!BB', 0xa1, 0))
+        self.assertRaises(ProtocolException, p.next_frame)
+
+    def test_max_frame_size(self):
+        p = FrameParser(max_frame_size=1024)
+        p.feed(Frame(opcode=OPCODE_BINARY, body=b'*' * 1024, fin=1).build())
+        self.assertEqual(len(p.next_frame().payload), 1024)
+
+        # rejected from the header only
+        p.feed(pack('!BBQ', 0x82, 127, 1 << 32))
+        self.assertRaises(MessageTooLargeException, p.next_frame)
+
+    def test_max_message_size(self):
+        p = FrameParser(max_message_size=10)
+        p.feed(Frame(opcode=OPCODE_TEXT, body=b'hello', fin=0).build() +
+               Frame(opcode=OPCODE_PING, body=b'ping me', fin=1).build() +
+               Frame(opcode=OPCODE_CONTINUATION, body=b'there', fin=1).build() +
+               Frame(opcode=OPCODE_BINARY, body=b'0123456789', fin=1).build() +
+               Frame(opcode=OPCODE_BINARY, body=b'0123456', fin=0).build())
+        self.assertEqual(len(list(p)), 5)
+
+        p.feed(pack('!BB', 0x80, 4))
+        self.assertRaises(MessageTooLargeException, p.next_frame)
+
+    def test_reset(self):
+        p = FrameParser()
+        p.feed(b'\x81\x05hel')
+        self.assertTrue(p.next_frame() is None)
+        p.reset()
+        self.assertEqual(p.buffered, 0)
+        self.assertEqual(p.needed, 2)
+
+    def test_large_binary_frames_are_chunked(self):
+        key = os.urandom(4)
+        body = os.urandom(5000)
+        data = Frame(opcode=OPCODE_BINARY, body=body, fin=0, masking_key=key).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=body, fin=1).build() + \
+               Frame(opcode=OPCODE_TEXT, body=b'x' * 5000, fin=1).build()
+        p = FrameParser()
+        p.chunk_threshold = 4096
+
+        chunks = []
+        for offset in range(0, len(data), 1500):
+            p.feed(data[offset:offset + 1500])
+            for frame in p:
+                if isinstance(frame, FrameChunk):
+                    chunks.append((frame.opcode, frame.fin, frame.offset, frame.last,
+                                   frame.payload.tobytes(), frame.masking_key))
+                else:
+                    self.assertEqual(frame.opcode, OPCODE_TEXT)
+                    self.assertEqual(len(frame.payload), 5000)
+
+        first = [c for c in chunks if c[0] == OPCODE_BINARY]
+        self.assertEqual(first[0][2], 0)
+        self.assertEqual([c[3] for c in first], [False] * (len(first) - 1) + [True])
+        self.assertEqual(sum(len(c[4]) for c in first), 5000)
+        self.assertTrue(all(c[5] == key for c in first))
+        unmasked = b''.join(bytes(Frame(masking_key=key[c[2] % 4:] + key[:c[2] % 4]).unmask(c[4]))
+                            for c in first)
+        self.assertEqual(unmasked, body)
+
+        second = [c for c in chunks if c[0] == OPCODE_CONTINUATION]
+        self.assertTrue(all(c[1] == 1 for c in second))
+        self.assertEqual(b''.join(c[4] for c in second), body)
+
 if __name__ == '__main__':
     suite = unittest.TestSuite()
     loader = unittest.TestLoader()
-    for testcase in (WSFrameBuilderTest, WSFrameParserTest,):
+    for testcase in (WSFrameBuilderTest, WSFrameParserTest, WSBufferedFrameParserTest,):
         tests = loader.loadTestsFromTestCase(testcase)
         suite.addTests(tests)
     unittest.TextTestRunner(verbosity=2).run(suite)
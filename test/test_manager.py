@@ -1,4 +1,9 @@
 # -*- coding: utf-8 -*-
+import errno
+import os
+import select
+import socket
+import threading
 import time
 import itertools
 import unittest
@@ -9,20 +14,28 @@ except ImportError:
     from itertools import zip_longest
 
 try:
-    from unittest.mock import MagicMock, call, patch
+    import selectors
 except ImportError:
-    from mock import MagicMock, call, patch
+    selectors = None
+
+try:
+    from unittest.mock import MagicMock, PropertyMock, call, patch
+except ImportError:
+    from mock import MagicMock, PropertyMock, call, patch
 
 from ws4py.manager import WebSocketManager, SelectPoller,\
-     EPollPoller
+     EPollPoller, PollPoller, KQueuePoller, SelectorsPoller, EVENT_READ, EVENT_WRITE, ShardedWebSocketManager,\
+     RoundRobinPolicy, LeastLoadedPolicy, HashPolicy, Waker
 from ws4py.websocket import WebSocket
+from ws4py.messaging import PreparedMessage, PongControlMessage
+from ws4py.timers import TimerWheel
 
 class WSManagerTest(unittest.TestCase):
     @patch('ws4py.manager.SelectPoller')
     def test_add_and_remove_websocket(self, MockSelectPoller):
         m = WebSocketManager(poller=MockSelectPoller())
 
-        ws = MagicMock()
+        ws = MagicMock(heartbeat_freq=None)
         ws.sock.fileno.return_value = 1
         
         m.add(ws)
@@ -35,7 +48,7 @@ class WSManagerTest(unittest.TestCase):
     def test_cannot_add_websocket_more_than_once(self, MockSelectPoller):
         m = WebSocketManager(poller=MockSelectPoller())
 
-        ws = MagicMock()
+        ws = MagicMock(heartbeat_freq=None)
         ws.sock.fileno.return_value = 1
         
         m.add(ws)
@@ -48,7 +61,7 @@ class WSManagerTest(unittest.TestCase):
     def test_cannot_remove_unregistered_websocket(self, MockSelectPoller):
         m = WebSocketManager(poller=MockSelectPoller())
 
-        ws = MagicMock()
+        ws = MagicMock(heartbeat_freq=None)
         ws.sock.fileno.return_value = 1
         
         m.remove(ws)
@@ -82,11 +95,11 @@ class WSManagerTest(unittest.TestCase):
         m = WebSocketManager(poller=MockSelectPoller())
         
         def poll():
-            yield 1
+            yield (1, EVENT_READ)
             m.stop()
-            yield 2
+            yield (2, EVENT_READ)
             
-        m.poller.poll.return_value = poll()
+        m.poller.poll_events.return_value = poll()
         self.assertFalse(m.running)
         
         m.start()
@@ -97,9 +110,9 @@ class WSManagerTest(unittest.TestCase):
     @patch('ws4py.manager.SelectPoller')
     def test_websocket_terminated_from_mainloop(self, MockSelectPoller):
         m = WebSocketManager(poller=MockSelectPoller())
-        m.poller.poll.return_value = [1]
+        m.poller.poll_events.return_value = [(1, EVENT_READ)]
 
-        ws = MagicMock()
+        ws = MagicMock(heartbeat_freq=None)
         
         ws.terminated = False
         ws.sock.fileno.return_value = 1
@@ -113,11 +126,399 @@ class WSManagerTest(unittest.TestCase):
         
         m.stop()
     
+    @patch('ws4py.manager.SelectPoller')
+    def test_pending_data_is_read_on_the_same_event(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.terminated = False
+        ws.sock.fileno.return_value = 1
+        ws.once.return_value = True
+        type(ws).has_pending_data = PropertyMock(side_effect=[True, True, False])
+
+        polls = [[(1, EVENT_READ)]]
+        def poll(timeout=None):
+            if not polls:
+                m.running = False
+                return []
+            return polls.pop(0)
+        m.poller.poll_events.side_effect = poll
+
+        m.add(ws)
+        m.run()
+
+        self.assertEqual(ws.once.call_count, 3)
+        self.assertEqual(len(m._ready), 0)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_read_budget_defers_pending_data(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller(), read_budget=2)
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.terminated = False
+        ws.sock.fileno.return_value = 1
+        ws.once.return_value = True
+        type(ws).has_pending_data = PropertyMock(side_effect=[True, True, True, False])
+
+        timeouts = []
+        def poll(timeout=None):
+            timeouts.append(timeout)
+            if len(timeouts) == 1:
+                return [(1, EVENT_READ)]
+            if len(timeouts) == 3:
+                m.running = False
+            return []
+        m.poller.poll_events.side_effect = poll
+
+        m.add(ws)
+        m.run()
+
+        self.assertEqual(timeouts, [None, 0, None])
+        self.assertEqual(ws.once.call_count, 4)
+        self.assertEqual(len(m._ready), 0)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_byte_budget_queues_websockets_in_turn(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller(), byte_budget=2000)
+        now = [1000.0]
+        m.timers = TimerWheel(clock=lambda: now[0])
+
+        reads = []
+        def flooding(fd, size, pending):
+            ws = MagicMock(heartbeat_freq=None)
+            ws.terminated = False
+            ws.sock.fileno.return_value = fd
+            ws.bytes_received = 0
+            ws.has_pending_data = pending
+            def once():
+                reads.append(fd)
+                ws.bytes_received += size
+                return True
+            ws.once.side_effect = once
+            return ws
+
+        for ws in (flooding(1, 1000, True), flooding(2, 1500, True),
+                   flooding(3, 10, False)):
+            m.add(ws)
+
+        timeouts = []
+        def poll(timeout=None):
+            timeouts.append(timeout)
+            now[0] += 0.5
+            if len(timeouts) == 1:
+                return [(1, EVENT_READ), (2, EVENT_READ), (3, EVENT_READ)]
+            if len(timeouts) == 2:
+                return [(3, EVENT_READ)]
+            m.running = False
+            return []
+        m.poller.poll_events.side_effect = poll
+
+        m.run()
+
+        self.assertEqual(timeouts, [None, 0, 0])
+        self.assertEqual(reads, [1, 1, 2, 2, 3,
+                                 3, 1, 1, 2, 2])
+        self.assertEqual(m.ready_delay, 0.5)
+        self.assertEqual(m.max_ready_delay, 0.5)
+
+    @patch('ws4py.manager.EPollPoller')
+    def test_edge_triggered_reads_until_exhausted(self, MockEPollPoller):
+        m = WebSocketManager(poller=MockEPollPoller(edge_triggered=True), read_budget=3)
+        m.poller.edge_triggered = True
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.terminated = False
+        ws.sock.fileno.return_value = 1
+        ws.once.return_value = True
+        ws.has_pending_data = False
+        type(ws).read_exhausted = PropertyMock(side_effect=[False, True,
+                                                             False, False, False,
+                                                             True])
+
+        timeouts = []
+        def poll(timeout=None):
+            timeouts.append(timeout)
+            if len(timeouts) in (1, 2):
+                return [(1, EVENT_READ)]
+            if len(timeouts) == 4:
+                m.running = False
+            return []
+        m.poller.poll_events.side_effect = poll
+
+        m.add(ws)
+        m.run()
+
+        # the second event spends the budget, what is left is
+        # read on the next iteration without waiting for an edge
+        self.assertEqual(timeouts, [None, None, 0, None])
+        self.assertEqual(ws.once.call_count, 6)
+        self.assertEqual(len(m._ready), 0)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_writable_websocket_is_flushed(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.terminated = False
+        ws.sock.fileno.return_value = 1
+
+        polls = [[(1, EVENT_WRITE)]]
+        def poll(timeout=None):
+            if not polls:
+                m.running = False
+                return []
+            return polls.pop(0)
+        m.poller.poll_events.side_effect = poll
+
+        m.add(ws)
+        m.run()
+
+        ws.flush.assert_called_once_with()
+        self.assertFalse(ws.once.called)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_flush_failure_terminates_websocket(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.terminated = False
+        ws.sock.fileno.return_value = 1
+        ws.flush.side_effect = IOError
+
+        m.add(ws)
+        m._flush(1)
+
+        ws.terminate.assert_called_once_with()
+        m.poller.unregister.assert_called_once_with(1)
+        self.assertEqual(len(m), 0)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_write_interest_follows_pending_data(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.sock.fileno.return_value = 1
+        ws.write_pending = False
+
+        m.add(ws)
+        ws.set_nonblocking.assert_called_once_with(m._watch_writes, m._linger)
+        self.assertFalse(m.poller.modify.called)
+
+        m._watch_writes(ws, True)
+        m.poller.modify.assert_called_once_with(1, EVENT_READ | EVENT_WRITE)
+        m.poller.reset_mock()
+
+        m._watch_writes(ws, False)
+        m.poller.modify.assert_called_once_with(1, EVENT_READ)
+        m.poller.reset_mock()
+
+        m.remove(ws)
+        m._watch_writes(ws, True)
+        self.assertFalse(m.poller.modify.called)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_closed_websocket_lingers_until_flushed(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+        m.running = True
+        m._loop_thread = threading.current_thread()
+
+        sock = MagicMock()
+        sock.fileno.return_value = 1
+        sock.send.side_effect = socket.error(errno.EAGAIN, 'again')
+        ws = WebSocket(sock=sock)
+        m.add(ws)
+        ws._write(b'hello')
+        m.poller.reset_mock()
+
+        m._terminate(1, ws)
+        self.assertTrue(ws.terminated)
+        self.assertFalse(sock.close.called)
+        self.assertEqual(len(m), 0)
+        m.poller.unregister.assert_called_once_with(1)
+        m.poller.register.assert_called_once_with(1)
+        m.poller.modify.assert_called_once_with(1, EVENT_WRITE)
+
+        sock.send.side_effect = [socket.error(errno.EAGAIN, 'again')]
+        m._flush(1)
+        self.assertFalse(sock.close.called)
+
+        sock.send.side_effect = [5]
+        m._flush(1)
+        sock.close.assert_called_once_with()
+        self.assertEqual(m._lingering, {})
+        self.assertEqual(m.poller.unregister.call_count, 2)
+
+    @patch('ws4py.websocket.CLOSE_FLUSH_TIMEOUT', 0)
+    @patch('ws4py.manager.SelectPoller')
+    def test_lingering_websocket_times_out(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+        now = [1000.0]
+        m.timers = TimerWheel(clock=lambda: now[0])
+        m.running = True
+        m._loop_thread = threading.current_thread()
+
+        sock = MagicMock()
+        sock.fileno.return_value = 1
+        sock.send.side_effect = socket.error(errno.EAGAIN, 'again')
+        ws = WebSocket(sock=sock)
+        m.add(ws)
+        ws._write(b'hello')
+
+        m._terminate(1, ws)
+        self.assertIn(1, m._lingering)
+
+        now[0] += 1
+        m.timers.advance()
+        self.assertFalse(sock.close.called)
+
+        now[0] += 2
+        m.timers.advance()
+        sock.close.assert_called_once_with()
+        self.assertEqual(m._lingering, {})
+        self.assertEqual(ws.buffered_amount, 0)
+
+    def test_poller_without_events(self):
+        class LegacyPoller(object):
+            def __init__(self):
+                self.fds = []
+                self.polls = 0
+            def release(self):
+                pass
+            def register(self, fd):
+                self.fds.append(fd)
+            def unregister(self, fd):
+                self.fds.remove(fd)
+            def poll(self):
+                self.polls += 1
+                if self.polls > 1:
+                    m.running = False
+                return [fd for fd in self.fds if fd == 1]
+
+        m = WebSocketManager(poller=LegacyPoller())
+
+        ws = MagicMock(heartbeat_freq=None, reading_paused=False, terminated=False,
+                       write_pending=False, has_pending_data=False)
+        ws.sock.fileno.return_value = 1
+        ws.once.return_value = True
+
+        m.add(ws)
+        self.assertFalse(ws.set_nonblocking.called)
+        ws.reading_paused = True
+        m.inbound(ws, 16)
+        self.assertEqual(m.poller.fds, [])
+        ws.reading_paused = False
+        m.inbound(ws, -16)
+        self.assertEqual(m.poller.fds, [1])
+
+        m.run()
+        ws.once.assert_called_once_with()
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_inbound_limits_stop_reading(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller(), inbound_limits=(10, 5))
+        now = [1000.0]
+        m.timers = TimerWheel(clock=lambda: now[0])
+
+        ws = MagicMock(heartbeat_freq=None, reading_paused=False,
+                       write_pending=False)
+        ws.sock.fileno.return_value = 1
+        m.add(ws)
+        self.assertEqual(ws.inbound_limits, (10, 5))
+        m.poller.reset_mock()
+
+        m.inbound(ws, 4)
+        self.assertEqual(m.inbound_backlog, 4)
+        self.assertEqual(m.poller.method_calls, [])
+
+        ws.reading_paused = True
+        m.inbound(ws, 8)
+        m.poller.unregister.assert_called_once_with(1)
+
+        # only writes are watched while paused
+        m._watch_writes(ws, True)
+        m.poller.register.assert_called_once_with(1)
+        m.poller.modify.assert_called_once_with(1, EVENT_WRITE)
+        m._watch_writes(ws, False)
+        self.assertEqual(m.poller.unregister.call_count, 2)
+        self.assertEqual(len(m._ready), 0)
+
+        ws.reading_paused = False
+        m.inbound(ws, -12)
+        self.assertEqual(m.inbound_backlog, 0)
+        self.assertEqual(m.poller.register.call_count, 2)
+        # what was left unread gets its turn
+        self.assertEqual(list(m._ready), [1])
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_size_limits_are_applied(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller(), max_frame_size=1024,
+                             max_message_size=4096)
+        ws = MagicMock(heartbeat_freq=None, write_pending=False)
+        ws.sock.fileno.return_value = 1
+        m.add(ws)
+        self.assertEqual(ws.max_frame_size, 1024)
+        self.assertEqual(ws.max_message_size, 4096)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_reading_stops_once_paused(self, MockSelectPoller):
+        for edge_triggered in (False, True):
+            poller = MockSelectPoller()
+            poller.edge_triggered = edge_triggered
+            m = WebSocketManager(poller=poller, dispatcher=MagicMock(),
+                                 inbound_limits=(10, 5))
+
+            ws = MagicMock(heartbeat_freq=None, reading_paused=False,
+                           write_pending=False, has_pending_data=True,
+                           read_exhausted=False, terminated=False)
+            ws.sock.fileno.return_value = 1
+            m.add(ws)
+
+            def once():
+                # the first message goes past the high watermark
+                ws.reading_paused = True
+                m.inbound(ws, 16)
+                return True
+            ws.once.side_effect = once
+
+            m._read(1)
+            self.assertEqual(ws.once.call_count, 1)
+            self.assertIn(1, m._paused)
+            self.assertEqual(len(m._ready), 0)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_global_inbound_limits_throttle_websockets(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller(), global_inbound_limits=(10, 5))
+
+        websockets = []
+        for fd in (1, 2, 3):
+            ws = MagicMock(heartbeat_freq=None, reading_paused=False,
+                           write_pending=False)
+            ws.sock.fileno.return_value = fd
+            m.add(ws)
+            websockets.append(ws)
+        ws1, ws2, ws3 = websockets
+        m.poller.reset_mock()
+
+        m.inbound(ws1, 8)
+        m.inbound(ws2, 4)
+        m.inbound(ws3, 4)
+        self.assertEqual(m.poller.unregister.call_args_list, [call(2), call(3)])
+
+        # above the low watermark
+        m.inbound(ws2, -4)
+        self.assertFalse(m.poller.register.called)
+
+        m.inbound(ws1, -8)
+        self.assertEqual(m.inbound_backlog, 4)
+        self.assertEqual(sorted(c[0] for c in m.poller.register.call_args_list),
+                         [(2,), (3,)])
+        self.assertEqual(m._paused, set())
+
     @patch('ws4py.manager.SelectPoller')
     def test_websocket_close_all(self, MockSelectPoller):
         m = WebSocketManager(poller=MockSelectPoller())
 
-        ws = MagicMock()
+        ws = MagicMock(heartbeat_freq=None)
         m.add(ws)
         m.close_all()
         ws.close.assert_called_once_with(code=1001, reason='Server is shutting down')
@@ -126,18 +527,80 @@ class WSManagerTest(unittest.TestCase):
     def test_broadcast(self, MockSelectPoller):
         m = WebSocketManager(poller=MockSelectPoller())
 
-        ws = MagicMock()
+        ws = MagicMock(heartbeat_freq=None)
         ws.terminated = False
         m.add(ws)
 
         m.broadcast(b'hello there')
-        ws.send.assert_called_once_with(b'hello there', False)
+        self.assertEqual(ws.send.call_count, 1)
+        message, binary = ws.send.call_args[0]
+        self.assertIsInstance(message, PreparedMessage)
+        self.assertEqual(message.message.data, b'hello there')
+        self.assertFalse(message.message.is_binary)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_broadcast_frames_message_once(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+
+        websockets = [MagicMock(heartbeat_freq=None), MagicMock(heartbeat_freq=None)]
+        for i, ws in enumerate(websockets):
+            ws.terminated = False
+            ws.sock.fileno.return_value = i
+            m.add(ws)
+
+        m.broadcast(b'hello there', binary=True)
+        sent = [ws.send.call_args[0][0] for ws in websockets]
+        self.assertIs(sent[0], sent[1])
+        self.assertTrue(sent[0].message.is_binary)
+
+        prepared = PreparedMessage(b'hello there')
+        m.broadcast(prepared)
+        for ws in websockets:
+            self.assertIs(ws.send.call_args[0][0], prepared)
         
+    @patch('ws4py.manager.SelectPoller')
+    def test_broadcast_is_published_on_the_backplane(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+        m.backplane = MagicMock()
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.terminated = False
+        m.add(ws)
+
+        m.broadcast(b'hello there')
+        message = m.backplane.publish.call_args[0][0]
+        ws.send.assert_called_once_with(message, False)
+
+        # messages from other processes are only sent locally
+        m.fanout(PreparedMessage(b'hello there', binary=True))
+        self.assertEqual(m.backplane.publish.call_count, 1)
+        self.assertEqual(ws.send.call_count, 2)
+        self.assertTrue(ws.send.call_args[0][1])
+
+        m.backplane.publish.side_effect = RuntimeError
+        m.broadcast(b'hello there')
+        self.assertEqual(ws.send.call_count, 3)
+
+        m.stop()
+        m.backplane.close.assert_called_once_with()
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_dispatcher_is_given_to_managed_websockets(self, MockSelectPoller):
+        dispatcher = MagicMock()
+        m = WebSocketManager(poller=MockSelectPoller(), dispatcher=dispatcher)
+
+        ws = MagicMock(heartbeat_freq=None)
+        m.add(ws)
+        self.assertIs(ws.dispatcher, dispatcher)
+
+        m.stop()
+        dispatcher.shutdown.assert_called_once_with(wait=False)
+
     @patch('ws4py.manager.SelectPoller')
     def test_broadcast_failure_must_not_break_caller(self, MockSelectPoller):
         m = WebSocketManager(poller=MockSelectPoller())
 
-        ws = MagicMock()
+        ws = MagicMock(heartbeat_freq=None)
         ws.terminated = False
         ws.send.side_effect = RuntimeError
         m.add(ws)
@@ -147,11 +610,282 @@ class WSManagerTest(unittest.TestCase):
         except:
                 self.fail("Broadcasting shouldn't have failed")
 
+    def _timed_manager(self, MockSelectPoller, **kwargs):
+        now = [1000.0]
+        m = WebSocketManager(poller=MockSelectPoller(), **kwargs)
+        m.timers = TimerWheel(clock=lambda: now[0])
+        return m, now
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_heartbeat_is_sent_from_the_timer_wheel(self, MockSelectPoller):
+        m, now = self._timed_manager(MockSelectPoller)
+
+        ws = MagicMock(heartbeat_freq=2.0)
+        ws.terminated = False
+        ws.sock.fileno.return_value = 1
+        m.add(ws)
+
+        now[0] += 1.9
+        m.timers.advance()
+        self.assertFalse(ws.send.called)
+
+        for i in range(3):
+            now[0] += 2.0
+            m.timers.advance()
+        self.assertEqual(ws.send.call_count, 3)
+        self.assertIsInstance(ws.send.call_args[0][0], PongControlMessage)
+
+        m.remove(ws)
+        now[0] += 2.0
+        m.timers.advance()
+        self.assertEqual(ws.send.call_count, 3)
+        self.assertEqual(len(m.timers), 0)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_failed_heartbeat_terminates_websocket(self, MockSelectPoller):
+        m, now = self._timed_manager(MockSelectPoller)
+
+        ws = MagicMock(heartbeat_freq=2.0)
+        ws.terminated = False
+        ws.sock.fileno.return_value = 1
+        ws.send.side_effect = socket.error
+        m.add(ws)
+
+        now[0] += 2.1
+        m.timers.advance()
+        ws.terminate.assert_called_once_with()
+        self.assertNotIn(1, m.websockets)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_idle_websocket_is_closed(self, MockSelectPoller):
+        m, now = self._timed_manager(MockSelectPoller, idle_timeout=10)
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.terminated = False
+        ws.has_pending_data = False
+        ws.sock.fileno.return_value = 1
+        m.add(ws)
+
+        now[0] += 6
+        m._read(1)
+        now[0] += 6
+        m.timers.advance()
+        self.assertFalse(ws.close.called)
+
+        now[0] += 4.1
+        m.timers.advance()
+        ws.close.assert_called_once_with(code=1001, reason='Idle timeout')
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_closing_handshake_times_out(self, MockSelectPoller):
+        m, now = self._timed_manager(MockSelectPoller, close_timeout=5)
+
+        ws = MagicMock(heartbeat_freq=None)
+        ws.terminated = False
+        ws.sock.fileno.return_value = 1
+        m.add(ws)
+        self.assertIs(ws.manager, m)
+
+        m.closing(ws)
+        now[0] += 4.9
+        m.timers.advance()
+        self.assertFalse(ws.terminate.called)
+
+        now[0] += 0.2
+        m.timers.advance()
+        ws.terminate.assert_called_once_with()
+        self.assertNotIn(1, m.websockets)
+        self.assertIsNone(ws.manager)
+
+    def test_websocket_close_notifies_its_manager(self):
+        m = MagicMock()
+        ws = WebSocket(sock=MagicMock())
+        ws.manager = m
+        ws.close()
+        ws.close()
+        m.closing.assert_called_once_with(ws)
+
+    @patch('ws4py.manager.SelectPoller')
+    def test_user_timers_run_in_mainloop(self, MockSelectPoller):
+        m = WebSocketManager(poller=MockSelectPoller())
+        m.poller.timeout = 1.0
+
+        timeouts = []
+        def poll(timeout=None):
+            timeouts.append(timeout)
+            time.sleep(timeout or 1.0)
+            return []
+        m.poller.poll_events.side_effect = poll
+
+        def stop():
+            m.running = False
+        m.call_later(0.05, stop)
+        m.run()
+
+        self.assertFalse(m.running)
+        self.assertTrue(0 <= timeouts[0] <= 0.2)
+
+class WSManagerWakeupTest(unittest.TestCase):
+    def setUp(self):
+        self.m = WebSocketManager()
+        self.polls = 0
+        poll_events = self.m.poller.poll_events
+        def counting_poll_events(timeout=None):
+            self.polls += 1
+            return poll_events(timeout)
+        self.m.poller.poll_events = counting_poll_events
+        self.m.start()
+        time.sleep(0.05)
+
+    def tearDown(self):
+        self.m.stop()
+        self.m.join(1)
+        self.assertFalse(self.m.is_alive())
+
+    def test_idle_manager_blocks(self):
+        polls = self.polls
+        time.sleep(0.3)
+        self.assertEqual(self.polls, polls)
+
+    def test_added_websocket_is_watched_straight_away(self):
+        left, right = socket.socketpair()
+        try:
+            ws = MagicMock(heartbeat_freq=None)
+            ws.terminated = False
+            ws.has_pending_data = False
+            ws.sock = left
+            ws.once.side_effect = lambda: bool(left.recv(10))
+
+            started = time.time()
+            self.m.add(ws)
+            self.assertTrue(time.time() - started < 0.05)
+
+            right.sendall(b'hello')
+            deadline = time.time() + 1
+            while not ws.once.called and time.time() < deadline:
+                time.sleep(0.005)
+            self.assertTrue(time.time() - started < 0.5)
+            self.assertTrue(ws.once.called)
+            self.m.remove(ws)
+        finally:
+            left.close()
+            right.close()
+
+    def test_timers_from_other_threads_wake_the_manager(self):
+        called = threading.Event()
+        started = time.time()
+        self.m.call_later(0.1, called.set)
+        self.assertTrue(called.wait(1))
+        self.assertTrue(time.time() - started < 0.5)
+
+class WSWakerTest(unittest.TestCase):
+    def test_wake_and_drain(self):
+        waker = Waker()
+        self.assertEqual(select.select([waker], [], [], 0)[0], [])
+        waker.wake()
+        waker.wake()
+        self.assertEqual(select.select([waker], [], [], 0)[0], [waker])
+        waker.drain()
+        self.assertEqual(select.select([waker], [], [], 0)[0], [])
+        waker.close()
+        waker.wake()
+
+    @unittest.skipUnless(hasattr(os, 'eventfd'), "eventfd is required")
+    def test_wake_during_drain(self):
+        waker = Waker()
+        waker.wake()
+        eventfd_read = os.eventfd_read
+        def wake_and_read(fd):
+            waker.wake()
+            return eventfd_read(fd)
+
+        with patch('ws4py.manager.os.eventfd_read', side_effect=wake_and_read):
+            waker.drain()
+        waker.wake()
+        self.assertEqual(select.select([waker], [], [], 0)[0], [waker])
+        waker.drain()
+        self.assertEqual(select.select([waker], [], [], 0)[0], [])
+        waker.close()
+
+class WSShardedManagerTest(unittest.TestCase):
+    def make_websockets(self, count):
+        websockets = []
+        for fd in range(count):
+            ws = MagicMock(heartbeat_freq=None)
+            ws.terminated = False
+            ws.sock.fileno.return_value = fd
+            ws.peer_address = ('10.0.0.%d' % (fd % 2), 1000 + fd)
+            websockets.append(ws)
+        return websockets
+
+    def test_default_policy_places_on_least_loaded_shard(self):
+        m = ShardedWebSocketManager(shards=3, poller_factory=MagicMock)
+        self.assertEqual(len(m.shards), 3)
+        self.assertIsInstance(m.policy, LeastLoadedPolicy)
+
+        websockets = self.make_websockets(6)
+        for ws in websockets:
+            m.add(ws)
+            m.add(ws)
+        self.assertEqual([len(shard) for shard in m.shards], [2, 2, 2])
+        self.assertEqual(len(m), 6)
+        self.assertEqual(set(m), set(websockets))
+
+        m.remove(websockets[0])
+        self.assertFalse(websockets[0] in m)
+        self.assertTrue(websockets[1] in m)
+        m.add(self.make_websockets(7)[6])
+        self.assertEqual([len(shard) for shard in m.shards], [2, 2, 2])
+
+    def test_round_robin_policy(self):
+        m = ShardedWebSocketManager(shards=2, policy='round-robin', poller_factory=MagicMock)
+        self.assertIsInstance(m.policy, RoundRobinPolicy)
+        for ws in self.make_websockets(4):
+            m.add(ws)
+            self.assertTrue(ws in m.shards[ws.sock.fileno() % 2])
+
+    def test_hash_policy_keeps_peers_together(self):
+        m = ShardedWebSocketManager(shards=2, policy=HashPolicy(), poller_factory=MagicMock)
+        websockets = self.make_websockets(6)
+        for ws in websockets:
+            m.add(ws)
+        for ws in websockets[2:]:
+            self.assertIs(ws.manager, websockets[ws.sock.fileno() % 2].manager)
+
+    def test_invalid_configuration(self):
+        self.assertRaises(ValueError, ShardedWebSocketManager, shards=0)
+        self.assertRaises(ValueError, ShardedWebSocketManager, shards=1, policy='random')
+
+    def test_broadcast_and_close_all_reach_every_shard(self):
+        m = ShardedWebSocketManager(shards=2, policy='round-robin', poller_factory=MagicMock)
+        websockets = self.make_websockets(2)
+        for ws in websockets:
+            m.add(ws)
+
+        m.broadcast(b'hello there')
+        sent = [ws.send.call_args[0][0] for ws in websockets]
+        self.assertIsInstance(sent[0], PreparedMessage)
+        self.assertIs(sent[0], sent[1])
+
+        m.close_all()
+        for ws in websockets:
+            ws.close.assert_called_once_with(code=1001, reason='Server is shutting down')
+
+    def test_shards_run_in_their_own_thread(self):
+        m = ShardedWebSocketManager(shards=2, poller_factory=lambda: SelectPoller(timeout=0.01))
+        m.start()
+        time.sleep(0.1)
+        self.assertTrue(all(shard.running for shard in m.shards))
+        self.assertEqual(len(set(shard.name for shard in m.shards)), 2)
+        m.stop()
+        m.join()
+        self.assertFalse(any(shard.is_alive() for shard in m.shards))
+
 class WSSelectPollerTest(unittest.TestCase):
     @patch('ws4py.manager.select')
     def test_release_poller(self, select):
         poller = SelectPoller()
-        select.select.return_value = (poller._fds, None, None)
+        select.select.return_value = (poller._fds, [], [])
         
         poller.register(0)
         poller.register(1)
@@ -166,6 +900,13 @@ class WSSelectPollerTest(unittest.TestCase):
         fd = poller.poll()
         self.assertEqual(fd, [])
          
+    def test_zero_timeout_does_not_wait(self):
+        poller = SelectPoller(timeout=0.5)
+        a = time.time()
+        fd = poller.poll(timeout=0)
+        self.assertEqual(fd, [])
+        self.assertTrue(time.time() - a < 0.1)
+
     def test_timeout_when_no_registered_fds(self):
         poller = SelectPoller(timeout=0.5)
         a = time.time()
@@ -180,12 +921,31 @@ class WSSelectPollerTest(unittest.TestCase):
     @patch('ws4py.manager.select')
     def test_register_twice_does_not_duplicate_fd(self, select):
         poller = SelectPoller()
-        select.select.return_value = (poller._fds, None, None)
+        select.select.return_value = (poller._fds, [], [])
         poller.register(0)
         poller.register(0)
         fd = poller.poll()
         self.assertEqual(fd, [0])
             
+    @patch('ws4py.manager.select')
+    def test_poll_read_and_write_events(self, select):
+        poller = SelectPoller()
+        select.select.return_value = ([0, 1], [1, 2], [])
+        poller.register(0)
+        poller.register(1, EVENT_READ | EVENT_WRITE)
+        poller.register(2, EVENT_WRITE)
+        self.assertEqual(poller.poll_events(),
+                         [(0, EVENT_READ), (1, EVENT_READ | EVENT_WRITE),
+                          (2, EVENT_WRITE)])
+        select.select.assert_called_once_with([0, 1], [1, 2], [], 0.1)
+
+        self.assertEqual(poller.poll(), [0, 1])
+
+        poller.modify(1, EVENT_READ)
+        poller.modify(2, 0)
+        self.assertEqual(poller._fds, [0, 1])
+        self.assertEqual(poller._wfds, [])
+
     def test_unregister_twice_has_no_side_effect(self):
         poller = SelectPoller()
         poller.register(0)
@@ -209,6 +969,10 @@ class FakeEpoll(object):
 
         self.fds.append(fd)
 
+    def modify(self, fd, mask):
+        if fd not in self.fds:
+            raise IOError("Not registered")
+
     def unregister(self, fd):
         # epoll's documentation doesn't say anything
         # about removing fds that are not registered
@@ -280,10 +1044,229 @@ class WSEPollPollerTest(unittest.TestCase):
         except Exception as ex:
             self.fail("Shouldn't have failed: %s" % ex)
             
+class PollerBehaviour(object):
+    """
+    Checks a poller against real sockets.
+    """
+    def make_poller(self, timeout=0.1):
+        raise NotImplementedError()
+
+    def setUp(self):
+        self.poller = self.make_poller()
+        self.pairs = [socket.socketpair() for i in range(3)]
+
+    def tearDown(self):
+        self.poller.release()
+        for a, b in self.pairs:
+            a.close()
+            b.close()
+
+    def test_poll_read_and_write_events(self):
+        (a, peer_a), (b, peer_b), (c, peer_c) = self.pairs
+        self.poller.register(a.fileno())
+        self.poller.register(b.fileno(), EVENT_READ | EVENT_WRITE)
+        self.poller.register(c.fileno())
+
+        self.assertEqual(dict(self.poller.poll_events(timeout=0)),
+                         {b.fileno(): EVENT_WRITE})
+
+        peer_a.send(b'x')
+        peer_b.send(b'x')
+        self.assertEqual(dict(self.poller.poll_events(timeout=1)),
+                         {a.fileno(): EVENT_READ,
+                          b.fileno(): EVENT_READ | EVENT_WRITE})
+
+        self.poller.modify(b.fileno(), EVENT_READ)
+        self.poller.unregister(a.fileno())
+        self.assertEqual(list(self.poller.poll(timeout=1)), [b.fileno()])
+
+    def test_hang_up_is_a_read_event(self):
+        a, peer_a = self.pairs[0]
+        self.poller.register(a.fileno())
+        peer_a.close()
+        self.assertEqual(list(self.poller.poll(timeout=1)), [a.fileno()])
+
+    def test_unregister_twice_has_no_side_effect(self):
+        a, peer_a = self.pairs[0]
+        self.poller.register(a.fileno())
+        self.poller.register(a.fileno())
+        self.poller.unregister(a.fileno())
+        try:
+            self.poller.unregister(a.fileno())
+        except Exception as ex:
+            self.fail("Shouldn't have failed: %s" % ex)
+        self.assertEqual(self.poller.poll_events(timeout=0), [])
+
+    def test_timeout(self):
+        poller = self.make_poller(timeout=0.2)
+        self.addCleanup(poller.release)
+        poller.register(self.pairs[0][0].fileno())
+        a = time.time()
+        self.assertEqual(poller.poll_events(), [])
+        d = time.time() - a
+        if not (0.18 < d < 0.5):
+            self.fail("Did not wait for the appropriate amount of time: %f" % d)
+
+    def test_file_descriptors_above_fd_setsize(self):
+        try:
+            import resource
+            soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        except ImportError:
+            self.skipTest("resource is not available")
+        if soft != resource.RLIM_INFINITY and soft < 1100:
+            self.skipTest("Not enough file descriptors allowed")
+
+        pairs = []
+        try:
+            while not pairs or pairs[-1][0].fileno() < 1030:
+                pairs.append(socket.socketpair())
+            a, peer_a = pairs[-1]
+            self.poller.register(a.fileno())
+            peer_a.send(b'x')
+            self.assertEqual(list(self.poller.poll(timeout=1)), [a.fileno()])
+        finally:
+            for a, b in pairs:
+                a.close()
+                b.close()
+
+@unittest.skipUnless(hasattr(select, 'epoll'), "epoll is not available")
+class WSEdgeTriggeredEPollPollerTest(PollerBehaviour, unittest.TestCase):
+    def make_poller(self, timeout=0.1):
+        return EPollPoller(timeout=timeout, edge_triggered=True)
+
+    def test_hang_up_is_a_read_event(self):
+        a, peer_a = self.pairs[0]
+        self.poller.register(a.fileno())
+        peer_a.shutdown(socket.SHUT_WR)
+        self.assertEqual(list(self.poller.poll(timeout=1)), [a.fileno()])
+
+    def test_ready_file_descriptors_are_reported_once(self):
+        a, peer_a = self.pairs[0]
+        self.poller.register(a.fileno())
+        peer_a.send(b'x')
+        self.assertEqual(list(self.poller.poll(timeout=1)), [a.fileno()])
+        # nothing was read but no new bytes came in either
+        self.assertEqual(list(self.poller.poll(timeout=0)), [])
+
+        peer_a.send(b'y')
+        self.assertEqual(list(self.poller.poll(timeout=1)), [a.fileno()])
+        self.assertEqual(a.recv(2), b'xy')
+
+    def test_level_triggered_keeps_reporting(self):
+        poller = EPollPoller(timeout=0)
+        self.addCleanup(poller.release)
+        a, peer_a = self.pairs[0]
+        poller.register(a.fileno())
+        peer_a.send(b'x')
+        self.assertEqual(list(poller.poll()), [a.fileno()])
+        self.assertEqual(list(poller.poll()), [a.fileno()])
+
+@unittest.skipUnless(hasattr(select, 'poll'), "poll is not available")
+class WSPollPollerTest(PollerBehaviour, unittest.TestCase):
+    def make_poller(self, timeout=0.1):
+        return PollPoller(timeout=timeout)
+
+    def test_timeout_is_given_in_milliseconds(self):
+        with patch('ws4py.manager.select.poll') as poll:
+            poller = PollPoller(timeout=0.0105)
+            poll.return_value.poll.return_value = []
+            poller.poll_events()
+            poller.poll_events(timeout=None)
+            poll.return_value.poll.assert_called_with(11)
+
+            poller.timeout = None
+            poller.poll_events()
+            poll.return_value.poll.assert_called_with(None)
+
+@unittest.skipUnless(selectors, "selectors is not available")
+class WSSelectorsPollerTest(PollerBehaviour, unittest.TestCase):
+    def make_poller(self, timeout=0.1):
+        return SelectorsPoller(timeout=timeout)
+
+    def test_timeout_when_no_registered_fds(self):
+        poller = SelectorsPoller(timeout=0.2)
+        self.addCleanup(poller.release)
+        a = time.time()
+        self.assertEqual(list(poller.poll()), [])
+        d = time.time() - a
+        if not (0.18 < d < 0.5):
+            self.fail("Did not wait for the appropriate amount of time: %f" % d)
+
+class FakeKEvent(object):
+    def __init__(self, ident, filter, flags=0):
+        self.ident = ident
+        self.filter = filter
+        self.flags = flags
+
+    def __eq__(self, other):
+        return (self.ident, self.filter, self.flags) == \
+               (other.ident, other.filter, other.flags)
+
+    def __repr__(self):
+        return "kevent(%d, %d, %d)" % (self.ident, self.filter, self.flags)
+
+class WSKQueuePollerTest(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('ws4py.manager.select')
+        self.select = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.select.KQ_FILTER_READ = -1
+        self.select.KQ_FILTER_WRITE = -2
+        self.select.KQ_EV_ADD = 1
+        self.select.KQ_EV_DELETE = 2
+        self.select.KQ_EV_ERROR = 0x4000
+        self.select.kevent = FakeKEvent
+        self.kqueue = self.select.kqueue.return_value
+
+    def test_registration_adds_and_deletes_filters(self):
+        poller = KQueuePoller()
+        poller.register(3)
+        self.kqueue.control.assert_called_with([FakeKEvent(3, -1, 1)], 0)
+
+        poller.modify(3, EVENT_READ | EVENT_WRITE)
+        self.kqueue.control.assert_called_with([FakeKEvent(3, -2, 1)], 0)
+
+        poller.modify(3, EVENT_WRITE)
+        self.kqueue.control.assert_called_with([FakeKEvent(3, -1, 2)], 0)
+
+        self.kqueue.control.reset_mock()
+        poller.modify(3, EVENT_WRITE)
+        self.assertFalse(self.kqueue.control.called)
+
+        poller.unregister(3)
+        self.kqueue.control.assert_called_with([FakeKEvent(3, -2, 2)], 0)
+        poller.unregister(3)
+        self.assertEqual(self.kqueue.control.call_count, 1)
+
+    def test_poll_events_merges_filters(self):
+        poller = KQueuePoller(timeout=0.5)
+        poller.register(3, EVENT_READ | EVENT_WRITE)
+        poller.register(4)
+        poller.register(5, EVENT_WRITE)
+        self.kqueue.control.return_value = [
+            FakeKEvent(3, -1), FakeKEvent(3, -2), FakeKEvent(4, -1),
+            FakeKEvent(5, -2, 0x4000)]
+
+        self.assertEqual(sorted(poller.poll_events()),
+                         [(3, EVENT_READ | EVENT_WRITE), (4, EVENT_READ),
+                          (5, EVENT_READ)])
+        self.kqueue.control.assert_called_with(None, 6, 0.5)
+        self.assertEqual(sorted(poller.poll()), [3, 4, 5])
+
+    def test_closed_file_descriptor_is_ignored(self):
+        poller = KQueuePoller()
+        self.kqueue.control.side_effect = OSError("Bad file descriptor")
+        poller.register(3)
+        poller.unregister(3)
+        self.assertEqual(poller.poll_events(), [])
+
 if __name__ == '__main__':
     suite = unittest.TestSuite()
     loader = unittest.TestLoader()
-    for testcase in [WSManagerTest, WSSelectPollerTest]:
+    for testcase in [WSManagerTest, WSManagerWakeupTest, WSWakerTest,
+                     WSShardedManagerTest, WSSelectPollerTest,
+                     WSEdgeTriggeredEPollPollerTest, WSPollPollerTest,
+                     WSSelectorsPollerTest, WSKQueuePollerTest]:
         tests = loader.loadTestsFromTestCase(testcase)
         suite.addTests(tests)
     unittest.TextTestRunner(verbosity=2).run(suite)
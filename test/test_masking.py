@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+import unittest
+
+from ws4py import masking
+from ws4py.framing import Frame, OPCODE_BINARY
+
+class WSMaskingTest(unittest.TestCase):
+    def setUp(self):
+        self.backend = masking.get_backend()
+
+    def tearDown(self):
+        masking.set_backend(self.backend)
+
+    def test_backends_match_reference_implementation(self):
+        key = os.urandom(4)
+        for size in [0, 1, 3, 4, 5, 125, 126, 511, 512, 513, 4096, 4099, 8192, 65537]:
+            data = os.urandom(size)
+            expected = masking.bytewise_mask(key, data)
+            for name in masking.available_backends():
+                masking.set_backend(name)
+                masked = masking.mask(key, data)
+                self.assertIsInstance(masked, bytearray)
+                self.assertEqual(masked, expected, "%s failed on %d bytes" % (name, size))
+
+    def test_masking_is_reversible(self):
+        key = os.urandom(4)
+        data = os.urandom(1024)
+        for name in masking.available_backends():
+            masking.set_backend(name)
+            self.assertEqual(bytes(masking.mask(key, masking.mask(key, data))), data)
+
+    def test_backends_accept_buffers(self):
+        key = bytearray(os.urandom(4))
+        data = os.urandom(2048)
+        expected = masking.bytewise_mask(key, data)
+        for name in masking.available_backends():
+            masking.set_backend(name)
+            self.assertEqual(masking.mask(key, bytearray(data)), expected)
+            self.assertEqual(masking.mask(key, memoryview(data)[:]), expected)
+
+    def test_masking_does_not_modify_input(self):
+        key = os.urandom(4)
+        data = bytearray(os.urandom(1024))
+        original = bytes(data)
+        for name in masking.available_backends():
+            masking.set_backend(name)
+            masking.mask(key, data)
+            self.assertEqual(bytes(data), original)
+
+    def test_frame_uses_selected_backend(self):
+        key = b'\x01\x02\x03\x04'
+        f = Frame(opcode=OPCODE_BINARY, body=b'\x00' * 8, masking_key=key, fin=1)
+        self.assertEqual(f.mask(f.body), bytearray(key * 2))
+        self.assertEqual(f.build()[-8:], key * 2)
+
+    def test_unknown_backend(self):
+        self.assertRaises(ValueError, masking.set_backend, 'unknown')
+        self.assertIn(masking.get_backend(), masking.available_backends())
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite()
+    loader = unittest.TestLoader()
+    for testcase in [WSMaskingTest]:
+        tests = loader.loadTestsFromTestCase(testcase)
+        suite.addTests(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
+import tempfile
 import unittest
 
 from ws4py.framing import Frame, \
@@ -87,6 +88,40 @@ class WSMessagingTest(unittest.TestCase):
         m.extend(u' oui')
         self.assertEqual(m.data, u'\xe9trange oui'.encode('utf-8'))
 
+    def test_extend_many_fragments(self):
+        m = BinaryMessage(b'\x00')
+        for i in range(1, 100):
+            m.extend(bytearray([i]))
+        m.extend(memoryview(b'\x64'))
+        self.assertIsInstance(m.data, bytes)
+        self.assertEqual(m.data, bytes(bytearray(range(101))))
+        self.assertEqual(len(m), 101)
+
+        m.extend(b'\x65')
+        self.assertEqual(m.data[-2:], b'\x64\x65')
+        m.data = b'reset'
+        m.extend(b'!')
+        self.assertEqual(m.data, b'reset!')
+
+    def test_spooled_message(self):
+        m = BinaryMessage(b'hello')
+        m.extend(b' there')
+        self.assertFalse(m.spooled)
+        f = tempfile.TemporaryFile()
+        m.spool(f)
+        self.assertTrue(m.spooled)
+        m.extend(bytearray(b', how'))
+        m.extend(memoryview(b' are you?'))
+        self.assertEqual(m.size, 25)
+        self.assertEqual(len(m), 25)
+        m.completed = True
+        self.assertIs(m.data, f)
+        self.assertEqual(m.data.read(), b'hello there, how are you?')
+
+        m.data = None
+        self.assertFalse(m.spooled)
+        self.assertTrue(f.closed)
+
     def test_unicode_text_message_with_no_encoding(self):
         self.assertRaises(TypeError, Message, OPCODE_TEXT, u'\xe9trange', encoding=None)
 
@@ -117,6 +152,33 @@ class WSMessagingTest(unittest.TestCase):
         self.assertEqual(m.encoding, 'utf-8')
         self.assertIsInstance(m.data, bytes)
         self.assertEqual(len(m), 9)
+
+    def test_message_parts(self):
+        m = BinaryMessage(b'\x00' * 300)
+        header, payload = m.single_parts()
+        self.assertIs(payload, m.data)
+        self.assertEqual(header + payload, m.single())
+
+        header, payload = m.fragment_parts(first=True)
+        self.assertIs(payload, m.data)
+        self.assertEqual(header + payload, m.fragment(first=True))
+
+        header, payload = m.single_parts(mask=True)
+        self.assertEqual(len(header), 8)
+        self.assertEqual(len(payload), 300)
+
+    def test_prepared_message(self):
+        m = PreparedMessage(u'\xe9trange')
+        self.assertIsInstance(m.message, TextMessage)
+        self.assertEqual(b''.join(m.parts), TextMessage(u'\xe9trange').single())
+
+        m = PreparedMessage(b'\x00\x01', binary=True)
+        self.assertIsInstance(m.message, BinaryMessage)
+
+        message = PingControlMessage(b'ping')
+        m = PreparedMessage(message)
+        self.assertIs(m.message, message)
+        self.assertEqual(b''.join(m.parts), message.single())
         
 
 if __name__ == '__main__':
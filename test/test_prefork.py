@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import unittest
+
+try:
+    from unittest.mock import MagicMock, patch
+except ImportError:
+    from mock import MagicMock, patch
+
+from ws4py.client import WebSocketBaseClient
+from ws4py.server.prefork import PreforkServer, STOP_SIGNALS, _exit_worker
+
+SUPERVISOR = """
+import os
+import sys
+from ws4py.server.prefork import PreforkServer, WSGIRefWorker
+from ws4py.server.wsgiutils import WebSocketWSGIApplication
+from ws4py.websocket import EchoWebSocket
+
+def pid_worker(sock):
+    while True:
+        conn, addr = sock.accept()
+        conn.sendall(str(os.getpid()).encode('ascii'))
+        conn.close()
+
+if sys.argv[1] == 'pid':
+    server = PreforkServer(pid_worker, host='127.0.0.1', port=0,
+                           workers=1, reuse_port=False)
+    server.sock = server.listen()
+    port = server.sock.getsockname()[1]
+else:
+    app = WebSocketWSGIApplication(handler_cls=EchoWebSocket)
+    port = int(sys.argv[2])
+    server = PreforkServer(WSGIRefWorker(app), host='127.0.0.1', port=port,
+                           workers=2, reuse_port=True)
+sys.stdout.write('%d\\n' % port)
+sys.stdout.flush()
+server.serve_forever()
+"""
+
+def free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def retry(func, timeout=5.0):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            return func()
+        except socket.error:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+@unittest.skipUnless(hasattr(os, 'fork'), "os.fork is required")
+class PreforkServerTest(unittest.TestCase):
+    def start(self, *args):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.supervisor = subprocess.Popen([sys.executable, '-c', SUPERVISOR] + list(args),
+                                           stdout=subprocess.PIPE, env=env)
+        return int(self.supervisor.stdout.readline())
+
+    def tearDown(self):
+        if self.supervisor.poll() is None:
+            self.supervisor.kill()
+        self.supervisor.wait()
+        self.supervisor.stdout.close()
+
+    def stop(self):
+        self.supervisor.send_signal(signal.SIGTERM)
+        deadline = time.time() + 10
+        while self.supervisor.poll() is None and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(self.supervisor.returncode, 0)
+
+    def test_dead_worker_is_restarted(self):
+        port = self.start('pid')
+
+        def worker_pid():
+            s = socket.create_connection(('127.0.0.1', port))
+            try:
+                pid = s.recv(32)
+                if not pid:
+                    raise socket.error("No worker")
+                return int(pid)
+            finally:
+                s.close()
+
+        first = retry(worker_pid)
+        os.kill(first, signal.SIGKILL)
+        second = retry(worker_pid)
+        self.assertNotEqual(first, second)
+
+        self.stop()
+        self.assertRaises(OSError, os.kill, second, 0)
+
+    @unittest.skipUnless(hasattr(socket, 'SO_REUSEPORT'), "SO_REUSEPORT is required")
+    def test_workers_share_the_port(self):
+        port = self.start('wsgiref', str(free_port()))
+
+        received = []
+        class Client(WebSocketBaseClient):
+            def received_message(self, message):
+                received.append(message.data)
+
+        for i in range(4):
+            ws = Client('ws://127.0.0.1:%d/' % port)
+            retry(ws.connect)
+            ws.send(b'hello')
+            ws.once()
+            ws.close()
+            ws.close_connection()
+        self.assertEqual(received, [b'hello'] * 4)
+
+        self.stop()
+
+@unittest.skipUnless(hasattr(signal, 'pthread_sigmask'), "signal.pthread_sigmask is required")
+class SpawnTest(unittest.TestCase):
+    def setUp(self):
+        self.handlers = dict((signum, signal.getsignal(signum)) for signum in STOP_SIGNALS)
+
+    def tearDown(self):
+        for signum, handler in self.handlers.items():
+            signal.signal(signum, handler)
+
+    def blocked(self):
+        return signal.pthread_sigmask(signal.SIG_BLOCK, [])
+
+    def spawn(self, pid, worker):
+        server = PreforkServer(worker, workers=1)
+        server.sock = MagicMock()
+        blocked_while_forking = []
+        def fork():
+            blocked_while_forking.append(set(STOP_SIGNALS) <= self.blocked())
+            return pid
+
+        with patch('os.fork', side_effect=fork), patch('os._exit') as exit:
+            server.spawn()
+        self.assertEqual(blocked_while_forking, [True])
+        for signum in STOP_SIGNALS:
+            self.assertNotIn(signum, self.blocked())
+        return server, exit
+
+    def test_supervisor_unblocks_stop_signals(self):
+        server, exit = self.spawn(1234, MagicMock())
+        self.assertIn(1234, server.pids)
+        self.assertFalse(exit.called)
+
+    def test_worker_unblocks_stop_signals_once_handled(self):
+        state = []
+        def worker(sock):
+            state.append((self.blocked(), [signal.getsignal(signum) for signum in STOP_SIGNALS]))
+
+        server, exit = self.spawn(0, worker)
+        exit.assert_called_once_with(0)
+        blocked, handlers = state[0]
+        for signum in STOP_SIGNALS:
+            self.assertNotIn(signum, blocked)
+        self.assertEqual(handlers, [_exit_worker] * len(STOP_SIGNALS))
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite()
+    loader = unittest.TestLoader()
+    for testcase in [PreforkServerTest, SpawnTest]:
+        tests = loader.loadTestsFromTestCase(testcase)
+        suite.addTests(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
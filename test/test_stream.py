@@ -6,7 +6,8 @@ import struct
 from ws4py.framing import Frame, \
      OPCODE_CONTINUATION, OPCODE_TEXT, \
      OPCODE_BINARY, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG
-from ws4py.streaming import Stream
+from ws4py.streaming import Stream, MessageReceived, FragmentReceived, \
+     PingReceived, PongReceived, CloseReceived, StreamError
 from ws4py.messaging import TextMessage, BinaryMessage, \
      CloseControlMessage, PingControlMessage, PongControlMessage
 from ws4py.compat import *
@@ -330,6 +331,211 @@ class WSStreamTest(unittest.TestCase):
         self.assertEqual(s.message.completed, True)
         self.assertEqual(s.message.opcode, OPCODE_BINARY)
 
+    def test_large_message_received_in_many_chunks(self):
+        msg = os.urandom(1 << 20)
+        f = Frame(opcode=OPCODE_BINARY, body=msg, fin=1, masking_key=os.urandom(4)).build()
+        s = Stream()
+        needed = s.parser.send(f[:2])
+        self.assertEqual(needed, 12)
+        for index in range(2, len(f), 4096):
+            s.parser.send(f[index:index+4096])
+        self.assertEqual(s.has_message, True)
+        self.assertEqual(s.message.data, msg)
+
+    def test_bytes_following_a_frame_are_kept(self):
+        ping = Frame(opcode=OPCODE_PING, body=b'ping me', fin=1, masking_key=os.urandom(4)).build()
+        f = Frame(opcode=OPCODE_TEXT, body=b'hello there', fin=1, masking_key=os.urandom(4)).build()
+        s = Stream()
+        s.parser.send(ping + f[:5])
+        self.assertEqual(len(s.pings), 1)
+        self.assertEqual(s.has_message, False)
+        s.parser.send(f[5:])
+        self.assertEqual(s.has_message, True)
+        self.assertEqual(s.message.data, b'hello there')
+
+    def test_feed_returns_every_event(self):
+        key = os.urandom(4)
+        data = Frame(opcode=OPCODE_TEXT, body=b'hello', fin=0, masking_key=key).build() + \
+               Frame(opcode=OPCODE_PING, body=b'ping me', fin=1, masking_key=key).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=b' there', fin=1, masking_key=key).build() + \
+               Frame(opcode=OPCODE_BINARY, body=b'\x00\x01', fin=1, masking_key=key).build() + \
+               Frame(opcode=OPCODE_PONG, body=b'pong', fin=1, masking_key=key).build()
+        s = Stream()
+        events = s.feed(data)
+        self.assertEqual([type(e) for e in events],
+                         [PingReceived, MessageReceived, MessageReceived, PongReceived])
+        self.assertEqual(events[0].message.data, b'ping me')
+        self.assertIsInstance(events[1].message, TextMessage)
+        self.assertEqual(events[1].message.data, b'hello there')
+        self.assertIsInstance(events[2].message, BinaryMessage)
+        self.assertEqual(events[2].message.data, b'\x00\x01')
+        self.assertEqual(events[3].message.data, b'pong')
+        self.assertEqual(s.message, None)
+
+    def test_feed_incrementally(self):
+        data = Frame(opcode=OPCODE_TEXT, body=b'hello there', fin=1, masking_key=os.urandom(4)).build()
+        s = Stream()
+        for index in range(len(data) - 1):
+            self.assertEqual(s.feed(data[index:index+1]), [])
+        events = s.feed(data[-1:])
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].message.data, b'hello there')
+
+    def test_feed_stops_at_close(self):
+        key = os.urandom(4)
+        data = Frame(opcode=OPCODE_CLOSE, body=struct.pack('!H', 1000) + b'bye', fin=1, masking_key=key).build() + \
+               Frame(opcode=OPCODE_TEXT, body=b'hello', fin=1, masking_key=key).build()
+        s = Stream()
+        events = s.feed(data)
+        self.assertEqual(len(events), 1)
+        self.assertIsInstance(events[0], CloseReceived)
+        self.assertEqual(events[0].message.code, 1000)
+        self.assertEqual(events[0].message.reason, b'bye')
+        self.assertEqual(s.closing, events[0].message)
+        self.assertEqual(s.feed(data), [])
+
+    def test_feed_stops_at_error(self):
+        data = Frame(opcode=OPCODE_TEXT, body=b'\xff', fin=1, masking_key=os.urandom(4)).build() + \
+               Frame(opcode=OPCODE_TEXT, body=b'hello', fin=1, masking_key=os.urandom(4)).build()
+        s = Stream()
+        events = s.feed(data)
+        self.assertEqual(len(events), 1)
+        self.assertIsInstance(events[0], StreamError)
+        self.assertEqual(events[0].message.code, 1007)
+        self.assertEqual(s.feed(data), [])
+
+        s = Stream()
+        events = s.feed(b'\xc1\x80')
+        self.assertEqual(len(events), 1)
+        self.assertIsInstance(events[0], StreamError)
+        self.assertEqual(events[0].message.code, 1002)
+
+    def test_feed_fragments(self):
+        key = os.urandom(4)
+        data = Frame(opcode=OPCODE_BINARY, body=b'\x00\x01', fin=0, masking_key=key).build() + \
+               Frame(opcode=OPCODE_PING, body=b'ping me', fin=1, masking_key=key).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=b'\x02', fin=0, masking_key=key).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=b'\x03', fin=1, masking_key=key).build() + \
+               Frame(opcode=OPCODE_TEXT, body=b'hello', fin=1, masking_key=key).build()
+        s = Stream()
+        s.stream_fragments = True
+        events = s.feed(data)
+        self.assertEqual([type(e) for e in events],
+                         [FragmentReceived, PingReceived, FragmentReceived,
+                          FragmentReceived, FragmentReceived])
+        fragments = [(e.message.opcode, e.message.data, e.message.completed)
+                     for e in events if isinstance(e, FragmentReceived)]
+        self.assertEqual(fragments, [(OPCODE_BINARY, b'\x00\x01', False),
+                                     (OPCODE_BINARY, b'\x02', False),
+                                     (OPCODE_BINARY, b'\x03', True),
+                                     (OPCODE_TEXT, b'hello', True)])
+        self.assertEqual(s.message, None)
+
+    def test_feed_fragments_validates_text_across_frames(self):
+        key = os.urandom(4)
+        text = u'€uro'.encode('utf-8')
+        data = Frame(opcode=OPCODE_TEXT, body=text[:2], fin=0, masking_key=key).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=text[2:], fin=1, masking_key=key).build()
+        s = Stream()
+        s.stream_fragments = True
+        events = s.feed(data)
+        self.assertEqual([e.message.data for e in events], [text[:2], text[2:]])
+
+        data = Frame(opcode=OPCODE_TEXT, body=b'hello', fin=0, masking_key=key).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=text[:2], fin=1, masking_key=key).build()
+        s = Stream()
+        s.stream_fragments = True
+        events = s.feed(data)
+        self.assertEqual([type(e) for e in events], [FragmentReceived, StreamError])
+        self.assertEqual(events[1].message.code, 1007)
+
+    def test_feed_fragments_in_order(self):
+        key = os.urandom(4)
+        s = Stream()
+        s.stream_fragments = True
+        events = s.feed(Frame(opcode=OPCODE_CONTINUATION, body=b'hello', fin=1, masking_key=key).build())
+        self.assertIsInstance(events[0], StreamError)
+        self.assertEqual(events[0].message.code, 1002)
+
+        s = Stream()
+        s.stream_fragments = True
+        events = s.feed(Frame(opcode=OPCODE_TEXT, body=b'hello', fin=0, masking_key=key).build() +
+                        Frame(opcode=OPCODE_BINARY, body=b'\x00', fin=1, masking_key=key).build())
+        self.assertEqual([type(e) for e in events], [FragmentReceived, StreamError])
+        self.assertEqual(events[1].message.code, 1002)
+
+    def test_large_binary_messages_are_spooled(self):
+        key = os.urandom(4)
+        chunk = os.urandom(1024)
+        data = Frame(opcode=OPCODE_BINARY, body=chunk, fin=0, masking_key=key).build()
+        for i in range(6):
+            data += Frame(opcode=OPCODE_CONTINUATION, body=chunk, fin=0, masking_key=key).build()
+        data += Frame(opcode=OPCODE_CONTINUATION, body=chunk, fin=1, masking_key=key).build()
+        s = Stream()
+        s.spool_threshold = 4096
+
+        events = s.feed(data[:len(data) // 2])
+        self.assertEqual(events, [])
+        self.assertFalse(s.message.spooled)
+        events = s.feed(data[len(data) // 2:])
+        self.assertEqual(len(events), 1)
+        m = events[0].message
+        self.assertTrue(m.spooled)
+        self.assertEqual(m.size, 8192)
+        self.assertEqual(m.data.read(), chunk * 8)
+        m.data = None
+
+        small = Frame(opcode=OPCODE_BINARY, body=chunk, fin=1, masking_key=key).build()
+        large = Frame(opcode=OPCODE_BINARY, body=chunk * 5, fin=1, masking_key=key).build()
+        text = Frame(opcode=OPCODE_TEXT, body=b'x' * 5000, fin=1, masking_key=key).build()
+        events = s.feed(small + large + text)
+        self.assertEqual([e.message.spooled for e in events], [False, True, False])
+        self.assertEqual(events[0].message.data, chunk)
+        self.assertEqual(events[1].message.data.read(), chunk * 5)
+        events[1].message.data = None
+
+    def test_large_frame_is_spooled_as_it_arrives(self):
+        key = os.urandom(4)
+        body = os.urandom(1 << 22)
+        data = Frame(opcode=OPCODE_BINARY, body=body, fin=1, masking_key=key).build()
+        s = Stream()
+        s.spool_threshold = 65536
+
+        events = []
+        for offset in range(0, len(data), 65536):
+            events.extend(s.feed(data[offset:offset + 65536]))
+            # no more than what was fed is ever buffered
+            self.assertTrue(len(s._frames.buffer) <= 65536)
+            if not events:
+                self.assertTrue(s.message.spooled)
+                self.assertEqual(s.message.size, offset + 65536 - 14)
+
+        self.assertEqual(len(events), 1)
+        m = events[0].message
+        self.assertEqual(m.size, len(body))
+        self.assertEqual(m.data.read(), body)
+        m.data = None
+
+    def test_too_large_frames_and_messages(self):
+        key = os.urandom(4)
+        s = Stream()
+        s.max_frame_size = 1024
+        events = s.feed(Frame(opcode=OPCODE_BINARY, body=b'*' * 1024, fin=1, masking_key=key).build())
+        self.assertIsInstance(events[0], MessageReceived)
+        events = s.feed(struct.pack('!BBQ', 0x82, 0xff, 1 << 32))
+        self.assertEqual(len(events), 1)
+        self.assertIsInstance(events[0], StreamError)
+        self.assertEqual(events[0].message.code, 1009)
+
+        s = Stream()
+        s.max_message_size = 2048
+        data = Frame(opcode=OPCODE_TEXT, body=b'*' * 1024, fin=0, masking_key=key).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=b'*' * 1024, fin=0, masking_key=key).build()
+        self.assertEqual(s.feed(data), [])
+        events = s.feed(Frame(opcode=OPCODE_CONTINUATION, body=b'*', fin=1, masking_key=key).build()[:2])
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].message.code, 1009)
+
     def test_helper_with_unicode_text_message(self):
         s = Stream()
         m = s.text_message(u'hello there!')
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from ws4py.timers import TimerWheel
+
+class WSTimerWheelTest(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000.0
+        self.wheel = TimerWheel(resolution=0.1, slots=8, levels=3,
+                                clock=lambda: self.now)
+
+    def forward(self, seconds):
+        self.now += seconds
+        return self.wheel.advance()
+
+    def test_timer_runs_once_due(self):
+        called = []
+        self.wheel.call_later(1.0, called.append, 'a')
+        self.assertEqual(len(self.wheel), 1)
+
+        self.assertEqual(self.forward(0.95), 0)
+        self.assertEqual(called, [])
+        self.assertEqual(self.forward(0.1), 1)
+        self.assertEqual(called, ['a'])
+        self.assertEqual(self.forward(10), 0)
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_cancelled_timer_does_not_run(self):
+        called = []
+        timer = self.wheel.call_later(1.0, called.append, 'a')
+        timer.cancel()
+        self.forward(2)
+        self.assertEqual(called, [])
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_immediate_timer(self):
+        called = []
+        self.wheel.call_later(0, called.append, 'a')
+        self.assertEqual(self.wheel.next_timeout(), 0)
+        self.wheel.advance()
+        self.assertEqual(called, ['a'])
+
+    def test_timers_cascade_from_higher_wheels(self):
+        # 8 ** 3 ticks of 0.1s span 51.2s, further timers wait in the last wheel
+        fired = []
+        for delay in [0.5, 3.3, 7.9, 25.6, 51.1, 60.0, 300.0]:
+            self.wheel.call_later(delay, lambda d=delay: fired.append((d, self.now - 1000.0)))
+
+        while self.now < 1400:
+            self.forward(0.37)
+
+        self.assertEqual([d for d, at in fired], [0.5, 3.3, 7.9, 25.6, 51.1, 60.0, 300.0])
+        for delay, at in fired:
+            self.assertTrue(delay <= at < delay + 1.1, (delay, at))
+
+    def test_next_timeout(self):
+        self.assertIsNone(self.wheel.next_timeout())
+        self.wheel.call_later(0.35, lambda: None)
+        self.assertAlmostEqual(self.wheel.next_timeout(), 0.4)
+        self.wheel.clear()
+        self.wheel.call_later(20, lambda: None)
+        # only known once moved down to the first wheel
+        self.assertTrue(0 < self.wheel.next_timeout() < 0.81)
+
+    def test_failing_callback_does_not_stop_others(self):
+        called = []
+        def fail():
+            raise RuntimeError()
+        self.wheel.call_later(0.1, fail)
+        self.wheel.call_later(0.1, called.append, 'a')
+        self.assertEqual(self.forward(0.2), 2)
+        self.assertEqual(called, ['a'])
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite()
+    loader = unittest.TestLoader()
+    for testcase in [WSTimerWheelTest]:
+        tests = loader.loadTestsFromTestCase(testcase)
+        suite.addTests(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from ws4py.utf8validator import Utf8Validator
+
+SAMPLES = [
+    b'',
+    b'hello there',
+    u'\xe9t\xe9 € 中文 \U0001f600'.encode('utf-8'),
+    b'\xed\xa0\x80',      # surrogate
+    b'\xc0\xaf',          # overlong
+    b'\xf4\x90\x80\x80',  # above U+10FFFF
+    b'hello \xff there',
+    b'caf\xc3',           # truncated
+]
+
+class WSUtf8ValidatorTest(unittest.TestCase):
+    def test_validate_matches_the_dfa(self):
+        for data in SAMPLES:
+            for cut in range(len(data) + 1):
+                fast, dfa = Utf8Validator(), Utf8Validator()
+                for chunk in [data[:cut], data[cut:]]:
+                    result = fast.validate(bytearray(chunk))
+                    self.assertEqual(result, dfa.validate_dfa(bytearray(chunk)),
+                                     "%r cut at %d" % (data, cut))
+                    if not result[0]:
+                        break
+
+    def test_code_point_split_across_chunks(self):
+        v = Utf8Validator()
+        self.assertEqual(v.validate(bytearray(b'caf\xc3'))[:2], (True, False))
+        self.assertEqual(v.validate(bytearray(b'\xa9'))[:2], (True, True))
+        self.assertEqual(v.validate(bytearray(b'ascii'))[:2], (True, True))
+
+    def test_failure_offset(self):
+        v = Utf8Validator()
+        self.assertEqual(v.validate(bytearray(b'hello')), (True, True, 4, 4))
+        self.assertEqual(v.validate(bytearray(b' th\xffere')), (False, False, 3, 7))
+
+        v.reset()
+        self.assertEqual(v.validate(bytearray(b'\xe2\x82'))[:2], (True, False))
+        self.assertEqual(v.validate(bytearray(b'x'))[:3], (False, False, 0))
+
+if __name__ == '__main__':
+    suite = unittest.TestSuite()
+    loader = unittest.TestLoader()
+    for testcase in [WSUtf8ValidatorTest]:
+        tests = loader.loadTestsFromTestCase(testcase)
+        suite.addTests(tests)
+    unittest.TextTestRunner(verbosity=2).run(suite)
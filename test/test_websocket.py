@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 import unittest
 import os
+import errno
+import random
 import socket
 import struct
+import threading
+import time
 
 try:
     from io import BytesIO
@@ -16,8 +20,12 @@ from ws4py.framing import Frame, \
      OPCODE_CONTINUATION, OPCODE_TEXT, \
      OPCODE_BINARY, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG
 from ws4py.websocket import WebSocket
+from ws4py.extensions import PerMessageDeflate, negotiate_extensions
+from ws4py.streaming import Stream, CloseReceived, PingReceived, PongReceived, \
+     MessageReceived
 from ws4py.messaging import TextMessage, BinaryMessage, \
-     CloseControlMessage, PingControlMessage, PongControlMessage
+     CloseControlMessage, PingControlMessage, PongControlMessage, \
+     PreparedMessage
 from ws4py.compat import *
 
 class WSWebSocketTest(unittest.TestCase):
@@ -75,6 +83,76 @@ class WSWebSocketTest(unittest.TestCase):
             self.assertIsNone(ws.stream)
             self.assertIsNone(ws.environ)
         
+    def test_handlers_go_through_the_dispatcher(self):
+        ws = WebSocket(sock=MagicMock())
+        ws.dispatcher = MagicMock()
+        ws.received_message = MagicMock()
+        ws.ponged = MagicMock()
+        ws.closed = MagicMock()
+
+        data = TextMessage(u'hello').single(mask=True) + \
+               PongControlMessage(b'pong').single(mask=True)
+        self.assertTrue(ws.process(data))
+        ws.terminate()
+
+        self.assertFalse(ws.received_message.called)
+        self.assertFalse(ws.ponged.called)
+        self.assertFalse(ws.closed.called)
+        calls = ws.dispatcher.submit.call_args_list
+        self.assertEqual([c[0][:2] for c in calls],
+                         [(ws, ws.received_message), (ws, ws._inbound),
+                          (ws, ws.ponged), (ws, ws.closed)])
+        self.assertEqual(calls[0][0][2].data, b'hello')
+        self.assertEqual(calls[1][0][2:], (-5,))
+        self.assertEqual(calls[2][0][2].data, b'pong')
+        self.assertEqual(calls[3][0][2:], (1006, "Going away"))
+
+    def test_received_fragments(self):
+        ws = WebSocket(sock=MagicMock())
+        ws.stream_fragments = True
+        ws.received_message = MagicMock()
+        ws.received_fragment = MagicMock()
+
+        data = Frame(opcode=OPCODE_BINARY, body=b'\x00\x01', fin=0, masking_key=os.urandom(4)).build() + \
+               Frame(opcode=OPCODE_CONTINUATION, body=b'\x02', fin=1, masking_key=os.urandom(4)).build()
+        self.assertTrue(ws.process(data))
+        self.assertFalse(ws.received_message.called)
+        self.assertEqual(ws.received_fragment.call_args_list,
+                         [call(OPCODE_BINARY, b'\x00\x01', False),
+                          call(OPCODE_BINARY, b'\x02', True)])
+
+        ws.dispatcher = MagicMock()
+        ws.process(TextMessage(u'hello').single(mask=True))
+        calls = ws.dispatcher.submit.call_args_list
+        self.assertEqual([c[0][1:] for c in calls],
+                         [(ws.received_fragment, OPCODE_TEXT, b'hello', True),
+                          (ws._inbound, -5)])
+
+    def test_inbound_limits_pause_reading(self):
+        ws = WebSocket(sock=MagicMock())
+        ws.dispatcher = MagicMock()
+        ws.manager = MagicMock()
+        ws.inbound_limits = (10, 5)
+
+        for i in range(3):
+            ws.process(TextMessage(u'hello').single(mask=True))
+        self.assertEqual(ws.inbound_backlog, 15)
+        self.assertTrue(ws.reading_paused)
+        self.assertEqual(ws.manager.inbound.call_args_list, [call(ws, 5)] * 3)
+
+        handled = [c[0][1:] for c in ws.dispatcher.submit.call_args_list
+                   if c[0][1] == ws._inbound]
+        self.assertEqual(handled, [(ws._inbound, -5)] * 3)
+
+        ws._inbound(-5)
+        self.assertEqual(ws.inbound_backlog, 10)
+        self.assertTrue(ws.reading_paused)
+        ws._inbound(-5)
+        self.assertFalse(ws.reading_paused)
+        ws._inbound(3)
+        self.assertFalse(ws.reading_paused)
+        self.assertEqual(ws.manager.inbound.call_args, call(ws, 3))
+
     def test_terminate_without_closing(self):
         m = MagicMock()
         s = MagicMock()
@@ -104,13 +182,13 @@ class WSWebSocketTest(unittest.TestCase):
 
     def test_socket_error_on_receiving_more_bytes(self):
         m = MagicMock()
-        m.recv = MagicMock(side_effect=socket.error)
+        m.recv_into = MagicMock(side_effect=socket.error)
         ws = WebSocket(sock=m)
         self.assertFalse(ws.once())
         
     def test_no_bytes_were_read(self):
         m = MagicMock(spec=socket.socket)
-        m.recv.return_value = b''
+        m.recv_into.return_value = 0
         ws = WebSocket(sock=m)
         self.assertFalse(ws.once())
 
@@ -129,7 +207,7 @@ class WSWebSocketTest(unittest.TestCase):
         ws = WebSocket(sock=m)
         ws.stream = MagicMock()
         ws.stream.always_mask = True
-        ws.stream.text_message.return_value.single.return_value = tm
+        ws.stream.text_message.return_value.single_parts.return_value = (tm[:6], tm[6:])
         
         ws.send(b'hello world')
         m.sendall.assert_called_once_with(tm)
@@ -142,6 +220,87 @@ class WSWebSocketTest(unittest.TestCase):
         ws.send(tm)
         m.sendall.assert_called_once_with(tm.single())
         
+    def test_send_prepared_message(self):
+        pm = PreparedMessage(b'hello world')
+
+        m = MagicMock()
+        ws = WebSocket(sock=m)
+        ws.send(pm)
+        m.sendall.assert_called_once_with(TextMessage(b'hello world').single())
+
+        m = MagicMock()
+        ws = WebSocket(sock=m)
+        ws.stream.always_mask = True
+        ws.send(pm)
+        frame = m.sendall.call_args[0][0]
+        self.assertEqual(len(frame), 17)
+        self.assertTrue(ord(frame[1]) & 0x80)
+
+    def test_send_with_negotiated_deflate(self):
+        deflate = negotiate_extensions('permessage-deflate', ['permessage-deflate'])[0]
+
+        m = MagicMock()
+        ws = WebSocket(sock=m, extensions=[deflate])
+        self.assertIs(ws.stream.deflate, deflate)
+
+        ws.send(b'hello world')
+        frame = m.sendall.call_args[0][0]
+        self.assertEqual(ord(frame[0]), 0xc1)
+
+        ws = WebSocket(sock=m, extensions=[PerMessageDeflate()])
+        self.assertIsNone(ws.stream.deflate)
+
+    def test_control_frames_are_not_compressed(self):
+        server = negotiate_extensions('permessage-deflate', ['permessage-deflate'])[0]
+        client = PerMessageDeflate().accept_response([])
+        s = Stream(expect_masking=False)
+        s.deflate = client
+
+        m = MagicMock()
+        ws = WebSocket(sock=m, extensions=[server])
+        ws.ping(b'hb')
+        ws.send(PongControlMessage(b'hb'))
+        ws.send(PreparedMessage(PingControlMessage(b'hb')))
+        ws.send(b'hello')
+
+        frames = [c[0][0] for c in m.sendall.call_args_list]
+        self.assertEqual([ord(f[0]) for f in frames], [0x89, 0x8a, 0x89, 0xc1])
+        events = s.feed(b''.join(frames))
+        self.assertEqual([type(e) for e in events],
+                         [PingReceived, PongReceived, PingReceived, MessageReceived])
+        self.assertEqual(events[3].message.data, b'hello')
+
+    def test_concurrent_sends_keep_the_compressor_order(self):
+        server = negotiate_extensions('permessage-deflate', ['permessage-deflate'])[0]
+        s = Stream(expect_masking=False)
+        s.deflate = PerMessageDeflate().accept_response([])
+
+        compress = server.compress
+        def slow_compress(data, final=True):
+            data = compress(data, final)
+            # let another thread write its frame first
+            time.sleep(random.random() * 0.002)
+            return data
+        server.compress = slow_compress
+
+        m = MagicMock()
+        ws = WebSocket(sock=m, extensions=[server])
+        sent = [('message %d from thread %d' % (j, i)).encode('utf-8')
+                for i in range(4) for j in range(50)]
+        def sender(i):
+            for data in sent[i * 50:(i + 1) * 50]:
+                ws.send(data)
+        threads = [threading.Thread(target=sender, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        events = s.feed(b''.join(c[0][0] for c in m.sendall.call_args_list))
+        for e in events:
+            self.assertIsInstance(e, MessageReceived)
+        self.assertEqual(sorted(e.message.data for e in events), sorted(sent))
+
     def test_send_generator_without_masking(self):
         tm0 = b'hello'
         tm1 = b'world'
@@ -171,8 +330,8 @@ class WSWebSocketTest(unittest.TestCase):
         ws = WebSocket(sock=m)
         with patch.multiple(ws, close=c):
             ws.stream = s
-            ws.stream.closing = CloseControlMessage(code=1000, reason='test closing')
-            ws.process(b'unused for this test')
+            ws.stream.feed.return_value = [CloseReceived(CloseControlMessage(code=1000, reason='test closing'))]
+            self.assertFalse(ws.process(b'unused for this test'))
             c.assert_called_once_with(1000, b'test closing')
             
     def test_sending_ping(self):
@@ -183,25 +342,338 @@ class WSWebSocketTest(unittest.TestCase):
         ws.ping("hello")
         m.sendall.assert_called_once_with(tm)
 
+    def test_process_every_frame_at_once(self):
+        data = TextMessage(b'hello').single(mask=True) + \
+               PingControlMessage(b'ping').single(mask=True) + \
+               BinaryMessage(b'world').single(mask=True) + \
+               PongControlMessage(b'pong').single(mask=True)
+
+        m = MagicMock()
+        ws = WebSocket(sock=m)
+        received = []
+        with patch.multiple(ws, received_message=MagicMock(side_effect=lambda msg: received.append(msg.data)),
+                            ponged=MagicMock()):
+            self.assertTrue(ws.process(data))
+            self.assertEqual(received, [b'hello', b'world'])
+            m.sendall.assert_called_once_with(PongControlMessage(b'ping').single())
+            self.assertEqual(ws.ponged.call_count, 1)
+
+    def test_process_stops_after_error(self):
+        data = TextMessage(b'hello').single(mask=False) + \
+               TextMessage(b'world').single(mask=True)
+
+        m = MagicMock()
+        c = MagicMock()
+        rm = MagicMock()
+        ws = WebSocket(sock=m)
+        with patch.multiple(ws, close=c, received_message=rm):
+            self.assertFalse(ws.process(data))
+            c.assert_called_once_with(1002, b'Missing masking when expected')
+            self.assertFalse(rm.called)
+
     def test_spill_frame(self):
         data = b"hello"
         buf = BytesIO(data + b"spillover")
 
         sock = MagicMock()
         sock._ssl = object()  # for WebSocket._is_secure logic
-        sock.recv.side_effect = buf.read
+        sock.recv_into.side_effect = buf.readinto
         sock.pending.side_effect = lambda: buf.tell() < len(buf.getvalue())
 
         ws = WebSocket(sock=sock)
         ws.stream = MagicMock()
+        ws.stream.feed.return_value = []
 
         self.assertTrue(ws._is_secure)
 
         ws.reading_buffer_size = len(data)
-        ws.once()
+        self.assertTrue(ws.once())
+
+        ws.stream.feed.assert_called_once_with(data)
+
+    def test_read_pending_ssl_data_at_once(self):
+        chunks = [b"hello", b"spillover"]
+
+        def recv_into(view):
+            chunk = chunks.pop(0)
+            view[:len(chunk)] = chunk
+            return len(chunk)
+
+        sock = MagicMock()
+        sock._ssl = object()
+        sock.recv_into.side_effect = recv_into
+        sock.pending.side_effect = lambda: len(chunks)
+
+        ws = WebSocket(sock=sock)
+        ws.stream = MagicMock()
+        ws.stream.feed.return_value = []
+
+        self.assertTrue(ws.once())
+        ws.stream.feed.assert_called_once_with(b"hellospillover")
+
+    def test_has_pending_data(self):
+        sock = MagicMock(spec=socket.socket)
+        ws = WebSocket(sock=sock)
+        self.assertFalse(ws.has_pending_data)
+
+        sock = MagicMock()
+        sock.pending.return_value = 10
+        ws = WebSocket(sock=sock)
+        self.assertTrue(ws.has_pending_data)
+        sock.pending.return_value = 0
+        self.assertFalse(ws.has_pending_data)
+
+    def test_read_exhausted(self):
+        data = TextMessage(b'hello').single(mask=True)
+        sock = MagicMock(spec=socket.socket)
+        chunks = [data, data[:4]]
+        def recv_into(view):
+            if not chunks:
+                raise socket.error(errno.EAGAIN, 'again')
+            chunk = chunks.pop(0)
+            view[:len(chunk)] = chunk
+            return len(chunk)
+        sock.recv_into.side_effect = recv_into
+
+        ws = WebSocket(sock=sock)
+        ws.stream.expect_masking = True
+        ws.reading_buffer_size = len(data)
+        self.assertFalse(ws.read_exhausted)
+
+        self.assertTrue(ws.once())
+        self.assertFalse(ws.read_exhausted)
+        self.assertTrue(ws.once())
+        self.assertTrue(ws.read_exhausted)
 
-        ws.stream.parser.send.assert_called_once_with(data)
+        self.assertTrue(ws.once())
+        self.assertTrue(ws.read_exhausted)
 
+        chunks.append(data[4:] + data[:4])
+        self.assertTrue(ws.once())
+        self.assertFalse(ws.read_exhausted)
+
+    def test_receive_buffer_is_reused(self):
+        data = TextMessage(b'hello').single(mask=True)
+        sock = MagicMock()
+        sock.recv_into.side_effect = BytesIO(data * 2).readinto
+
+        ws = WebSocket(sock=sock)
+        ws.stream.expect_masking = True
+        ws.reading_buffer_size = len(data)
+        received = []
+        ws.received_message = lambda m: received.append(bytes(m.data))
+
+        self.assertTrue(ws.once())
+        buffer = ws._recv_buffer
+        self.assertTrue(ws.once())
+        self.assertIs(buffer, ws._recv_buffer)
+        self.assertEqual(received, [b'hello', b'hello'])
+
+
+    def test_nonblocking_send_queues_what_cannot_be_sent(self):
+        sock = MagicMock()
+        sock.send.side_effect = [4, socket.error(errno.EAGAIN, 'again')]
+        notifier = MagicMock()
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking(notifier)
+        sock.setblocking.assert_called_once_with(False)
+
+        ws._write(b'hello world')
+        self.assertFalse(sock.sendall.called)
+        self.assertTrue(ws.write_pending)
+        notifier.assert_called_once_with(ws, True)
+
+        sock.send.side_effect = [7]
+        self.assertTrue(ws.flush())
+        self.assertEqual(bytes(sock.send.call_args[0][0]), b'o world')
+        self.assertFalse(ws.write_pending)
+        notifier.assert_called_with(ws, False)
+        self.assertEqual(notifier.call_count, 2)
+
+    def test_write_limits_pause_writing(self):
+        sock = MagicMock()
+        sock.send.side_effect = socket.error(errno.EAGAIN, 'again')
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking()
+        ws.write_limits = (10, 4)
+
+        self.assertEqual(ws.send(b'hello'), 7)
+        self.assertFalse(ws.writing_paused)
+        self.assertEqual(ws.send(b'world'), 14)
+        self.assertTrue(ws.writing_paused)
+
+        sock.send.side_effect = [8, socket.error(errno.EAGAIN, 'again')]
+        ws.flush()
+        self.assertEqual(ws.buffered_amount, 6)
+        self.assertTrue(ws.writing_paused)
+
+        # the manager isn't running, the queue is sent from drain()
+        sock.send.side_effect = [2, socket.error(errno.EAGAIN, 'again')]
+        self.assertTrue(ws.drain())
+        self.assertEqual(ws.buffered_amount, 4)
+        self.assertFalse(ws.writing_paused)
+
+    def test_drain_waits_for_the_manager(self):
+        sock = MagicMock()
+        sock.send.side_effect = socket.error(errno.EAGAIN, 'again')
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking()
+        ws.manager = MagicMock()
+        ws.manager._in_loop.return_value = False
+        ws.manager._is_loop_thread.return_value = False
+        ws._write(b'hello')
+
+        self.assertFalse(ws.drain(timeout=0.05))
+        self.assertEqual(sock.send.call_count, 1)
+
+        def flush():
+            time.sleep(0.05)
+            sock.send.side_effect = None
+            sock.send.return_value = 5
+            ws.flush()
+        t = threading.Thread(target=flush)
+        t.start()
+        self.assertTrue(ws.drain(timeout=5))
+        t.join()
+        self.assertEqual(ws.buffered_amount, 0)
+
+    def test_manager_thread_never_waits_to_drain(self):
+        sock = MagicMock()
+        sock.send.side_effect = socket.error(errno.EAGAIN, 'again')
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking()
+        ws.write_limits = (1, 0)
+        ws.manager = MagicMock()
+        ws.manager._is_loop_thread.return_value = True
+
+        self.assertEqual(ws.send(x for x in (b'un', b'deux', b'trois')), 17)
+        self.assertTrue(ws.writing_paused)
+        self.assertRaises(RuntimeError, ws.drain)
+
+    def test_generator_sender_is_throttled(self):
+        sent = []
+        def send(data):
+            if not sent:
+                sent.append(None)
+                raise socket.error(errno.EAGAIN, 'again')
+            sent.append(bytes(data))
+            return len(data)
+        sock = MagicMock()
+        sock.send.side_effect = send
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking()
+        ws.write_limits = (1, 0)
+
+        def chunks():
+            for chunk in (b'un', b'deux', b'trois'):
+                # previous fragments were drained
+                self.assertEqual(ws.buffered_amount, 0)
+                yield chunk
+        self.assertEqual(ws.send(chunks()), 0)
+        self.assertEqual(sent[1:], [b'\x01\x02un', b'\x00\x04deux', b'\x80\x05trois'])
+
+    def test_nonblocking_send_keeps_order(self):
+        sock = MagicMock()
+        sock.send.side_effect = socket.error(errno.EWOULDBLOCK, 'again')
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking()
+        ws._write(b'hello')
+        ws._write(b'world')
+        self.assertEqual(sock.send.call_count, 1)
+
+        sent = []
+        def send(data):
+            sent.append(bytes(data))
+            return len(data)
+        sock.send.side_effect = send
+        self.assertTrue(ws.flush())
+        self.assertEqual(sent, [b'hello', b'world'])
+
+    @unittest.skipUnless(hasattr(socket.socket, 'sendmsg'), "sendmsg is not available")
+    def test_send_gathers_frame_parts(self):
+        left, right = socket.socketpair()
+        self.addCleanup(left.close)
+        self.addCleanup(right.close)
+
+        ws = WebSocket(sock=left)
+        ws.send(b'hello world', binary=True)
+        ws._writev(TextMessage(b'a').single_parts() + TextMessage(b'b').single_parts())
+
+        expected = (BinaryMessage(b'hello world').single() +
+                    TextMessage(b'a').single() + TextMessage(b'b').single())
+        self.assertEqual(right.recv(1024), expected)
+
+    @unittest.skipUnless(hasattr(socket.socket, 'sendmsg'), "sendmsg is not available")
+    def test_nonblocking_queue_is_gathered(self):
+        left, right = socket.socketpair()
+        self.addCleanup(left.close)
+        self.addCleanup(right.close)
+
+        ws = WebSocket(sock=left)
+        ws.set_nonblocking()
+        with ws._outbound_lock:
+            ws._outbound.extend([b'hello', b'', b' ', b'world'])
+        self.assertTrue(ws.flush())
+        self.assertEqual(right.recv(1024), b'hello world')
+
+    @patch('ws4py.websocket._wait_writable')
+    def test_close_connection_sends_queued_data(self, wait_writable):
+        sock = MagicMock()
+        sock.send.side_effect = socket.error(errno.EAGAIN, 'again')
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking()
+        ws._write(b'hello')
+        sock.send.side_effect = [socket.error(errno.EAGAIN, 'again'), 5]
+        ws.close_connection()
+
+        self.assertEqual(wait_writable.call_count, 1)
+        self.assertEqual(bytes(sock.send.call_args[0][0]), b'hello')
+        sock.close.assert_called_once_with()
+        self.assertFalse(ws.write_pending)
+
+    @patch('ws4py.websocket.CLOSE_FLUSH_TIMEOUT', 0.1)
+    @patch('ws4py.websocket._wait_writable')
+    def test_close_connection_gives_up_once_for_all_data(self, wait_writable):
+        wait_writable.side_effect = lambda sock, timeout: time.sleep(min(timeout, 0.01))
+        sock = MagicMock()
+        sock.send.side_effect = socket.error(errno.EAGAIN, 'again')
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking()
+        for i in range(10):
+            ws._write(b'hello')
+
+        started = time.time()
+        ws.close_connection()
+        self.assertTrue(time.time() - started < 0.5)
+        sock.close.assert_called_once_with()
+        self.assertEqual(ws.buffered_amount, 0)
+
+    def test_close_connection_lingers(self):
+        sock = MagicMock()
+        sock.send.side_effect = socket.error(errno.EAGAIN, 'again')
+        linger = MagicMock(return_value=True)
+
+        ws = WebSocket(sock=sock)
+        ws.set_nonblocking(linger=linger)
+        ws._write(b'hello')
+        ws.close_connection()
+        linger.assert_called_once_with(ws)
+        self.assertFalse(sock.close.called)
+        self.assertTrue(ws.write_pending)
+
+        sock.send.side_effect = [5]
+        ws.flush()
+        ws.close_connection()
+        self.assertEqual(linger.call_count, 1)
+        sock.close.assert_called_once_with()
 
     @patch("ws4py.websocket.Heartbeat")
     def test_run(self, mocker):
@@ -45,6 +45,8 @@ class WebSocket(_WebSocket):
         _WebSocket.__init__(self, None)
         self.started = False
         self.proto = proto
+        self._loop = None
+        self._resumed = None
 
     @property
     def local_address(self):
@@ -89,13 +91,38 @@ class WebSocket(_WebSocket):
 
     def _write(self, data):
         """
-        Write to the underlying transport
+        Write to the underlying transport which buffers
+        what cannot be sent straight away, see :meth:`drain`.
         """
-        @asyncio.coroutine
-        def sendit(data):
-            self.proto.writer.write(data)
-            yield from self.proto.writer.drain()
-        _asyncio_compat.ensure_future(sendit(data))
+        self.proto.writer.write(data)
+
+    @property
+    def buffered_amount(self):
+        """
+        Amount of bytes buffered by the transport.
+        """
+        return self.proto.writer.transport.get_write_buffer_size()
+
+    @asyncio.coroutine
+    def drain(self, timeout=None):
+        """
+        Coroutine waiting until the transport buffers no more
+        than the low amount of :attr:`write_limits <ws4py.websocket.WebSocket.write_limits>`,
+        or for ``timeout`` seconds. Returns ``False`` when
+        it timed out.
+        """
+        try:
+            yield from asyncio.wait_for(self.proto.writer.drain(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _throttle(self):
+        """
+        The event loop must not be blocked, producers
+        wait with :meth:`drain` themselves.
+        """
+        pass
 
     @asyncio.coroutine
     def run(self):
@@ -106,6 +133,9 @@ class WebSocket(_WebSocket):
         has started.
         """
         self.started = True
+        if self.write_limits is not None:
+            high, low = self.write_limits
+            self.proto.writer.transport.set_write_buffer_limits(high=high, low=low)
         try:
             self.opened()
             reader = self.proto.reader
@@ -113,11 +143,43 @@ class WebSocket(_WebSocket):
                 data = yield from reader.read(self.reading_buffer_size)
                 if not self.process(data):
                     return False
+                if self.reading_paused:
+                    yield from self._wait_resumed()
         finally:
             self.terminate()
 
         return True
 
+    @asyncio.coroutine
+    def _wait_resumed(self):
+        """
+        Coroutine waiting for reading to be resumed, see
+        :attr:`inbound_limits <ws4py.websocket.WebSocket.inbound_limits>`.
+        Meanwhile, the reader's buffer fills up and it pauses
+        reading from the transport.
+        """
+        self._loop = asyncio.get_event_loop()
+        self._resumed = asyncio.Future()
+        try:
+            if self.reading_paused:
+                yield from self._resumed
+        finally:
+            self._resumed = None
+
+    def _inbound(self, size):
+        """
+        Wakes :meth:`run` up once reading is resumed, the
+        dispatcher calls this from another thread.
+        """
+        _WebSocket._inbound(self, size)
+        resumed = self._resumed
+        if resumed is not None and not self.reading_paused:
+            self._loop.call_soon_threadsafe(self._resume, resumed)
+
+    def _resume(self, resumed):
+        if not resumed.done():
+            resumed.set_result(None)
+
 class EchoWebSocket(WebSocket):
     def received_message(self, message):
         """
@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+__doc__ = """
+A broadcast backplane carries the messages broadcast by a
+manager to the managers of other processes, typically the
+workers of a :class:`ws4py.server.prefork.PreforkServer`.
+
+Each process receives a broadcast message once and its
+manager sends it to its own websockets. Messages travel as
+the unmasked frame a :class:`ws4py.messaging.PreparedMessage`
+holds so they are framed once by the sender and parsed once
+by each receiving process.
+
+.. code-block:: python
+
+    from ws4py.backplane import UnixSocketBackplane
+    from ws4py.server.prefork import PreforkServer, WSGIRefWorker
+
+    backplane = UnixSocketBackplane('/tmp/myapp-backplane')
+    worker = WSGIRefWorker(app, backplane=backplane)
+    PreforkServer(worker, port=9000).serve_forever()
+
+Other transports are plugged by subclassing :class:`Backplane`.
+"""
+from collections import deque
+import errno
+import logging
+import os
+import select
+import socket
+import threading
+
+from ws4py.exc import ProtocolException, FrameTooLargeException, \
+     MessageTooLargeException
+from ws4py.framing import FrameParser, OPCODE_BINARY
+from ws4py.messaging import TextMessage, BinaryMessage, PreparedMessage
+
+logger = logging.getLogger('ws4py')
+
+__all__ = ['Backplane', 'UnixSocketBackplane']
+
+WOULD_BLOCK_ERRNOS = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+class Backplane(object):
+    def __init__(self):
+        """
+        Base class of the broadcast backplanes.
+
+        Once attached to a manager, :meth:`publish` is called with
+        every message the manager broadcasts and the backplane
+        calls :meth:`deliver` with the messages published by
+        the other processes.
+        """
+        self.manager = None
+
+    def attach(self, manager):
+        """
+        Attaches the backplane to the ``manager`` of the
+        current process, either a :class:`ws4py.manager.WebSocketManager`
+        or a :class:`ws4py.manager.ShardedWebSocketManager`.
+        """
+        self.manager = manager
+        manager.backplane = self
+
+    def publish(self, message):
+        """
+        Sends the :class:`ws4py.messaging.PreparedMessage`
+        to the other processes.
+        """
+        raise NotImplementedError()
+
+    def deliver(self, message):
+        """
+        Hands a message published by another process
+        over to the local websockets.
+        """
+        manager = self.manager
+        if manager is not None:
+            manager.fanout(message)
+
+    def close(self):
+        """
+        Releases the backplane's resources.
+        """
+        self.manager = None
+
+class _Peer(object):
+    def __init__(self, path, sock):
+        """
+        Non-blocking connection to another process along
+        with the bytes it didn't accept yet.
+        """
+        self.path = path
+        self.sock = sock
+        self.queue = deque()
+        self.size = 0
+
+    def send(self, data=None):
+        """
+        Queues ``data``, if any, then sends as much of the
+        queue as the connection accepts without blocking.
+        Raises ``socket.error`` when the connection failed.
+        """
+        if data:
+            self.queue.append(data)
+            self.size += len(data)
+        while self.queue:
+            try:
+                sent = self.sock.send(self.queue[0])
+            except socket.error as e:
+                if e.errno in WOULD_BLOCK_ERRNOS:
+                    return
+                raise
+            self.size -= sent
+            if sent < len(self.queue[0]):
+                self.queue[0] = self.queue[0][sent:]
+                return
+            self.queue.popleft()
+
+class UnixSocketBackplane(Backplane):
+    def __init__(self, directory, name=None, reading_buffer_size=65536,
+                 max_queued=1 << 22):
+        """
+        A backplane connecting the processes of the same
+        host through Unix domain sockets.
+
+        Each process listens on a socket named after ``name``,
+        its process id by default, within ``directory``. It is
+        created once attached so the backplane can be built
+        before forking the processes sharing it.
+
+        Messages are published to every socket found in
+        ``directory``. Sockets left behind by dead processes
+        are removed.
+
+        Publishing never blocks: what a process doesn't read
+        straight away is queued and sent from the backplane's
+        thread. A process with more than ``max_queued`` bytes
+        waiting is disconnected, and so misses the messages
+        published until it catches up and is connected again.
+        """
+        Backplane.__init__(self)
+        self.directory = directory
+        self.name = name
+        self.reading_buffer_size = reading_buffer_size
+        self.max_queued = max_queued
+
+        self.path = None
+        """
+        Path of the socket this process listens on.
+        """
+
+        self.running = False
+        self._listener = None
+        self._peers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def attach(self, manager):
+        """
+        Listens for the messages of the other processes
+        from a daemon thread and attaches the ``manager``.
+        """
+        Backplane.attach(self, manager)
+
+        try:
+            os.makedirs(self.directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+        name = self.name or str(os.getpid())
+        self.path = os.path.join(self.directory, '%s.sock' % name)
+        # no live process can be using our own name
+        self._unlink(self.path)
+
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.path)
+        self._listener.listen(128)
+
+        self.running = True
+        self._thread = threading.Thread(target=self._receive, name="UnixSocketBackplane")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _unlink(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def _connect(self, path):
+        """
+        Returns the :class:`_Peer` listening on ``path`` or
+        ``None`` when there is none anymore, or it doesn't accept
+        connections right now. Must be called with the lock held.
+        """
+        peer = self._peers.get(path)
+        if peer is not None:
+            return peer
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            sock.connect(path)
+        except socket.error as e:
+            sock.close()
+            if e.errno == errno.ECONNREFUSED:
+                logger.info("Removing stale backplane socket %s" % path)
+                self._unlink(path)
+            return None
+        peer = self._peers[path] = _Peer(path, sock)
+        return peer
+
+    def _drop(self, path, reason):
+        """
+        Closes the connection to the peer listening on
+        ``path``. Must be called with the lock held.
+        """
+        logger.info("Dropping backplane peer %s: %s" % (path, reason))
+        self._peers.pop(path).sock.close()
+
+    def publish(self, message):
+        """
+        Writes the frame of the message to
+        every other process of the directory,
+        or queues it, without blocking.
+        """
+        if not self.running:
+            return
+
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+
+        data = b''.join(message.parts)
+        with self._lock:
+            for name in names:
+                path = os.path.join(self.directory, name)
+                if path == self.path or not name.endswith('.sock'):
+                    continue
+                peer = self._connect(path)
+                if peer is None:
+                    continue
+                try:
+                    peer.send(data)
+                except socket.error as e:
+                    self._drop(path, repr(e))
+                    continue
+                if peer.size > self.max_queued:
+                    self._drop(path, "%d bytes waiting" % peer.size)
+
+            # peers which went away
+            for path in list(self._peers):
+                if os.path.basename(path) not in names:
+                    self._peers.pop(path).sock.close()
+
+    def _flush(self, writable):
+        """
+        Sends what the ``writable`` peers have queued.
+        """
+        with self._lock:
+            for peer in writable:
+                if self._peers.get(peer.path) is not peer:
+                    continue
+                try:
+                    peer.send()
+                except socket.error as e:
+                    self._drop(peer.path, repr(e))
+
+    def _receive(self):
+        """
+        Accepts the connections of the other processes and
+        delivers the messages they publish. Also sends what
+        was queued for the processes which were too slow.
+        """
+        parsers = {}
+        buf = bytearray(self.reading_buffer_size)
+        view = memoryview(buf)
+        while self.running:
+            with self._lock:
+                pending = dict((peer.sock, peer) for peer in self._peers.values()
+                               if peer.queue)
+            try:
+                readable, writable, _ = select.select([self._listener] + list(parsers),
+                                                      list(pending), [], 0.1)
+            except (select.error, ValueError, socket.error):
+                break
+
+            if writable:
+                self._flush([pending[sock] for sock in writable])
+
+            for sock in readable:
+                if sock is self._listener:
+                    try:
+                        conn, addr = sock.accept()
+                    except socket.error:
+                        continue
+                    parsers[conn] = FrameParser()
+                    continue
+
+                try:
+                    received = sock.recv_into(view)
+                except socket.error:
+                    received = 0
+                if not received:
+                    del parsers[sock]
+                    sock.close()
+                    continue
+
+                parser = parsers[sock]
+                parser.feed(view[:received])
+                try:
+                    for frame in parser:
+                        self._deliver_frame(frame)
+                except (ProtocolException, FrameTooLargeException,
+                        MessageTooLargeException) as e:
+                    logger.error("Dropping backplane connection sending invalid frames: %s" % repr(e))
+                    del parsers[sock]
+                    sock.close()
+
+        for sock in parsers:
+            sock.close()
+
+    def _deliver_frame(self, frame):
+        """
+        Delivers the message carried by ``frame``.
+        """
+        data = frame.payload.tobytes()
+        if frame.opcode == OPCODE_BINARY:
+            message = BinaryMessage(data)
+        else:
+            message = TextMessage(data)
+        try:
+            self.deliver(PreparedMessage(message))
+        except Exception as e:
+            logger.exception("Failed to deliver a backplane message: %s" % repr(e))
+
+    def close(self):
+        """
+        Stops listening, closes the connections
+        to the other processes and removes the socket
+        this process listens on.
+        """
+        if not self.running:
+            return
+
+        self.running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._listener.close()
+        self._unlink(self.path)
+
+        with self._lock:
+            for peer in self._peers.values():
+                peer.sock.close()
+            self._peers.clear()
+        Backplane.close(self)
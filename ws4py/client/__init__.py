@@ -7,6 +7,7 @@ import ssl
 
 from ws4py import WS_KEY, WS_VERSION
 from ws4py.exc import HandshakeError
+from ws4py.extensions import PerMessageDeflate, parse_extension
 from ws4py.websocket import WebSocket
 from ws4py.compat import urlsplit
 
@@ -69,6 +70,12 @@ class WebSocketBaseClient(WebSocket):
         You may provide extra headers by passing a list of tuples
         which must be unicode objects.
 
+        The ``extensions`` are requested by name, ``'permessage-deflate'``
+        may also be given as a configured
+        :class:`ws4py.extensions.PerMessageDeflate` instance. Once
+        connected, the :attr:`extensions` attribute holds those
+        the server accepted.
+
         """
         self.url = url
         self.host = None
@@ -198,6 +205,9 @@ class WebSocketBaseClient(WebSocket):
         if not self.client_terminated:
             self.client_terminated = True
             self._write(self.stream.close(code=code, reason=reason).single(mask=True))
+            manager = self.manager
+            if manager is not None:
+                manager.closing(self)
 
     def connect(self):
         """
@@ -250,6 +260,8 @@ class WebSocketBaseClient(WebSocket):
             self.close_connection()
             raise
 
+        self._setup_extensions()
+
         self.handshake_ok()
         if body:
             self.process(body)
@@ -270,6 +282,16 @@ class WebSocketBaseClient(WebSocket):
         if self.protocols:
             headers.append(('Sec-WebSocket-Protocol', ','.join(self.protocols)))
 
+        if self.extensions:
+            offers = []
+            for ext in self.extensions:
+                if isinstance(ext, PerMessageDeflate):
+                    ext = ext.offer()
+                elif ext == PerMessageDeflate.name:
+                    ext = PerMessageDeflate().offer()
+                offers.append(ext)
+            headers.append(('Sec-WebSocket-Extensions', ', '.join(offers)))
+
         if self.extra_headers:
             headers.extend(self.extra_headers)
 
@@ -349,9 +371,28 @@ class WebSocketBaseClient(WebSocket):
                 protocols.extend([x.strip() for x in value.split(b',')])
 
             elif header == b'sec-websocket-extensions':
-                extensions.extend([x.strip() for x in value.split(b',')])
+                for ext in value.split(b','):
+                    ext = ext.strip()
+                    name, params = parse_extension(ext.decode('utf-8'))
+                    if name == PerMessageDeflate.name:
+                        extensions.append(self._accept_deflate(params))
+                    else:
+                        extensions.append(ext)
 
         return protocols, extensions
 
+    def _accept_deflate(self, params):
+        """
+        Validates the permessage-deflate ``params`` the server
+        responded with against what we offered.
+        """
+        for ext in self.extensions or []:
+            if isinstance(ext, PerMessageDeflate):
+                return ext.accept_response(params)
+            elif ext == PerMessageDeflate.name:
+                return PerMessageDeflate().accept_response(params)
+
+        raise HandshakeError("Unexpected extension: %s" % PerMessageDeflate.name)
+
     def handshake_ok(self):
         self.opened()
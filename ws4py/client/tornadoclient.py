@@ -61,6 +61,13 @@ class TornadoWebSocketClient(WebSocketBaseClient):
 
         self.io.write(b)
 
+    def _writev(self, buffers):
+        """
+        Tornado's stream takes care of the socket
+        so buffers are simply joined and written.
+        """
+        self._write(b''.join(buffers))
+
     def __connection_refused(self, *args, **kwargs):
         self.server_terminated = True
         self.closed(1005, 'Connection refused')
@@ -82,14 +89,16 @@ class TornadoWebSocketClient(WebSocketBaseClient):
         try:
             response_line, _, headers = data.partition(b'\r\n')
             self.process_response_line(response_line)
-            protocols, extensions = self.process_handshake_header(headers)
+            self.protocols, self.extensions = self.process_handshake_header(headers)
         except HandshakeError:
             self.close_connection()
             raise
 
+        self._setup_extensions()
+
         self.opened()
         self.io.set_close_callback(self.__stream_closed)
-        self.io.read_bytes(self.reading_buffer_size, self.__fetch_more)
+        self.io.read_bytes(self.reading_buffer_size, self.__fetch_more, partial=True)
 
     def __fetch_more(self, bytes):
         try:
@@ -98,7 +107,7 @@ class TornadoWebSocketClient(WebSocketBaseClient):
             should_continue = False
 
         if should_continue:
-            self.io.read_bytes(self.reading_buffer_size, self.__fetch_more)
+            self.io.read_bytes(self.reading_buffer_size, self.__fetch_more, partial=True)
         else:
             self.__gracefully_terminate()
 
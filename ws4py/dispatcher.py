@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+__doc__ = """
+A dispatcher runs the handlers of websockets, such as
+:meth:`received_message() <ws4py.websocket.WebSocket.received_message>`,
+in a thread pool rather than in the thread reading from
+their connection, the manager's thread usually. A slow
+handler then doesn't hold up the other websockets.
+
+The handlers of a given websocket are still run one at a time,
+in the order their events were received.
+
+.. code-block:: python
+
+    from ws4py.dispatcher import Dispatcher
+    from ws4py.manager import WebSocketManager
+
+    m = WebSocketManager(dispatcher=Dispatcher(max_workers=16))
+
+The default pool is a :class:`concurrent.futures.ThreadPoolExecutor`
+which, on Python 2, requires the ``futures`` package.
+"""
+from collections import deque
+import logging
+import threading
+
+logger = logging.getLogger('ws4py')
+
+__all__ = ['Dispatcher']
+
+class Dispatcher(object):
+    def __init__(self, executor=None, max_workers=None):
+        """
+        Runs the callbacks submitted for each websocket in
+        ``executor``, or a thread pool of ``max_workers`` threads,
+        with one serial queue per websocket.
+        """
+        if executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.executor = executor
+        self.lock = threading.Lock()
+        self._queues = {}
+
+    def __len__(self):
+        """
+        Number of websockets with callbacks
+        waiting or running.
+        """
+        return len(self._queues)
+
+    def pending(self, websocket):
+        """
+        Number of callbacks of the websocket
+        which are still waiting to run.
+        """
+        queue = self._queues.get(websocket)
+        return len(queue) if queue else 0
+
+    def submit(self, websocket, callback, *args):
+        """
+        Queues ``callback(*args)`` to run after the callbacks
+        already submitted for the same ``websocket``.
+        """
+        with self.lock:
+            queue = self._queues.get(websocket)
+            if queue is not None:
+                # the websocket's queue is already being run
+                queue.append((callback, args))
+                return
+            self._queues[websocket] = deque([(callback, args)])
+
+        try:
+            self.executor.submit(self._run, websocket)
+        except RuntimeError as e:
+            # the executor was shut down
+            logger.error("Dropping callbacks of websocket: %s" % repr(e))
+            with self.lock:
+                self._queues.pop(websocket, None)
+
+    def _run(self, websocket):
+        """
+        Runs the queued callbacks of the websocket until
+        there is none left. Handlers raising an error
+        close their websocket.
+        """
+        while True:
+            with self.lock:
+                queue = self._queues[websocket]
+                if not queue:
+                    del self._queues[websocket]
+                    return
+                callback, args = queue.popleft()
+
+            try:
+                callback(*args)
+            except Exception as e:
+                logger.exception("Closing websocket due to exception: %s in %s" % (repr(e), callback.__name__))
+                try:
+                    websocket.close(code=1011, reason='Internal error')
+                except Exception:
+                    pass
+
+    def shutdown(self, wait=True):
+        """
+        Shuts the executor down. Callbacks submitted
+        later are dropped.
+        """
+        self.executor.shutdown(wait=wait)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ['WebSocketException', 'FrameTooLargeException', 'ProtocolException',
+__all__ = ['WebSocketException', 'FrameTooLargeException', 'MessageTooLargeException',
+           'ProtocolException',
            'UnsupportedFrameTypeException', 'TextFrameEncodingException',
            'UnsupportedFrameTypeException', 'TextFrameEncodingException',
            'StreamClosed', 'HandshakeError', 'InvalidBytesError']
@@ -11,6 +12,8 @@ class ProtocolException(WebSocketException): pass
 
 class FrameTooLargeException(WebSocketException): pass
 
+class MessageTooLargeException(FrameTooLargeException): pass
+
 class UnsupportedFrameTypeException(WebSocketException): pass
 
 class TextFrameEncodingException(WebSocketException): pass
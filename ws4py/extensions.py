@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+__doc__ = """
+Websocket extensions negotiated through the
+``Sec-WebSocket-Extensions`` header.
+
+Only the permessage-deflate extension, as defined by :rfc:`7692`,
+is implemented. It is enabled by listing it, either by its name
+or as a configured :class:`PerMessageDeflate` instance, amongst
+the extensions of a server or a client:
+
+.. code-block:: python
+
+    >>> from ws4py.extensions import PerMessageDeflate
+    >>> from ws4py.server.wsgiutils import WebSocketWSGIApplication
+    >>> app = WebSocketWSGIApplication(extensions=['permessage-deflate'])
+    >>> app = WebSocketWSGIApplication(extensions=[PerMessageDeflate(server_no_context_takeover=True)])
+
+Other extensions are still matched as plain strings and
+are not implemented by ws4py.
+"""
+import zlib
+
+from ws4py.exc import HandshakeError
+
+__all__ = ['PerMessageDeflate', 'parse_extension', 'negotiate_extensions']
+
+# Removed from, and appended back to, each compressed message
+# as per RFC 7692 section 7.2.1
+DEFLATE_TAIL = b'\x00\x00\xff\xff'
+
+def parse_extension(offer):
+    """
+    Parses one extension, as found in a ``Sec-WebSocket-Extensions``
+    header, into a ``(name, params)`` tuple where ``params`` is the
+    list of ``(name, value)`` tuples of its parameters. A parameter
+    without a value has ``None`` as value.
+    """
+    parts = offer.split(';')
+    params = []
+    for param in parts[1:]:
+        param = param.strip()
+        if not param:
+            continue
+        name, sep, value = param.partition('=')
+        value = value.strip().strip('"') if sep else None
+        params.append((name.strip(), value))
+    return parts[0].strip(), params
+
+def _window_bits(value, minimum=8):
+    try:
+        bits = int(value)
+    except (TypeError, ValueError):
+        return None
+    if minimum <= bits <= 15 and str(bits) == value:
+        return bits
+    return None
+
+class PerMessageDeflate(object):
+    name = 'permessage-deflate'
+
+    def __init__(self, server_no_context_takeover=False,
+                 client_no_context_takeover=False,
+                 server_max_window_bits=None,
+                 client_max_window_bits=None,
+                 compression_level=zlib.Z_DEFAULT_COMPRESSION):
+        """
+        The permessage-deflate extension compresses the payload
+        of data messages with the DEFLATE algorithm.
+
+        An instance created by the application describes what
+        it asks for during the handshake:
+
+        * ``server_no_context_takeover``: the server starts with a new
+          compression context for each message
+        * ``client_no_context_takeover``: the client starts with a new
+          compression context for each message
+        * ``server_max_window_bits``: the LZ77 window size, in bits,
+          the server compresses with
+        * ``client_max_window_bits``: the LZ77 window size, in bits,
+          the client compresses with
+
+        Window sizes range from 9 to 15 bits, ``None`` leaving it to
+        the peer. ``zlib`` does not support a window of 8 bits so
+        handshakes requiring it are declined.
+
+        The handshake returns a new, negotiated, instance which
+        does the actual compression with ``compression_level``
+        and decompression. Its :attr:`is_server` attribute tells
+        which end of the connection it belongs to.
+        """
+        for bits in (server_max_window_bits, client_max_window_bits):
+            if bits is not None and not 9 <= bits <= 15:
+                raise ValueError("Window bits must be between 9 and 15: %r" % bits)
+
+        self.server_no_context_takeover = server_no_context_takeover
+        self.client_no_context_takeover = client_no_context_takeover
+        self.server_max_window_bits = server_max_window_bits
+        self.client_max_window_bits = client_max_window_bits
+        self.compression_level = compression_level
+
+        self.is_server = None
+        """
+        ``None`` until negotiated, then ``True`` on the
+        server side and ``False`` on the client side.
+        """
+
+        self._compressor = None
+        self._decompressor = None
+
+    def __str__(self):
+        params = [self.name]
+        if self.server_no_context_takeover:
+            params.append('server_no_context_takeover')
+        if self.client_no_context_takeover:
+            params.append('client_no_context_takeover')
+        if self.server_max_window_bits:
+            params.append('server_max_window_bits=%d' % self.server_max_window_bits)
+        if self.client_max_window_bits:
+            params.append('client_max_window_bits=%d' % self.client_max_window_bits)
+        return '; '.join(params)
+
+    def _negotiated(self, is_server, server_no_context_takeover,
+                    client_no_context_takeover, server_max_window_bits,
+                    client_max_window_bits):
+        ext = PerMessageDeflate(compression_level=self.compression_level)
+        ext.server_no_context_takeover = server_no_context_takeover
+        ext.client_no_context_takeover = client_no_context_takeover
+        ext.server_max_window_bits = server_max_window_bits
+        ext.client_max_window_bits = client_max_window_bits
+        ext.is_server = is_server
+        return ext
+
+    def offer(self):
+        """
+        Returns the value of the ``Sec-WebSocket-Extensions``
+        header a client sends to request this extension.
+        """
+        offer = str(self)
+        if not self.client_max_window_bits:
+            # tells the server we could use a smaller window
+            offer += '; client_max_window_bits'
+        return offer
+
+    def accept(self, params):
+        """
+        Server side negotiation of a client offer whose parameters
+        are given as a list of ``(name, value)`` tuples. Returns the
+        negotiated extension or ``None`` when the offer cannot
+        be accepted.
+        """
+        names = [name for name, value in params]
+        if len(set(names)) != len(names):
+            return None
+
+        server_no_context_takeover = self.server_no_context_takeover
+        client_no_context_takeover = self.client_no_context_takeover
+        server_max_window_bits = self.server_max_window_bits
+        client_max_window_bits = None
+
+        for name, value in params:
+            if name == 'server_no_context_takeover':
+                if value is not None:
+                    return None
+                server_no_context_takeover = True
+            elif name == 'client_no_context_takeover':
+                if value is not None:
+                    return None
+                client_no_context_takeover = True
+            elif name == 'server_max_window_bits':
+                # we compress with it, zlib can't use 8 bits
+                bits = _window_bits(value, minimum=9)
+                if bits is None:
+                    return None
+                server_max_window_bits = min(bits, server_max_window_bits or 15)
+            elif name == 'client_max_window_bits':
+                bits = 15
+                if value is not None:
+                    bits = _window_bits(value)
+                    if bits is None:
+                        return None
+                if self.client_max_window_bits:
+                    client_max_window_bits = min(bits, self.client_max_window_bits)
+            else:
+                return None
+
+        return self._negotiated(True, server_no_context_takeover,
+                                client_no_context_takeover,
+                                server_max_window_bits,
+                                client_max_window_bits)
+
+    def accept_response(self, params):
+        """
+        Client side validation of the parameters, a list of
+        ``(name, value)`` tuples, the server responded with to
+        the :meth:`offer`. Returns the negotiated extension
+        or raises :exc:`ws4py.exc.HandshakeError`.
+        """
+        names = [name for name, value in params]
+        if len(set(names)) != len(names):
+            raise HandshakeError("Duplicated %s parameters" % self.name)
+
+        server_no_context_takeover = False
+        client_no_context_takeover = self.client_no_context_takeover
+        server_max_window_bits = None
+        client_max_window_bits = self.client_max_window_bits
+
+        for name, value in params:
+            if name == 'server_no_context_takeover' and value is None:
+                server_no_context_takeover = True
+            elif name == 'client_no_context_takeover' and value is None:
+                client_no_context_takeover = True
+            elif name == 'server_max_window_bits':
+                bits = _window_bits(value)
+                if bits is None or bits > (self.server_max_window_bits or 15):
+                    raise HandshakeError("Invalid server_max_window_bits: %s" % value)
+                server_max_window_bits = bits
+            elif name == 'client_max_window_bits':
+                # we compress with it, zlib can't use 8 bits
+                bits = _window_bits(value, minimum=9)
+                if bits is None or bits > (self.client_max_window_bits or 15):
+                    raise HandshakeError("Invalid client_max_window_bits: %s" % value)
+                client_max_window_bits = bits
+            else:
+                raise HandshakeError("Invalid %s parameter: %s" % (self.name, name))
+
+        if self.server_no_context_takeover and not server_no_context_takeover:
+            raise HandshakeError("Missing server_no_context_takeover")
+
+        return self._negotiated(False, server_no_context_takeover,
+                                client_no_context_takeover,
+                                server_max_window_bits,
+                                client_max_window_bits)
+
+    def compress(self, data, final=True):
+        """
+        Compresses ``data``, the whole payload of a message or one
+        of its fragments. Set ``final`` unless more fragments of the
+        same message follow.
+        """
+        if self.is_server:
+            no_context_takeover = self.server_no_context_takeover
+            bits = self.server_max_window_bits or 15
+        else:
+            no_context_takeover = self.client_no_context_takeover
+            bits = self.client_max_window_bits or 15
+
+        if self._compressor is None:
+            self._compressor = zlib.compressobj(self.compression_level,
+                                                zlib.DEFLATED, -bits)
+
+        data = self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        if final:
+            if data.endswith(DEFLATE_TAIL):
+                data = data[:-4]
+            if no_context_takeover:
+                self._compressor = None
+        return data
+
+    def decompress(self, data, final=True, max_length=0):
+        """
+        Decompresses ``data``, the payload of a compressed message
+        or one of its fragments. Set ``final`` for its last fragment.
+
+        When ``max_length`` is set, no more than that many bytes
+        are inflated. The rest of ``data`` is then dropped so it
+        is only meant to detect messages which are too large.
+
+        Raises ``zlib.error`` when ``data`` is invalid.
+        """
+        if self.is_server:
+            no_context_takeover = self.client_no_context_takeover
+        else:
+            no_context_takeover = self.server_no_context_takeover
+
+        # the largest window can inflate data deflated with any window size
+        if self._decompressor is None:
+            self._decompressor = zlib.decompressobj(-15)
+
+        data = bytes(data)
+        if final:
+            data += DEFLATE_TAIL
+        data = self._decompressor.decompress(data, max_length)
+        if final and no_context_takeover:
+            self._decompressor = None
+        return data
+
+    def decompress_chunks(self, data, final=True, max_length=0, chunk_size=65536):
+        """
+        Same as :meth:`decompress` but yields the inflated
+        bytes by chunks of at most ``chunk_size`` bytes so that
+        a small payload never inflates into a large buffer.
+        """
+        if self.is_server:
+            no_context_takeover = self.client_no_context_takeover
+        else:
+            no_context_takeover = self.server_no_context_takeover
+
+        if self._decompressor is None:
+            self._decompressor = zlib.decompressobj(-15)
+
+        data = bytes(data)
+        if final:
+            data += DEFLATE_TAIL
+        inflated = 0
+        while True:
+            size = chunk_size
+            if max_length:
+                size = min(size, max_length - inflated)
+                if size <= 0:
+                    break
+            chunk = self._decompressor.decompress(data, size)
+            data = self._decompressor.unconsumed_tail
+            if not chunk:
+                break
+            inflated += len(chunk)
+            yield chunk
+            # a full chunk may leave some output pending
+            if not data and len(chunk) < size:
+                break
+        if final and no_context_takeover:
+            self._decompressor = None
+
+def negotiate_extensions(header, supported):
+    """
+    Server side negotiation of the extensions requested by a
+    client through the ``Sec-WebSocket-Extensions`` ``header``.
+
+    ``supported`` lists the extensions the server accepts: names,
+    or :class:`PerMessageDeflate` instances. Plain names other
+    than ``'permessage-deflate'`` must match the requested
+    extension exactly, parameters included.
+
+    Returns the list of accepted extensions, names or negotiated
+    instances, which are joined with ``','`` to build
+    the response header.
+    """
+    accepted = []
+    if not header:
+        return accepted
+
+    deflate = None
+    for ext in supported or []:
+        if isinstance(ext, PerMessageDeflate):
+            deflate = ext
+        elif ext == PerMessageDeflate.name:
+            deflate = PerMessageDeflate()
+
+    for offer in header.split(','):
+        offer = offer.strip()
+        name, params = parse_extension(offer)
+        if name == PerMessageDeflate.name:
+            # only the first acceptable offer is used
+            if deflate is not None:
+                negotiated = deflate.accept(params)
+                if negotiated is not None:
+                    accepted.append(negotiated)
+                    deflate = None
+        elif offer in (supported or []):
+            accepted.append(offer)
+
+    return accepted
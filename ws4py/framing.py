@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
-from struct import pack, unpack
+from collections import namedtuple
+from struct import pack, unpack, unpack_from
 
-from ws4py.exc import FrameTooLargeException, ProtocolException
-from ws4py.compat import py3k, ord, range
+from ws4py import masking
+from ws4py.exc import FrameTooLargeException, MessageTooLargeException, ProtocolException
+from ws4py.compat import ord
 
 # Frame opcodes defined in the spec.
 OPCODE_CONTINUATION = 0x0
@@ -12,7 +14,7 @@ OPCODE_CLOSE = 0x8
 OPCODE_PING = 0x9
 OPCODE_PONG = 0xa
 
-__all__ = ['Frame']
+__all__ = ['Frame', 'FrameParser', 'FrameRecord', 'FrameChunk']
 
 class Frame(object):
     def __init__(self, opcode=None, body=b'', masking_key=None, fin=0, rsv1=0, rsv2=0, rsv3=0):
@@ -67,6 +69,18 @@ class Frame(object):
         Builds a frame from the instance's attributes and returns
         its bytes representation.
         """
+        return b''.join(self.build_parts())
+
+    def build_parts(self):
+        """
+        Builds a frame from the instance's attributes and returns
+        it as a ``(header, payload)`` tuple of buffers, ready to be
+        handed over to ``socket.sendmsg``. The header holds the
+        masking key, if any.
+
+        An unmasked frame's payload is its body itself so
+        it is never copied.
+        """
         header = b''
 
         if self.fin > 0x1:
@@ -119,9 +133,9 @@ class Frame(object):
         ## +---------------------------------------------------------------+
         body = self.body
         if not self.masking_key:
-            return bytes(header + body)
+            return header, body
 
-        return bytes(header + self.masking_key + self.mask(body))
+        return header + self.masking_key, bytes(self.mask(body))
 
     def _parsing(self):
         """
@@ -263,11 +277,279 @@ class Frame(object):
            j                   = i MOD 4
            transformed-octet-i = original-octet-i XOR masking-key-octet-j
 
+        The whole buffer is processed at once by the engine
+        selected in :mod:`ws4py.masking`.
         """
-        masked = bytearray(data)
-        if py3k: key = self.masking_key
-        else: key = map(ord, self.masking_key)
-        for i in range(len(data)):
-            masked[i] = masked[i] ^ key[i%4]
-        return masked
+        return masking.mask(self.masking_key, data)
     unmask = mask
+
+
+FrameRecord = namedtuple('FrameRecord', ['opcode', 'fin', 'rsv', 'masking_key', 'payload'])
+"""
+A complete frame returned by :class:`FrameParser`. ``rsv`` holds
+the three reserved bits (RSV1 being ``0x4``), ``masking_key`` is
+``None`` when the frame isn't masked and ``payload`` is a
+:func:`memoryview` over the parser's buffer, still masked.
+"""
+
+FrameChunk = namedtuple('FrameChunk', ['opcode', 'fin', 'rsv', 'masking_key',
+                                       'payload', 'offset', 'last'])
+"""
+Part of the payload of a frame returned by :class:`FrameParser`
+as it arrives, see :attr:`FrameParser.chunk_threshold`. Its
+header fields are the frame's, ``offset`` is the position of
+``payload`` in the frame's payload, needed to unmask it, and
+``last`` tells whether it completes the frame.
+"""
+
+class FrameParser(object):
+    def __init__(self, allowed_rsv=0, max_frame_size=None, max_message_size=None):
+        """
+        Incremental frame parser working over a single receive
+        buffer using integer offsets.
+
+        Unlike :attr:`Frame.parser`, it accepts any amount of
+        bytes at once, however many frames they contain, and doesn't
+        need a new generator per frame. Complete frames are returned
+        as :class:`FrameRecord` instances whose payload is a view
+        over the receive buffer, nothing is copied.
+
+        .. code-block:: python
+
+           >>> p = FrameParser()
+           >>> p.feed(some_bytes)
+           >>> for frame in p:
+           ...     print(frame.opcode, frame.fin, bytes(frame.payload))
+
+        Payload views are only valid until the next call to
+        :meth:`feed` which may discard the bytes they point to.
+
+        Frames with reserved bits set are invalid unless
+        they are part of ``allowed_rsv``, as when an extension
+        using them was negotiated.
+
+        Frames whose payload is longer than ``max_frame_size``
+        bytes, and frames which would bring the payload of their
+        data message past ``max_message_size`` bytes, are rejected
+        as soon as their header is parsed, before their payload
+        is buffered.
+
+        Frames of binary messages longer than :attr:`chunk_threshold`
+        are returned piece by piece, as :class:`FrameChunk`
+        instances, instead of being buffered whole.
+        """
+        self.allowed_rsv = allowed_rsv
+        """
+        Reserved bits frames may have set, RSV1 being ``0x4``.
+        """
+
+        self.max_frame_size = max_frame_size
+        """
+        Largest payload, in bytes, of a frame. Not limited when ``None``.
+        """
+
+        self.max_message_size = max_message_size
+        """
+        Largest payload, in bytes, of a data message, summed
+        over its fragments. Not limited when ``None``.
+        """
+        self._message_length = 0
+        self._message_opcode = None
+
+        self.chunk_threshold = None
+        """
+        Payload length, in bytes, past which the frames of binary
+        messages are returned as :class:`FrameChunk` instances
+        holding whatever part of their payload was received,
+        rather than as a :class:`FrameRecord` once complete.
+        Not chunked when ``None``.
+        """
+        self._chunked = None
+
+        self.buffer = bytearray()
+        """
+        Receive buffer holding the bytes not yet consumed
+        from :attr:`offset`.
+        """
+
+        self.offset = 0
+        """
+        Position of the first byte of the next frame in :attr:`buffer`.
+        """
+
+        self.needed = 2
+        """
+        Minimum amount of bytes still required to
+        complete the next frame.
+        """
+
+    def __iter__(self):
+        frame = self.next_frame()
+        while frame is not None:
+            yield frame
+            frame = self.next_frame()
+
+    @property
+    def buffered(self):
+        """
+        Amount of received bytes not yet returned as part of a frame.
+        """
+        return len(self.buffer) - self.offset
+
+    def feed(self, data):
+        """
+        Appends ``data`` to the receive buffer.
+        """
+        if self.offset:
+            # Consumed frames are dropped by creating a new buffer
+            # rather than resizing the current one in place, payload
+            # views handed out may still reference it.
+            if self.offset == len(self.buffer):
+                self.buffer = bytearray()
+            else:
+                self.buffer = self.buffer[self.offset:]
+            self.offset = 0
+        self.buffer += data
+
+    def reset(self):
+        """
+        Discards everything that was buffered.
+        """
+        self.buffer = bytearray()
+        self.offset = 0
+        self.needed = 2
+        self._message_length = 0
+        self._message_opcode = None
+        self._chunked = None
+
+    def next_frame(self):
+        """
+        Returns the next complete frame as a :class:`FrameRecord`,
+        or the next part of a chunked one as a :class:`FrameChunk`,
+        or ``None`` when more bytes are required.
+
+        Raises :exc:`ws4py.exc.ProtocolException` or
+        :exc:`ws4py.exc.FrameTooLargeException` as soon as the
+        header shows the frame is invalid, and
+        :exc:`ws4py.exc.MessageTooLargeException` when it
+        goes past :attr:`max_frame_size` or :attr:`max_message_size`.
+        """
+        if self._chunked is not None:
+            return self._next_chunk()
+
+        buf = self.buffer
+        start = self.offset
+        available = len(buf) - start
+        if available < 2:
+            self.needed = 2 - available
+            return None
+
+        first_byte = buf[start]
+        second_byte = buf[start + 1]
+        fin = (first_byte >> 7) & 1
+        rsv = (first_byte >> 4) & 0x7
+        opcode = first_byte & 0xf
+
+        if rsv & ~self.allowed_rsv:
+            raise ProtocolException()
+
+        # control frames between 3 and 7 as well as above 0xA are currently reserved
+        if 2 < opcode < 8 or opcode > 0xA:
+            raise ProtocolException()
+
+        # control frames cannot be fragmented
+        if opcode > 0x7 and fin == 0:
+            raise ProtocolException()
+
+        masked = (second_byte >> 7) & 1
+        length = second_byte & 0x7f
+
+        # All control frames MUST have a payload length of 125 bytes or less
+        if opcode > 0x7 and length > 125:
+            raise FrameTooLargeException()
+
+        header_length = 2
+        if length == 126:
+            header_length = 4
+        elif length == 127:
+            header_length = 10
+
+        # the length is checked before waiting for the masking key
+        if available < header_length:
+            self.needed = header_length - available + (4 if masked else 0)
+            return None
+
+        pos = start + 2
+        if length == 126:
+            length = unpack_from('!H', buf, pos)[0]
+            pos += 2
+        elif length == 127:
+            length = unpack_from('!Q', buf, pos)[0]
+            if length > 0x7FFFFFFFFFFFFFFF:
+                raise FrameTooLargeException()
+            pos += 8
+
+        if self.max_frame_size is not None and length > self.max_frame_size:
+            raise MessageTooLargeException()
+
+        message_length = self._message_length
+        if opcode < 0x8:
+            message_length = message_length + length if opcode == 0 else length
+            if self.max_message_size is not None and message_length > self.max_message_size:
+                raise MessageTooLargeException()
+
+        masking_key = None
+        if masked:
+            header_length += 4
+            if available < header_length:
+                self.needed = header_length - available
+                return None
+            masking_key = bytes(buf[pos:pos + 4])
+            pos += 4
+
+        chunked = self.chunk_threshold is not None and length > self.chunk_threshold and \
+            (opcode == OPCODE_BINARY or (opcode == 0 and self._message_opcode == OPCODE_BINARY))
+
+        end = pos + length
+        if len(buf) < end and not chunked:
+            self.needed = end - len(buf)
+            return None
+
+        if opcode < 0x8:
+            self._message_length = 0 if fin else message_length
+            if opcode:
+                self._message_opcode = opcode
+
+        if chunked:
+            self.offset = pos
+            self._chunked = [opcode, fin, rsv, masking_key, 0, length]
+            return self._next_chunk()
+
+        self.offset = end
+        self.needed = 2
+        return FrameRecord(opcode, fin, rsv, masking_key,
+                           memoryview(buf)[pos:end])
+
+    def _next_chunk(self):
+        """
+        Returns the received part of the payload of the
+        frame being chunked, if any, as a :class:`FrameChunk`.
+        """
+        opcode, fin, rsv, masking_key, offset, remaining = self._chunked
+        start = self.offset
+        size = min(len(self.buffer) - start, remaining)
+        if not size:
+            self.needed = remaining
+            return None
+
+        end = start + size
+        self.offset = end
+        remaining -= size
+        if remaining:
+            self._chunked[4:] = [offset + size, remaining]
+            self.needed = remaining
+        else:
+            self._chunked = None
+            self.needed = 2
+        return FrameChunk(opcode, fin, rsv, masking_key,
+                          memoryview(self.buffer)[start:end], offset, not remaining)
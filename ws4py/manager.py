@@ -37,30 +37,60 @@ A simple usage for handling websocket clients:
 
     m.join()  # blocks forever
 
+A single manager runs in one thread. A :class:`ShardedWebSocketManager`
+spreads websockets over several managers instead:
+
+.. code-block:: python
+
+    from ws4py.manager import ShardedWebSocketManager
+
+    m = ShardedWebSocketManager(shards=4, policy='round-robin')
+
 Managers are not compulsory but hopefully will help your
 workflow. For clients, you can still rely on threaded, gevent or
 tornado based implementations of course.
 """
+from collections import OrderedDict
+import itertools
 import logging
+import math
+import multiprocessing
+import os
 import select
+import socket
 import threading
 import time
+try:
+    import selectors
+except ImportError:
+    selectors = None
 
 from ws4py import format_addresses
-from ws4py.compat import py3k
+from ws4py.compat import py3k, basestring
+from ws4py.framing import OPCODE_BINARY
+from ws4py.messaging import PreparedMessage, PongControlMessage
+from ws4py.timers import TimerWheel
+from ws4py.websocket import CLOSE_FLUSH_TIMEOUT
 
 logger = logging.getLogger('ws4py')
 
+EVENT_READ = 1
+EVENT_WRITE = 2
+
 class SelectPoller(object):
     def __init__(self, timeout=0.1):
         """
         A socket poller that uses the `select`
         implementation to determines which
-        file descriptors have data available to read.
+        file descriptors are ready to be read
+        from or written to.
 
-        It is available on all platforms.
+        It is available on all platforms but cannot
+        watch file descriptors above ``FD_SETSIZE``,
+        usually 1024.
         """
         self._fds = []
+        self._wfds = []
         self.timeout = timeout
 
     def release(self):
@@ -68,47 +98,95 @@ class SelectPoller(object):
         Cleanup resources.
         """
         self._fds = []
+        self._wfds = []
 
-    def register(self, fd):
+    def register(self, fd, events=EVENT_READ):
         """
         Register a new file descriptor to be
         part of the select polling next time around.
+        Only read events are watched unless
+        ``events`` says otherwise.
         """
-        if fd not in self._fds:
-            self._fds.append(fd)
+        self.modify(fd, events)
+
+    def modify(self, fd, events):
+        """
+        Changes the events watched on the given
+        file descriptor to ``events``, a combination
+        of ``EVENT_READ`` and ``EVENT_WRITE``.
+        """
+        for fds, event in ((self._fds, EVENT_READ), (self._wfds, EVENT_WRITE)):
+            if events & event:
+                if fd not in fds:
+                    fds.append(fd)
+            elif fd in fds:
+                fds.remove(fd)
 
     def unregister(self, fd):
         """
         Unregister the given file descriptor.
         """
-        if fd in self._fds:
-            self._fds.remove(fd)
+        self.modify(fd, 0)
 
-    def poll(self):
+    def poll_events(self, timeout=None):
         """
-        Polls once and returns a list of
-        ready-to-be-read file descriptors.
+        Polls once and returns a list of ``(fd, events)``
+        tuples where ``events`` is a combination of
+        ``EVENT_READ`` and ``EVENT_WRITE``.
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
         """
-        if not self._fds:
-            time.sleep(self.timeout)
+        if timeout is None:
+            timeout = self.timeout
+        if not self._fds and not self._wfds:
+            if timeout:
+                time.sleep(timeout)
             return []
         try:
-            r, w, x = select.select(self._fds, [], [], self.timeout)
+            r, w, x = select.select(self._fds, self._wfds, [], timeout)
         except IOError as e:
             return []
-        return r
+        ready = [(fd, EVENT_READ | (EVENT_WRITE if fd in w else 0)) for fd in r]
+        ready.extend([(fd, EVENT_WRITE) for fd in w if fd not in r])
+        return ready
+
+    def poll(self, timeout=None):
+        """
+        Polls once and returns a list of
+        ready-to-be-read file descriptors.
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        return [fd for fd, events in self.poll_events(timeout)
+                if events & EVENT_READ]
+
+# Not exposed by the select module of Python 2
+EPOLLRDHUP = getattr(select, 'EPOLLRDHUP', 0x2000)
+EPOLLET = getattr(select, 'EPOLLET', 1 << 31)
 
 class EPollPoller(object):
-    def __init__(self, timeout=0.1):
+    def __init__(self, timeout=0.1, edge_triggered=False):
         """
         An epoll poller that uses the ``epoll``
         implementation to determines which
-        file descriptors have data available to read.
+        file descriptors are ready to be read
+        from or written to.
+
+        When ``edge_triggered`` is set, file descriptors
+        are only reported when they become ready rather than
+        for as long as they are. Their owner must then read,
+        or write, until the operation would block. The peer
+        hanging up is reported as a read event too.
 
         Available on Unix flavors mostly.
         """
         self.poller = select.epoll()
         self.timeout = timeout
+        self.edge_triggered = edge_triggered
 
     def release(self):
         """
@@ -116,13 +194,38 @@ class EPollPoller(object):
         """
         self.poller.close()
 
-    def register(self, fd):
+    def _mask(self, events):
+        mask = 0
+        if events & EVENT_READ:
+            mask |= select.EPOLLIN | select.EPOLLPRI
+            if self.edge_triggered:
+                mask |= EPOLLRDHUP
+        if events & EVENT_WRITE:
+            mask |= select.EPOLLOUT
+        if self.edge_triggered:
+            mask |= EPOLLET
+        return mask
+
+    def register(self, fd, events=EVENT_READ):
         """
         Register a new file descriptor to be
         part of the select polling next time around.
+        Only read events are watched unless
+        ``events`` says otherwise.
+        """
+        try:
+            self.poller.register(fd, self._mask(events))
+        except IOError:
+            pass
+
+    def modify(self, fd, events):
+        """
+        Changes the events watched on the given
+        file descriptor to ``events``, a combination
+        of ``EVENT_READ`` and ``EVENT_WRITE``.
         """
         try:
-            self.poller.register(fd, select.EPOLLIN | select.EPOLLPRI)
+            self.poller.modify(fd, self._mask(events))
         except IOError:
             pass
 
@@ -130,71 +233,450 @@ class EPollPoller(object):
         """
         Unregister the given file descriptor.
         """
-        self.poller.unregister(fd)
+        try:
+            self.poller.unregister(fd)
+        except IOError:
+            pass
 
-    def poll(self):
+    def poll_events(self, timeout=None):
+        """
+        Polls once and returns a list of ``(fd, events)``
+        tuples where ``events`` is a combination of
+        ``EVENT_READ`` and ``EVENT_WRITE``. Hang ups and
+        errors are reported as read events so that
+        they get noticed when reading.
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is None:
+            timeout = -1
+        try:
+            events = self.poller.poll(timeout=timeout)
+        except IOError:
+            events = []
+
+        readable = select.EPOLLIN | select.EPOLLPRI | select.EPOLLHUP | select.EPOLLERR | EPOLLRDHUP
+        ready = []
+        for fd, event in events:
+            mask = 0
+            if event & readable:
+                mask |= EVENT_READ
+            if event & select.EPOLLOUT:
+                mask |= EVENT_WRITE
+            ready.append((fd, mask))
+        return ready
+
+    def poll(self, timeout=None):
         """
         Polls once and yields each ready-to-be-read
         file-descriptor
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        for fd, events in self.poll_events(timeout):
+            if events & EVENT_READ:
+                yield fd
+
+class PollPoller(object):
+    def __init__(self, timeout=0.1):
+        """
+        A poller that uses the ``poll`` implementation
+        to determines which file descriptors are ready
+        to be read from or written to.
+
+        Unlike :class:`SelectPoller`, it isn't limited
+        to ``FD_SETSIZE`` file descriptors and registering
+        one doesn't depend on how many are registered.
+
+        Available on Unix flavors mostly.
         """
+        self.poller = select.poll()
+        self.timeout = timeout
+        self._fds = {}
+
+    def release(self):
+        """
+        Cleanup resources.
+        """
+        for fd in list(self._fds):
+            self.unregister(fd)
+
+    def _mask(self, events):
+        mask = 0
+        if events & EVENT_READ:
+            mask |= select.POLLIN | select.POLLPRI
+        if events & EVENT_WRITE:
+            mask |= select.POLLOUT
+        return mask
+
+    def register(self, fd, events=EVENT_READ):
+        """
+        Register a new file descriptor to be
+        part of the select polling next time around.
+        Only read events are watched unless
+        ``events`` says otherwise.
+        """
+        self.modify(fd, events)
+
+    def modify(self, fd, events):
+        """
+        Changes the events watched on the given
+        file descriptor to ``events``, a combination
+        of ``EVENT_READ`` and ``EVENT_WRITE``.
+        """
+        if not events:
+            self.unregister(fd)
+            return
+        self.poller.register(fd, self._mask(events))
+        self._fds[fd] = events
+
+    def unregister(self, fd):
+        """
+        Unregister the given file descriptor.
+        """
+        if self._fds.pop(fd, None) is not None:
+            self.poller.unregister(fd)
+
+    def poll_events(self, timeout=None):
+        """
+        Polls once and returns a list of ``(fd, events)``
+        tuples where ``events`` is a combination of
+        ``EVENT_READ`` and ``EVENT_WRITE``. Hang ups and
+        errors are reported as read events so that
+        they get noticed when reading.
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if timeout is not None:
+            # poll() expects milliseconds
+            timeout = int(math.ceil(timeout * 1000))
         try:
-            events = self.poller.poll(timeout=self.timeout)
-        except IOError:
+            events = self.poller.poll(timeout)
+        except (IOError, select.error):
             events = []
 
+        readable = select.POLLIN | select.POLLPRI | select.POLLHUP | select.POLLERR | select.POLLNVAL
+        ready = []
         for fd, event in events:
-            if event | select.EPOLLIN | select.EPOLLPRI:
+            mask = 0
+            if event & readable:
+                mask |= EVENT_READ
+            if event & select.POLLOUT:
+                mask |= EVENT_WRITE
+            ready.append((fd, mask))
+        return ready
+
+    def poll(self, timeout=None):
+        """
+        Polls once and yields each ready-to-be-read
+        file-descriptor
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        for fd, events in self.poll_events(timeout):
+            if events & EVENT_READ:
                 yield fd
 
 class KQueuePoller(object):
     def __init__(self, timeout=0.1):
         """
-        An epoll poller that uses the ``epoll``
+        A kqueue poller that uses the ``kqueue``
         implementation to determines which
-        file descriptors have data available to read.
+        file descriptors are ready to be read
+        from or written to.
 
-        Available on Unix flavors mostly.
+        Available on BSD flavors and macOS.
         """
-        self.poller = select.epoll()
+        self.poller = select.kqueue()
         self.timeout = timeout
+        self._fds = {}
 
     def release(self):
         """
         Cleanup resources.
         """
         self.poller.close()
+        self._fds = {}
 
-    def register(self, fd):
+    def register(self, fd, events=EVENT_READ):
         """
         Register a new file descriptor to be
         part of the select polling next time around.
+        Only read events are watched unless
+        ``events`` says otherwise.
         """
-        try:
-            self.poller.register(fd, select.EPOLLIN | select.EPOLLPRI)
-        except IOError:
-            pass
+        self.modify(fd, events)
+
+    def modify(self, fd, events):
+        """
+        Changes the events watched on the given
+        file descriptor to ``events``, a combination
+        of ``EVENT_READ`` and ``EVENT_WRITE``.
+        """
+        current = self._fds.get(fd, 0)
+        changes = []
+        for event, kfilter in ((EVENT_READ, select.KQ_FILTER_READ),
+                               (EVENT_WRITE, select.KQ_FILTER_WRITE)):
+            if events & event and not current & event:
+                changes.append(select.kevent(fd, kfilter, select.KQ_EV_ADD))
+            elif current & event and not events & event:
+                changes.append(select.kevent(fd, kfilter, select.KQ_EV_DELETE))
+
+        if events:
+            self._fds[fd] = events
+        else:
+            self._fds.pop(fd, None)
+
+        if changes:
+            try:
+                self.poller.control(changes, 0)
+            except (IOError, OSError):
+                # the file descriptor was closed already
+                pass
 
     def unregister(self, fd):
         """
         Unregister the given file descriptor.
         """
-        self.poller.unregister(fd)
+        self.modify(fd, 0)
+
+    def poll_events(self, timeout=None):
+        """
+        Polls once and returns a list of ``(fd, events)``
+        tuples where ``events`` is a combination of
+        ``EVENT_READ`` and ``EVENT_WRITE``. End of files
+        and errors are reported as read events so that
+        they get noticed when reading.
 
-    def poll(self):
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        try:
+            # each file descriptor has up to two filters
+            kevents = self.poller.control(None, max(1, 2 * len(self._fds)), timeout)
+        except (IOError, OSError):
+            kevents = []
+
+        ready = {}
+        for kevent in kevents:
+            if kevent.filter == select.KQ_FILTER_WRITE and \
+               not kevent.flags & select.KQ_EV_ERROR:
+                event = EVENT_WRITE
+            else:
+                event = EVENT_READ
+            ready[kevent.ident] = ready.get(kevent.ident, 0) | event
+        return list(ready.items())
+
+    def poll(self, timeout=None):
         """
         Polls once and yields each ready-to-be-read
         file-descriptor
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        for fd, events in self.poll_events(timeout):
+            if events & EVENT_READ:
+                yield fd
+
+class SelectorsPoller(object):
+    def __init__(self, timeout=0.1, selector=None):
+        """
+        A poller relying on the :py:mod:`selectors` module,
+        with the most efficient selector of the platform
+        unless another ``selector`` instance is provided.
+
+        Available on Python 3 only.
+        """
+        if selectors is None:
+            raise RuntimeError("The selectors module is not available")
+        self.selector = selector or selectors.DefaultSelector()
+        self.timeout = timeout
+
+    def release(self):
+        """
+        Cleanup resources.
+        """
+        self.selector.close()
+
+    def _mask(self, events):
+        mask = 0
+        if events & EVENT_READ:
+            mask |= selectors.EVENT_READ
+        if events & EVENT_WRITE:
+            mask |= selectors.EVENT_WRITE
+        return mask
+
+    def register(self, fd, events=EVENT_READ):
+        """
+        Register a new file descriptor to be
+        part of the select polling next time around.
+        Only read events are watched unless
+        ``events`` says otherwise.
+        """
+        self.modify(fd, events)
+
+    def modify(self, fd, events):
+        """
+        Changes the events watched on the given
+        file descriptor to ``events``, a combination
+        of ``EVENT_READ`` and ``EVENT_WRITE``.
+        """
+        if not events:
+            self.unregister(fd)
+            return
+
+        try:
+            self.selector.modify(fd, self._mask(events))
+        except KeyError:
+            self.selector.register(fd, self._mask(events))
+
+    def unregister(self, fd):
+        """
+        Unregister the given file descriptor.
         """
         try:
-            events = self.poller.poll(timeout=self.timeout)
-        except IOError:
-            events = []
-        for fd, event in events:
-            if event | select.EPOLLIN | select.EPOLLPRI:
+            self.selector.unregister(fd)
+        except (KeyError, ValueError):
+            pass
+
+    def poll_events(self, timeout=None):
+        """
+        Polls once and returns a list of ``(fd, events)``
+        tuples where ``events`` is a combination of
+        ``EVENT_READ`` and ``EVENT_WRITE``.
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        if timeout is None:
+            timeout = self.timeout
+        if not self.selector.get_map():
+            # some selectors refuse to wait on nothing
+            if timeout:
+                time.sleep(timeout)
+            return []
+        try:
+            events = self.selector.select(timeout)
+        except (IOError, OSError):
+            return []
+
+        ready = []
+        for key, event in events:
+            mask = 0
+            if event & selectors.EVENT_READ:
+                mask |= EVENT_READ
+            if event & selectors.EVENT_WRITE:
+                mask |= EVENT_WRITE
+            ready.append((key.fd, mask))
+        return ready
+
+    def poll(self, timeout=None):
+        """
+        Polls once and yields each ready-to-be-read
+        file-descriptor
+
+        The poller's ``timeout`` is used unless
+        another one is provided. ``None`` waits
+        until an event occurs.
+        """
+        for fd, events in self.poll_events(timeout):
+            if events & EVENT_READ:
                 yield fd
 
+class Waker(object):
+    def __init__(self):
+        """
+        A file descriptor, to be registered against a poller,
+        which another thread makes readable to wake the poller up.
+
+        It is an ``eventfd`` when available, on Linux,
+        and a socket pair otherwise.
+        """
+        self._woken = False
+        self._closed = False
+        if hasattr(os, 'eventfd'):
+            self._eventfd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+            self._reader = self._writer = None
+        else:
+            self._eventfd = None
+            self._reader, self._writer = socket.socketpair()
+            self._reader.setblocking(False)
+            self._writer.setblocking(False)
+
+    def fileno(self):
+        if self._eventfd is not None:
+            return self._eventfd
+        return self._reader.fileno()
+
+    def wake(self):
+        """
+        Makes the file descriptor readable unless it already is.
+        """
+        if self._woken or self._closed:
+            return
+        self._woken = True
+        try:
+            if self._eventfd is not None:
+                os.eventfd_write(self._eventfd, 1)
+            else:
+                self._writer.send(b'\x00')
+        except (IOError, OSError, socket.error):
+            pass
+
+    def drain(self):
+        """
+        Consumes what makes the file descriptor readable.
+
+        Waking it up is allowed again only once it was read
+        from. A :meth:`wake` in the meantime is skipped, the
+        poller's thread handles what it was for right after.
+        """
+        if self._closed:
+            self._woken = False
+            return
+        try:
+            if self._eventfd is not None:
+                os.eventfd_read(self._eventfd)
+            else:
+                while self._reader.recv(4096):
+                    pass
+        except (IOError, OSError, socket.error):
+            pass
+        self._woken = False
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._eventfd is not None:
+            os.close(self._eventfd)
+        else:
+            self._reader.close()
+            self._writer.close()
+
 class WebSocketManager(threading.Thread):
-    def __init__(self, poller=None):
+    def __init__(self, poller=None, read_budget=16, idle_timeout=None,
+                 close_timeout=5.0, dispatcher=None, byte_budget=None,
+                 inbound_limits=None, global_inbound_limits=None,
+                 max_frame_size=None, max_message_size=None):
         """
         An event-based websocket manager. By event-based, we mean
         that the websockets will be called when their
@@ -205,23 +687,130 @@ class WebSocketManager(threading.Thread):
 
         The poller's implementation is automatically chosen
         with ``epoll`` if available else ``select`` unless you
-        provide your own ``poller``.
+        provide your own ``poller``. A poller providing
+        ``poll_events()`` and ``modify()`` is told to watch
+        for writes as well, one which only provides ``register()``,
+        ``unregister()`` and ``poll()`` reports every file descriptor
+        as readable and its websockets keep sending in blocking mode.
+
+        A websocket which still has data pending once read,
+        see :attr:`has_pending_data <ws4py.websocket.WebSocket.has_pending_data>`,
+        is read again straight away up to ``read_budget`` times.
+        When set, ``byte_budget`` also limits how many bytes are
+        read from a websocket on each iteration, checked after
+        every read, so that a peer flooding the connection cannot
+        hold up the others. Past either budget, the other websockets
+        get their turn and it joins the ready queue: it is read
+        again on the next iteration of the mainloop, in turn and
+        without waiting on the poller. How long websockets wait
+        in that queue is measured by :attr:`ready_delay` and
+        :attr:`max_ready_delay`.
+
+        With an edge-triggered poller, such as
+        ``EPollPoller(edge_triggered=True)``, websockets are read
+        until their connection is exhausted, see
+        :attr:`read_exhausted <ws4py.websocket.WebSocket.read_exhausted>`,
+        within the same budget as the poller won't report them
+        again for the bytes already received.
+
+        Managed websockets are switched to non-blocking writes,
+        see :meth:`set_nonblocking() <ws4py.websocket.WebSocket.set_nonblocking>`,
+        so that a slow peer never blocks the manager. Their
+        connection is watched for writability only while they
+        have data queued.
+
+        Timers of all the managed websockets are run from the
+        manager's thread by a single :class:`TimerWheel <ws4py.timers.TimerWheel>`,
+        see :meth:`call_later`. It sends the heartbeats of websockets
+        with a :attr:`heartbeat_freq <ws4py.websocket.WebSocket.heartbeat_freq>`,
+        closes websockets from which nothing was read for
+        ``idle_timeout`` seconds and terminates those whose closing
+        handshake didn't complete within ``close_timeout`` seconds.
+        Set either to ``None`` to disable it.
+
+        A :class:`Dispatcher <ws4py.dispatcher.Dispatcher>`, when
+        given, becomes the :attr:`dispatcher <ws4py.websocket.WebSocket.dispatcher>`
+        of managed websockets. Their messages are then handled
+        by its thread pool, in order, while the manager's thread
+        keeps reading and parsing.
+
+        Messages waiting for the dispatcher are limited by
+        ``inbound_limits``, which becomes the :attr:`inbound_limits <ws4py.websocket.WebSocket.inbound_limits>`
+        of managed websockets, and ``global_inbound_limits``, both
+        ``(high, low)`` amounts of bytes. A websocket with more than
+        its own ``high`` bytes waiting is no longer watched for
+        reading until they drop to ``low``. Once more than the
+        global ``high`` bytes wait across all websockets, those
+        receiving more are no longer watched either until the
+        total drops to the global ``low``. Their peer is then
+        pushed back on by TCP flow control.
+
+        When set, ``max_frame_size`` and ``max_message_size``
+        become the :attr:`max_frame_size <ws4py.websocket.WebSocket.max_frame_size>`
+        and :attr:`max_message_size <ws4py.websocket.WebSocket.max_message_size>`
+        of managed websockets.
         """
         threading.Thread.__init__(self)
         self.name = "WebSocketManager"
         self.lock = threading.Lock()
         self.websockets = {}
         self.running = False
+        self.read_budget = read_budget
+        self.idle_timeout = idle_timeout
+        self.close_timeout = close_timeout
+        self.dispatcher = dispatcher
+        self.timers = TimerWheel()
+        self.backplane = None
+        """
+        The :class:`Backplane <ws4py.backplane.Backplane>` carrying
+        broadcasts to the managers of other processes, if any.
+        """
+        self.byte_budget = byte_budget
+        self.ready_delay = 0.0
+        """
+        Seconds the websocket last read from the ready
+        queue had been waiting in it.
+        """
+
+        self.max_ready_delay = 0.0
+        """
+        Longest wait in the ready queue so far. Reset it
+        to ``0`` to measure it again over a given period.
+        """
+
+        self.inbound_limits = inbound_limits
+        self.global_inbound_limits = global_inbound_limits
+        self.max_frame_size = max_frame_size
+        self.max_message_size = max_message_size
+        self.inbound_backlog = 0
+        """
+        Amount of bytes of the messages received by all the
+        managed websockets and waiting for their dispatcher.
+        """
+
+        self._ready = OrderedDict()
+        self._events = {}
+        self._paused = set()
+        self._throttled = set()
+        self._ws_timers = {}
+        self._activity = {}
+        self._lingering = {}
+        self._commands = []
+        self._loop_thread = None
+        self._waker = Waker()
 
         if poller:
             self.poller = poller
         else:
             if hasattr(select, "epoll"):
-                self.poller = EPollPoller()
+                self.poller = EPollPoller(timeout=None)
                 logger.info("Using epoll")
+            elif hasattr(select, "poll"):
+                self.poller = PollPoller(timeout=None)
+                logger.info("Using poll as epoll is not available")
             else:
-                self.poller = SelectPoller()
-                logger.info("Using select as epoll is not available")
+                self.poller = SelectPoller(timeout=None)
+                logger.info("Using select as neither epoll nor poll are available")
 
     def __len__(self):
         return len(self.websockets)
@@ -251,11 +840,35 @@ class WebSocketManager(threading.Thread):
             return
 
         logger.info("Managing websocket %s" % format_addresses(websocket))
+        if self._poller_has_events():
+            websocket.set_nonblocking(self._watch_writes, self._linger)
+        websocket.manager = self
+        if self.dispatcher is not None:
+            websocket.dispatcher = self.dispatcher
+        if self.inbound_limits is not None:
+            websocket.inbound_limits = self.inbound_limits
+        if self.max_frame_size is not None:
+            websocket.max_frame_size = self.max_frame_size
+        if self.max_message_size is not None:
+            websocket.max_message_size = self.max_message_size
         websocket.opened()
         with self.lock:
             fd = websocket.sock.fileno()
             self.websockets[fd] = websocket
-            self.poller.register(fd)
+            self._ws_timers[fd] = {}
+            self._activity[fd] = self.timers.clock()
+            events = EVENT_READ
+            if websocket.write_pending:
+                events |= EVENT_WRITE
+            self._events[fd] = events
+            self._poller_call(self._register, fd, events)
+
+        if websocket.heartbeat_freq:
+            self._set_timer(fd, websocket, 'heartbeat',
+                            websocket.heartbeat_freq, self._heartbeat)
+        if self.idle_timeout:
+            self._set_timer(fd, websocket, 'idle',
+                            self.idle_timeout, self._idle)
 
     def remove(self, websocket):
         """
@@ -271,18 +884,40 @@ class WebSocketManager(threading.Thread):
         logger.info("Removing websocket %s" % format_addresses(websocket))
         with self.lock:
             fd = websocket.sock.fileno()
-            self.websockets.pop(fd, None)
-            self.poller.unregister(fd)
+            self._forget(fd)
+            self._poller_call(self.poller.unregister, fd)
+        websocket.manager = None
 
     def stop(self):
         """
         Mark the manager as terminated and
         releases its resources.
+
+        A running mainloop is woken up and releases
+        the poller itself once it exits.
         """
         self.running = False
         with self.lock:
             self.websockets.clear()
-            self.poller.release()
+            self._ready.clear()
+            self._events.clear()
+            self._paused.clear()
+            self._throttled.clear()
+            self._ws_timers.clear()
+            self._activity.clear()
+            lingering, self._lingering = self._lingering, {}
+            self._commands = []
+            self.timers.clear()
+            if self._loop_thread is not None:
+                self._waker.wake()
+            else:
+                self._release()
+        for ws, timer in lingering.values():
+            ws.close_connection()
+        if self.backplane is not None:
+            self.backplane.close()
+        if self.dispatcher is not None:
+            self.dispatcher.shutdown(wait=False)
 
     def run(self):
         """
@@ -292,6 +927,20 @@ class WebSocketManager(threading.Thread):
         call related websockets' `once` method to
         read and process the incoming data.
 
+        Websockets left with pending data after their
+        budget was spent are read again on the next
+        iteration, in the order they were queued, the
+        poller then doesn't wait for new events.
+        Nor does it wait past the next timer due, timers
+        are run at the end of each iteration. Otherwise, it waits
+        as long as its ``timeout`` says, forever for the pollers
+        the manager creates.
+
+        The poller is only used from the mainloop's thread and
+        without holding the manager's lock. Other threads queue
+        their changes, new websockets to watch for instance,
+        and wake the poller up so they are applied straight away.
+
         If the :meth:`once() <ws4py.websocket.WebSocket.once>`
         method returns a `False` value, its :meth:`terminate() <ws4py.websocket.WebSocket.terminate>`
         method is also applied to properly close
@@ -303,35 +952,469 @@ class WebSocketManager(threading.Thread):
         it's up to your requirements.
         """
         self.running = True
+        with self.lock:
+            self._loop_thread = threading.current_thread()
+            waker = self._waker.fileno()
+            self.poller.register(waker)
+        try:
+            self._loop(waker)
+        finally:
+            with self.lock:
+                self._loop_thread = None
+                if not self.running:
+                    self._release()
+
+    def _loop(self, waker):
         while self.running:
+            self._run_commands()
+            if self._ready:
+                polled = self._poll(0)
+            else:
+                polled = self._poll(self._poll_timeout())
             with self.lock:
-                polled = self.poller.poll()
+                ready, self._ready = self._ready, OrderedDict()
             if not self.running:
                 break
 
-            for fd in polled:
+            for fd, events in polled:
                 if not self.running:
                     break
+                if fd == waker:
+                    self._waker.drain()
+                    continue
+                if fd in self._lingering:
+                    # hang ups and errors are reported as read events
+                    self._flush(fd)
+                    continue
+                if events & EVENT_WRITE:
+                    self._flush(fd)
+                if events & EVENT_READ:
+                    queued = ready.pop(fd, None)
+                    if queued is not None:
+                        self._waited(queued)
+                    self._read(fd)
+
+            for fd, queued in ready.items():
+                if not self.running:
+                    break
+                if fd in self._paused:
+                    # queued again once resumed
+                    continue
+                self._waited(queued)
+                self._read(fd)
+
+            if self.running:
+                self.timers.advance()
+
+    def _waited(self, queued):
+        """
+        Accounts for a websocket read after waiting
+        in the ready queue since ``queued``.
+        """
+        delay = self.timers.clock() - queued
+        self.ready_delay = delay
+        if delay > self.max_ready_delay:
+            self.max_ready_delay = delay
+
+    def _poller_has_events(self):
+        """
+        Whether the poller reports write events, through
+        ``poll_events()`` and ``modify()``, rather than
+        only readable file descriptors from ``poll()``.
+        """
+        return hasattr(self.poller, 'poll_events')
+
+    def _poll(self, timeout):
+        """
+        Returns the ``(fd, events)`` pairs reported by the
+        poller within ``timeout`` seconds. Pollers without
+        ``poll_events()`` wait as long as their own timeout.
+        """
+        if self._poller_has_events():
+            return self.poller.poll_events(timeout=timeout)
+        return [(fd, EVENT_READ) for fd in self.poller.poll()]
+
+    def _poll_timeout(self):
+        """
+        How long the poller may wait: its own timeout
+        unless a timer is due sooner.
+        """
+        timeout = self.timers.next_timeout()
+        if timeout is None:
+            return None
+        poller_timeout = getattr(self.poller, 'timeout', None)
+        if poller_timeout is None or timeout < poller_timeout:
+            return timeout
+        return None
+
+    def _release(self):
+        """
+        Releases the poller and the waker.
+        Must be called with the lock held.
+        """
+        self.poller.release()
+        self._waker.close()
+
+    def _in_loop(self):
+        return self._loop_thread is None or \
+            self._loop_thread is threading.current_thread()
+
+    def _is_loop_thread(self):
+        """
+        Whether this is the thread running the mainloop.
+        """
+        return self._loop_thread is threading.current_thread()
+
+    def _wake(self):
+        """
+        Wakes the mainloop up when called from another thread.
+        """
+        if not self._in_loop():
+            self._waker.wake()
+
+    def _poller_call(self, method, *args):
+        """
+        Calls the poller's ``method`` straight away from the
+        mainloop's thread, or when it isn't running. Otherwise
+        queues the call for the mainloop to run it.
+        Must be called with the lock held.
+        """
+        if self._in_loop():
+            method(*args)
+        else:
+            self._commands.append((method, args))
+            self._waker.wake()
+
+    def _run_commands(self):
+        with self.lock:
+            commands, self._commands = self._commands, []
+        for method, args in commands:
+            try:
+                method(*args)
+            except (IOError, OSError, ValueError) as e:
+                logger.debug("Poller %s failed: %s" % (method.__name__, repr(e)))
+
+    def _register(self, fd, events):
+        self.poller.register(fd)
+        if events != EVENT_READ:
+            self.poller.modify(fd, events)
+
+    def _set_events(self, fd, events):
+        """
+        Watches the file descriptor for ``events`` only,
+        unregistering it when there are none. A websocket
+        which gets watched for reading again is put in the
+        ready queue as the poller may not report the bytes
+        it already holds.
+        """
+        current = self._events.get(fd)
+        if current is None or current == events:
+            return
+
+        if not events:
+            self.poller.unregister(fd)
+        elif not current:
+            self._register(fd, events)
+        else:
+            self.poller.modify(fd, events)
+        self._events[fd] = events
+
+        if events & EVENT_READ and not current & EVENT_READ:
+            self._ready[fd] = self.timers.clock()
+
+    def _read(self, fd):
+        """
+        Reads from the websocket registered with ``fd``
+        until it has no more pending data, or nothing left to
+        read with an edge-triggered poller, or its budgets
+        are spent. It then joins the ready queue. Stops as soon
+        as reading is paused, the websocket is queued again once
+        resumed. Terminates the websocket when reading fails.
+        """
+        ws = self.websockets.get(fd)
+        if not ws or ws.terminated:
+            return
+
+        if self.idle_timeout:
+            self._activity[fd] = self.timers.clock()
+
+        edge_triggered = getattr(self.poller, 'edge_triggered', False) is True
+        if self.byte_budget is not None:
+            byte_limit = ws.bytes_received + self.byte_budget
+        for i in range(self.read_budget):
+            # I don't know what kind of errors might spew out of here
+            # but they probably shouldn't crash the entire server.
+            try:
+                x = ws.once()
+            # Treat the error as if once() had returned None
+            except Exception as e:
+                x = None
+                logger.error("Terminating websocket %s due to exception: %s in once method" % (format_addresses(ws), repr(e)) )
+            if not x:
+                self._terminate(fd, ws)
+                return
+
+            if ws.reading_paused is True or fd in self._paused:
+                return
+
+            if edge_triggered:
+                if ws.read_exhausted:
+                    return
+            elif not ws.has_pending_data:
+                return
+
+            if self.byte_budget is not None and ws.bytes_received >= byte_limit:
+                break
+
+        self._ready[fd] = self.timers.clock()
+
+    def _flush(self, fd):
+        """
+        Sends what the websocket registered with ``fd``
+        has queued. Terminates the websocket when sending fails.
+        """
+        if fd in self._lingering:
+            ws = self._lingering[fd][0]
+            try:
+                done = ws.flush()
+            except Exception:
+                done = True
+            if done:
+                self._close_lingering(fd)
+            return
+
+        ws = self.websockets.get(fd)
+        if not ws or ws.terminated:
+            return
+
+        try:
+            ws.flush()
+        except Exception as e:
+            logger.error("Terminating websocket %s due to exception: %s in flush method" % (format_addresses(ws), repr(e)) )
+            self._terminate(fd, ws)
+
+    def _terminate(self, fd, ws):
+        with self.lock:
+            if self.websockets.get(fd) is ws:
+                self._forget(fd)
+                self._poller_call(self.poller.unregister, fd)
+        ws.manager = None
+
+        if not ws.terminated:
+            logger.info("Terminating websocket %s" % format_addresses(ws))
+            ws.terminate()
+
+    def _forget(self, fd):
+        """
+        Drops what the manager tracks about the websocket
+        registered with ``fd`` and cancels its timers.
+        Must be called with the lock held.
+        """
+        ws = self.websockets.pop(fd, None)
+        self._ready.pop(fd, None)
+        self._events.pop(fd, None)
+        self._paused.discard(fd)
+        self._throttled.discard(ws)
+        self._activity.pop(fd, None)
+        for timer in self._ws_timers.pop(fd, {}).values():
+            timer.cancel()
+
+    def call_later(self, delay, callback, *args):
+        """
+        Schedules ``callback(*args)`` to be called from
+        the manager's thread in ``delay`` seconds.
+
+        Returns a :class:`Timer <ws4py.timers.Timer>` whose
+        :meth:`cancel() <ws4py.timers.Timer.cancel>` method
+        prevents the call.
+        """
+        timer = self.timers.call_later(delay, callback, *args)
+        self._wake()
+        return timer
+
+    def _set_timer(self, fd, ws, name, delay, callback):
+        """
+        Schedules ``callback(fd, ws)`` as the ``name`` timer of
+        the websocket, replacing the previous one. Nothing is
+        scheduled for a websocket which isn't managed anymore.
+        """
+        with self.lock:
+            timers = self._ws_timers.get(fd)
+            if timers is None or self.websockets.get(fd) is not ws:
+                return
+            previous = timers.get(name)
+            if previous is not None:
+                previous.cancel()
+            timers[name] = self.timers.call_later(delay, callback, fd, ws)
+            self._wake()
+
+    def _heartbeat(self, fd, ws):
+        """
+        Sends an unsolicited pong to the peer, as
+        :class:`Heartbeat <ws4py.websocket.Heartbeat>` does
+        for threaded websockets, then schedules the next one.
+        """
+        if self.websockets.get(fd) is not ws or ws.terminated:
+            return
+
+        try:
+            ws.send(PongControlMessage(data='beep'))
+        except Exception as e:
+            logger.info("Heartbeat failed for websocket %s: %s" % (format_addresses(ws), repr(e)))
+            self._terminate(fd, ws)
+            return
+
+        self._set_timer(fd, ws, 'heartbeat', ws.heartbeat_freq, self._heartbeat)
+
+    def _idle(self, fd, ws):
+        """
+        Initiates the closing handshake of a websocket
+        from which nothing was read for ``idle_timeout``
+        seconds. Otherwise checks again when it could be.
+        """
+        if self.websockets.get(fd) is not ws or ws.terminated:
+            return
+
+        idle = self.timers.clock() - self._activity.get(fd, 0)
+        if idle < self.idle_timeout:
+            self._set_timer(fd, ws, 'idle', self.idle_timeout - idle, self._idle)
+            return
+
+        logger.info("Closing idle websocket %s" % format_addresses(ws))
+        ws.close(code=1001, reason='Idle timeout')
+
+    def closing(self, websocket):
+        """
+        Called by a managed websocket once it has sent its
+        closing frame. It gets terminated if the closing
+        handshake isn't completed within ``close_timeout``
+        seconds.
+        """
+        sock = websocket.sock
+        if sock is None or not self.close_timeout:
+            return
+
+        self._set_timer(sock.fileno(), websocket, 'close',
+                        self.close_timeout, self._close_expired)
 
-                ws = self.websockets.get(fd)
-                if ws and not ws.terminated:
-                    # I don't know what kind of errors might spew out of here
-                    # but they probably shouldn't crash the entire server.
-                    try:
-                        x = ws.once()
-                    # Treat the error as if once() had returned None
-                    except Exception as e:
-                        x = None
-                        logger.error("Terminating websocket %s due to exception: %s in once method" % (format_addresses(ws), repr(e)) )
-                    if not x:
-                        with self.lock:
-                            self.websockets.pop(fd, None)
-                            self.poller.unregister(fd)
-
-                        if not ws.terminated:
-                            logger.info("Terminating websocket %s" % format_addresses(ws))
-                            ws.terminate()
+    def _close_expired(self, fd, ws):
+        if self.websockets.get(fd) is not ws or ws.terminated:
+            return
+
+        logger.info("Closing handshake of websocket %s timed out" % format_addresses(ws))
+        self._terminate(fd, ws)
+
+    def _watch_writes(self, websocket, write_pending):
+        """
+        Notifier given to managed websockets. Their connection
+        is watched for writability only while they
+        have data queued.
+        """
+        sock = websocket.sock
+        if sock is None:
+            return
+
+        with self.lock:
+            fd = sock.fileno()
+            if self.websockets.get(fd) is websocket:
+                events = 0 if fd in self._paused else EVENT_READ
+                if write_pending:
+                    events |= EVENT_WRITE
+                self._poller_call(self._set_events, fd, events)
+
+    def _linger(self, websocket):
+        """
+        Linger given to managed websockets. A websocket closed
+        with data still queued keeps being watched for writability
+        until its queue is sent, or for ``CLOSE_FLUSH_TIMEOUT``
+        seconds, before its connection is closed, so that a slow
+        peer never blocks the thread closing it. Not done unless
+        the mainloop is running.
+        """
+        sock = websocket.sock
+        with self.lock:
+            if not self.running or self._loop_thread is None:
+                return False
+
+            fd = sock.fileno()
+            registered = False
+            if self.websockets.get(fd) is websocket:
+                registered = bool(self._events.get(fd))
+                self._forget(fd)
+            if registered:
+                self._poller_call(self.poller.modify, fd, EVENT_WRITE)
+            else:
+                self._poller_call(self._register, fd, EVENT_WRITE)
+            timer = self.timers.call_later(CLOSE_FLUSH_TIMEOUT, self._close_lingering, fd)
+            self._lingering[fd] = (websocket, timer)
+            self._wake()
+        return True
+
+    def _close_lingering(self, fd):
+        """
+        Closes the connection of a lingering websocket
+        once its queue was sent, or it timed out.
+        """
+        with self.lock:
+            lingering = self._lingering.pop(fd, None)
+            if lingering is None:
+                return
+            ws, timer = lingering
+            timer.cancel()
+            self._poller_call(self.poller.unregister, fd)
+        ws.close_connection()
+
+    def inbound(self, websocket, size):
+        """
+        Called by managed websockets with the amount of bytes
+        of a message handed to their dispatcher, or its opposite
+        once handled. Stops, or resumes, watching them for reading
+        according to their own :attr:`inbound_limits <ws4py.websocket.WebSocket.inbound_limits>`
+        and the manager's ``global_inbound_limits``.
+        """
+        with self.lock:
+            self.inbound_backlog += size
+            resumed = ()
+            limits = self.global_inbound_limits
+            if limits is not None:
+                high, low = limits
+                if size > 0 and self.inbound_backlog > high:
+                    self._throttled.add(websocket)
+                elif size < 0 and self.inbound_backlog <= low and self._throttled:
+                    resumed, self._throttled = self._throttled, set()
+
+            self._follow_reading(websocket)
+            for ws in resumed:
+                if ws is not websocket:
+                    self._follow_reading(ws)
+
+    def _follow_reading(self, websocket):
+        """
+        Watches the websocket for reading unless it is paused
+        or throttled. Must be called with the lock held.
+        """
+        sock = websocket.sock
+        if sock is None:
+            return
+        fd = sock.fileno()
+        if self.websockets.get(fd) is not websocket:
+            return
 
+        paused = websocket.reading_paused or websocket in self._throttled
+        if paused == (fd in self._paused):
+            return
+
+        if paused:
+            logger.debug("Pausing reading from websocket %s" % format_addresses(websocket))
+            self._paused.add(fd)
+            events = 0
+        else:
+            logger.debug("Resuming reading from websocket %s" % format_addresses(websocket))
+            self._paused.discard(fd)
+            events = EVENT_READ
+        if websocket.write_pending:
+            events |= EVENT_WRITE
+        self._poller_call(self._set_events, fd, events)
 
     def close_all(self, code=1001, message='Server is shutting down'):
         """
@@ -341,18 +1424,38 @@ class WebSocketManager(threading.Thread):
         """
         with self.lock:
             logger.info("Closing all websockets with [%d] '%s'" % (code, message))
-            for ws in iter(self):
-                ws.close(code=code, reason=message)
+            websockets = list(iter(self))
+
+        # closing may queue data which requires the lock
+        for ws in websockets:
+            ws.close(code=code, reason=message)
 
     def broadcast(self, message, binary=False):
         """
         Broadcasts the given message to all registered
-        websockets, at the time of the call.
+        websockets, at the time of the call, and to the
+        managers of other processes when a :attr:`backplane`
+        is attached.
+
+        The message is framed only once, see
+        :class:`PreparedMessage <ws4py.messaging.PreparedMessage>`,
+        which may also be given directly.
 
         Broadcast may fail on a given registered peer
         but this is silent as it's not the method's
         purpose to handle websocket's failures.
         """
+        if not isinstance(message, PreparedMessage):
+            message = PreparedMessage(message, binary)
+
+        _publish(self.backplane, message)
+        self.fanout(message)
+
+    def fanout(self, message):
+        """
+        Sends the :class:`PreparedMessage <ws4py.messaging.PreparedMessage>`
+        to the websockets of this manager only.
+        """
         with self.lock:
             websockets = self.websockets.copy()
             if py3k:
@@ -360,9 +1463,184 @@ class WebSocketManager(threading.Thread):
             else:
                 ws_iter = websockets.itervalues()
 
+        binary = message.message.opcode == OPCODE_BINARY
         for ws in ws_iter:
             if not ws.terminated:
                 try:
                     ws.send(message, binary)
                 except:
                     pass
+
+def _publish(backplane, message):
+    if backplane is None:
+        return
+    try:
+        backplane.publish(message)
+    except Exception as e:
+        logger.error("Failed to publish a broadcast: %s" % repr(e))
+
+class RoundRobinPolicy(object):
+    def __init__(self):
+        """
+        Places websockets on each shard in turn.
+        """
+        self._counter = itertools.count()
+
+    def select(self, shards, websocket):
+        return shards[next(self._counter) % len(shards)]
+
+class LeastLoadedPolicy(object):
+    """
+    Places websockets on the shard managing
+    the fewest websockets.
+    """
+    def select(self, shards, websocket):
+        return min(shards, key=len)
+
+class HashPolicy(object):
+    def __init__(self, key=None):
+        """
+        Places websockets on a shard chosen from the hash of
+        ``key(websocket)`` so that websockets sharing the same
+        key end up on the same shard. The key defaults to the
+        peer's host.
+        """
+        self.key = key or (lambda websocket: websocket.peer_address[0])
+
+    def select(self, shards, websocket):
+        return shards[hash(self.key(websocket)) % len(shards)]
+
+POLICIES = {
+    'round-robin': RoundRobinPolicy,
+    'least-loaded': LeastLoadedPolicy,
+    'hash': HashPolicy
+}
+
+class ShardedWebSocketManager(object):
+    def __init__(self, shards=None, policy=None, poller_factory=None, **kwargs):
+        """
+        Spreads websockets over ``shards`` :class:`WebSocketManager`,
+        each running its own poller in its own thread. There are
+        as many shards as CPUs by default.
+
+        New websockets are placed on a shard by the ``policy``,
+        either an object with a ``select(shards, websocket)``
+        method returning the chosen shard or one of the names
+        of ``POLICIES``. The :class:`LeastLoadedPolicy` is used
+        by default.
+
+        Each shard gets a poller from ``poller_factory``, when
+        provided, and is created with the remaining keyword
+        arguments.
+
+        It provides the same interface as a :class:`WebSocketManager`
+        to start, stop, add, remove or broadcast to websockets.
+        """
+        if shards is None:
+            shards = multiprocessing.cpu_count()
+        if shards < 1:
+            raise ValueError("At least one shard is required")
+
+        if policy is None:
+            policy = LeastLoadedPolicy()
+        elif isinstance(policy, basestring):
+            if policy not in POLICIES:
+                raise ValueError("Unknown sharding policy: %s" % policy)
+            policy = POLICIES[policy]()
+        self.policy = policy
+
+        self.shards = []
+        for i in range(shards):
+            poller = poller_factory() if poller_factory else None
+            shard = WebSocketManager(poller=poller, **kwargs)
+            shard.name = "WebSocketManager-%d" % i
+            self.shards.append(shard)
+
+        self.backplane = None
+        """
+        The :class:`Backplane <ws4py.backplane.Backplane>` carrying
+        broadcasts to the managers of other processes, if any.
+        """
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __iter__(self):
+        return itertools.chain(*self.shards)
+
+    def __contains__(self, ws):
+        return any(ws in shard for shard in self.shards)
+
+    def start(self):
+        """
+        Starts the thread of each shard.
+        """
+        for shard in self.shards:
+            shard.start()
+
+    def stop(self):
+        """
+        Marks each shard as terminated and
+        releases its resources.
+        """
+        for shard in self.shards:
+            shard.stop()
+        if self.backplane is not None:
+            self.backplane.close()
+
+    def join(self, timeout=None):
+        """
+        Waits for the thread of each shard to terminate.
+        """
+        for shard in self.shards:
+            shard.join(timeout)
+
+    def add(self, websocket):
+        """
+        Manage a new websocket on the shard
+        selected by the policy.
+        """
+        if websocket in self:
+            return
+
+        self.policy.select(self.shards, websocket).add(websocket)
+
+    def remove(self, websocket):
+        """
+        Remove the given ``websocket`` from
+        the shard managing it.
+        """
+        for shard in self.shards:
+            if websocket in shard:
+                shard.remove(websocket)
+                return
+
+    def close_all(self, code=1001, message='Server is shutting down'):
+        """
+        Initiate the closing handshake of all
+        websockets of every shard.
+        """
+        for shard in self.shards:
+            shard.close_all(code, message)
+
+    def broadcast(self, message, binary=False):
+        """
+        Broadcasts the given message to all websockets
+        of every shard, and to the managers of other
+        processes when a :attr:`backplane` is attached.
+        It is framed only once as
+        a :class:`PreparedMessage <ws4py.messaging.PreparedMessage>`.
+        """
+        if not isinstance(message, PreparedMessage):
+            message = PreparedMessage(message, binary)
+
+        _publish(self.backplane, message)
+        self.fanout(message)
+
+    def fanout(self, message):
+        """
+        Sends the :class:`PreparedMessage <ws4py.messaging.PreparedMessage>`
+        to the websockets of every shard of this process only.
+        """
+        for shard in self.shards:
+            shard.fanout(message)
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+__doc__ = """
+Masking engines used to mask and unmask frame payloads
+as described in :rfc:`6455#section-5.3`.
+
+Masking happens on every frame sent by a client and every
+frame received by a server so it is worth doing it over
+the whole buffer at once rather than one byte at a time.
+
+Several backends are provided:
+
+* ``'numpy'``: XOR 32-bit words through NumPy. Only available
+  when NumPy can be imported.
+* ``'wideword'``: converts the payload and the repeated key to
+  two (very) large integers and XOR them in a single operation.
+* ``'bytewise'``: the reference implementation, kept around
+  as it is the easiest to read.
+
+The fastest available backend is selected when this module
+is imported. You may change it at runtime:
+
+.. code-block:: python
+
+    >>> from ws4py import masking
+    >>> masking.available_backends()
+    ['numpy', 'wideword', 'bytewise']
+    >>> masking.set_backend('wideword')
+
+All backends return a new :func:`bytearray` and never
+modify the provided data. Only the first four bytes of
+the key are used.
+"""
+from binascii import hexlify, unhexlify
+
+from ws4py.compat import py3k, range
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['mask', 'available_backends', 'get_backend', 'set_backend']
+
+# Below that size, calling into NumPy costs more than
+# it saves so the wide word implementation is used instead.
+NUMPY_MIN_SIZE = 512
+
+# Must be a multiple of 4 so that each block starts
+# with the first byte of the masking key.
+WIDEWORD_BLOCK_SIZE = 4096
+
+def bytewise_mask(key, data):
+    """
+    Reference implementation XORing each byte of ``data``
+    with the matching byte of the 4-byte ``key``.
+    """
+    masked = bytearray(data)
+    key = bytearray(key[:4])
+    for i in range(len(masked)):
+        masked[i] ^= key[i % 4]
+    return masked
+
+def _tobytes(data):
+    # On Python 2, str() of a memoryview is its representation
+    if isinstance(data, memoryview):
+        return data.tobytes()
+    return bytes(data)
+
+if py3k:
+    def _to_int(data):
+        return int.from_bytes(data, 'big')
+
+    def _from_int(value, length):
+        return value.to_bytes(length, 'big')
+else:
+    def _to_int(data):
+        return int(hexlify(data), 16)
+
+    def _from_int(value, length):
+        return unhexlify('%0*x' % (length * 2, value))
+
+def wideword_mask(key, data):
+    """
+    Masks ``data`` by XORing it, as a single integer, against
+    the ``key`` repeated to the length of the payload.
+
+    Big integer conversions get slower past a few kilobytes
+    so larger payloads are processed in blocks of
+    ``WIDEWORD_BLOCK_SIZE`` bytes.
+    """
+    length = len(data)
+    if not length:
+        return bytearray()
+    key = _tobytes(key[:4])
+    if not py3k:
+        data = _tobytes(data)
+
+    if length <= WIDEWORD_BLOCK_SIZE:
+        keystream = (key * ((length + 3) // 4))[:length]
+        return bytearray(_from_int(_to_int(data) ^ _to_int(keystream), length))
+
+    masked = bytearray(length)
+    keystream = _to_int(key * (WIDEWORD_BLOCK_SIZE // 4))
+    for start in range(0, length - WIDEWORD_BLOCK_SIZE + 1, WIDEWORD_BLOCK_SIZE):
+        end = start + WIDEWORD_BLOCK_SIZE
+        masked[start:end] = _from_int(_to_int(data[start:end]) ^ keystream, WIDEWORD_BLOCK_SIZE)
+
+    start = length - length % WIDEWORD_BLOCK_SIZE
+    if start < length:
+        masked[start:] = wideword_mask(key, data[start:])
+    return masked
+
+def numpy_mask(key, data):
+    """
+    Masks ``data`` by XORing it 32-bit word by 32-bit word
+    with NumPy. Trailing bytes are masked one by one.
+    """
+    length = len(data)
+    if length < NUMPY_MIN_SIZE:
+        return wideword_mask(key, data)
+
+    masked = bytearray(data)
+    key = _tobytes(key[:4])
+    words = length // 4
+    view = numpy.frombuffer(masked, dtype=numpy.uint32, count=words)
+    view ^= numpy.frombuffer(key, dtype=numpy.uint32)[0]
+
+    key = bytearray(key)
+    for i in range(words * 4, length):
+        masked[i] ^= key[i % 4]
+    return masked
+
+_backends = {'bytewise': bytewise_mask, 'wideword': wideword_mask}
+_preference = ['wideword', 'bytewise']
+if numpy is not None:
+    _backends['numpy'] = numpy_mask
+    _preference.insert(0, 'numpy')
+
+_backend = _preference[0]
+mask = _backends[_backend]
+
+def available_backends():
+    """
+    Returns the names of the masking backends that can
+    be used on this platform, fastest first.
+    """
+    return list(_preference)
+
+def get_backend():
+    """
+    Returns the name of the backend currently in use.
+    """
+    return _backend
+
+def set_backend(name):
+    """
+    Selects the masking backend by ``name``. Raises
+    :exc:`ValueError` when it isn't available.
+    """
+    global _backend, mask
+    if name not in _backends:
+        raise ValueError("Unknown or unavailable masking backend '%s'" % name)
+    _backend = name
+    mask = _backends[name]
@@ -7,7 +7,10 @@ from ws4py.framing import Frame, OPCODE_CONTINUATION, OPCODE_TEXT, \
 from ws4py.compat import unicode, py3k
 
 __all__ = ['Message', 'TextMessage', 'BinaryMessage', 'CloseControlMessage',
-           'PingControlMessage', 'PongControlMessage']
+           'PingControlMessage', 'PongControlMessage', 'PreparedMessage']
+
+# Only the payload of data messages may be compressed, RFC 7692 7.2.3.
+DATA_OPCODES = (OPCODE_TEXT, OPCODE_BINARY)
 
 class Message(object):
     def __init__(self, opcode, data=b'', encoding='utf-8'):
@@ -23,8 +26,10 @@ class Message(object):
         The ``opcode`` indicates the message type and ``data`` is
         the possible message payload.
 
-        The payload is held internally as a a :func:`bytearray` as they are
-        faster than pure strings for append operations.
+        The payload is exposed as ``bytes`` through :attr:`data`. While
+        a fragmented message is reassembled with :meth:`extend`, its
+        fragments are appended to a growable :func:`bytearray` which
+        is turned into ``bytes`` once, when :attr:`data` is read.
 
         Unicode data will be encoded using the provided ``encoding``.
         """
@@ -41,20 +46,97 @@ class Message(object):
         elif not isinstance(data, bytes):
             raise TypeError("%s is not a supported data type" % type(data))
 
-        self.data = data
+        self._data = data
+        self._buffer = None
+        self._file = None
+        self._file_size = 0
 
-    def single(self, mask=False):
+    @property
+    def data(self):
+        """
+        The message's payload as ``bytes`` or, once
+        :meth:`spool` was called, as a file object.
+        """
+        if self._file is not None:
+            return self._file
+        if self._buffer is not None:
+            self._data = bytes(self._buffer)
+            self._buffer = None
+        return self._data
+
+    @data.setter
+    def data(self, data):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._data = data
+        self._buffer = None
+
+    @property
+    def size(self):
+        """
+        Size of the payload in bytes, spooled or not.
+        """
+        if self._file is not None:
+            return self._file_size
+        if self._buffer is not None:
+            return len(self._buffer)
+        return len(self._data)
+
+    @property
+    def spooled(self):
+        """
+        Whether the payload was moved to a file by :meth:`spool`.
+        """
+        return self._file is not None
+
+    def spool(self, file):
+        """
+        Moves the payload to ``file``, opened for reading and
+        writing in binary mode, to which the data the message
+        is extended with is then written. :attr:`data` returns
+        that file, positioned at its start once the message
+        is completed. Setting :attr:`data` closes it.
+        """
+        data = self._buffer if self._buffer is not None else self._data
+        file.write(data)
+        self._file = file
+        self._file_size = len(data)
+        self._data = None
+        self._buffer = None
+        if self._completed:
+            file.seek(0)
+
+    def single(self, mask=False, deflate=None):
         """
         Returns a frame bytes with the fin bit set and a random mask.
 
         If ``mask`` is set, automatically mask the frame
         using a generated 4-byte token.
+
+        If ``deflate`` is set to a negotiated
+        :class:`ws4py.extensions.PerMessageDeflate` extension,
+        the payload of a text or binary message is compressed
+        and the RSV1 bit set. Control frames are never compressed.
+        """
+        return b''.join(self.single_parts(mask=mask, deflate=deflate))
+
+    def single_parts(self, mask=False, deflate=None):
+        """
+        Same as :meth:`single` but returns the frame as
+        a ``(header, payload)`` tuple of buffers, see
+        :meth:`ws4py.framing.Frame.build_parts`.
         """
+        body = self.data
+        rsv1 = 0
+        if deflate is not None and self.opcode in DATA_OPCODES:
+            body = deflate.compress(body)
+            rsv1 = 1
         mask = os.urandom(4) if mask else None
-        return Frame(body=self.data, opcode=self.opcode,
-                     masking_key=mask, fin=1).build()
+        return Frame(body=body, opcode=self.opcode,
+                     masking_key=mask, fin=1, rsv1=rsv1).build_parts()
 
-    def fragment(self, first=False, last=False, mask=False):
+    def fragment(self, first=False, last=False, mask=False, deflate=None):
         """
         Returns a :class:`ws4py.framing.Frame` bytes.
 
@@ -63,13 +145,31 @@ class Message(object):
         * ``first``: the frame uses ``self.opcode`` else a continuation opcode
         * ``last``: the frame has its ``fin`` bit set
         * ``mask``: the frame is masked using a automatically generated 4-byte token
+        * ``deflate``: the payload is compressed with the given negotiated
+          :class:`ws4py.extensions.PerMessageDeflate` extension. All
+          the fragments of a message must use it.
+        """
+        return b''.join(self.fragment_parts(first=first, last=last, mask=mask,
+                                            deflate=deflate))
+
+    def fragment_parts(self, first=False, last=False, mask=False, deflate=None):
+        """
+        Same as :meth:`fragment` but returns the frame as
+        a ``(header, payload)`` tuple of buffers, see
+        :meth:`ws4py.framing.Frame.build_parts`.
         """
         fin = 1 if last is True else 0
         opcode = self.opcode if first is True else OPCODE_CONTINUATION
+        body = self.data
+        rsv1 = 0
+        if deflate is not None and self.opcode in DATA_OPCODES:
+            body = deflate.compress(body, final=fin == 1)
+            # only the first frame of a compressed message has RSV1 set
+            rsv1 = 1 if first is True else 0
         mask = os.urandom(4) if mask else None
-        return Frame(body=self.data,
+        return Frame(body=body,
                      opcode=opcode, masking_key=mask,
-                     fin=fin).build()
+                     fin=fin, rsv1=rsv1).build_parts()
 
     @property
     def completed(self):
@@ -86,20 +186,31 @@ class Message(object):
         set by the stream's parser.
         """
         self._completed = state
+        if state and self._file is not None:
+            # ready to be read from the start
+            self._file.seek(0)
 
     def extend(self, data):
         """
-        Add more ``data`` to the message.
+        Add more ``data`` to the message. It is copied at the
+        end of a buffer rather than concatenated to the payload
+        so that appending many fragments doesn't copy the whole
+        payload each time.
         """
-        if isinstance(data, bytes):
-            self.data += data
-        elif isinstance(data, bytearray):
-            self.data += bytes(data)
-        elif isinstance(data, unicode):
-            self.data += data.encode(self.encoding)
-        else:
+        if isinstance(data, unicode):
+            data = data.encode(self.encoding)
+        elif not isinstance(data, (bytes, bytearray, memoryview)):
             raise TypeError("%s is not a supported data type" % type(data))
 
+        if self._file is not None:
+            self._file.write(data)
+            self._file_size += len(data)
+            return
+
+        if self._buffer is None:
+            self._buffer = bytearray(self._data)
+        self._buffer += data
+
     def __len__(self):
         return len(self.__unicode__())
 
@@ -136,7 +247,7 @@ class BinaryMessage(Message):
         return False
 
     def __len__(self):
-        return len(self.data)
+        return self.size
 
 class CloseControlMessage(Message):
     def __init__(self, code=1000, reason=''):
@@ -167,3 +278,27 @@ class PingControlMessage(Message):
 class PongControlMessage(Message):
     def __init__(self, data):
         Message.__init__(self, OPCODE_PONG, data)
+
+class PreparedMessage(object):
+    def __init__(self, message, binary=False):
+        """
+        A message encoded and framed once so that it can be
+        sent as-is to many websockets, when broadcasting
+        for instance.
+
+        ``message`` is either a :class:`Message` or some data
+        from which a :class:`TextMessage`, or a :class:`BinaryMessage`
+        when ``binary`` is set, is created.
+
+        The frame is never masked. Websockets which must mask
+        what they send, clients, build a masked frame
+        from :attr:`message` instead.
+        """
+        if not isinstance(message, Message):
+            message = BinaryMessage(message) if binary else TextMessage(message)
+
+        self.message = message
+        self.parts = message.single_parts()
+        """
+        The unmasked frame as a ``(header, payload)`` tuple of buffers.
+        """
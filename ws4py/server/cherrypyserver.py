@@ -76,9 +76,10 @@ except ImportError:
 
 from ws4py import WS_KEY, WS_VERSION
 from ws4py.exc import HandshakeError
+from ws4py.extensions import negotiate_extensions
 from ws4py.websocket import WebSocket
 from ws4py.compat import py3k, get_connection, detach_connection
-from ws4py.manager import WebSocketManager
+from ws4py.manager import WebSocketManager, ShardedWebSocketManager
 
 __all__ = ['WebSocketTool', 'WebSocketPlugin']
 
@@ -113,6 +114,11 @@ class WebSocketTool(Tool):
         not taken into account. On the other hand,
         if the protocol from the handshake isn't part
         of the provided list, the upgrade fails immediatly.
+
+        The provided extensions are matched by name, unless
+        they are implemented by ws4py, such as
+        :class:`ws4py.extensions.PerMessageDeflate`, in which
+        case they are negotiated.
         """
         request = cherrypy.serving.request
         request.process_request_body = False
@@ -162,13 +168,8 @@ class WebSocketTool(Tool):
                 if s in protocols:
                     ws_protocols.append(s)
 
-        exts = extensions or []
-        extensions = request.headers.get('Sec-WebSocket-Extensions')
-        if extensions:
-            for ext in extensions.split(','):
-                ext = ext.strip()
-                if ext in exts:
-                    ws_extensions.append(ext)
+        ws_extensions = negotiate_extensions(request.headers.get('Sec-WebSocket-Extensions'),
+                                             extensions)
 
         location = []
         include_port = False
@@ -197,7 +198,7 @@ class WebSocketTool(Tool):
         if ws_protocols:
             response.headers['Sec-WebSocket-Protocol'] = ', '.join(ws_protocols)
         if ws_extensions:
-            response.headers['Sec-WebSocket-Extensions'] = ','.join(ws_extensions)
+            response.headers['Sec-WebSocket-Extensions'] = ','.join([str(ext) for ext in ws_extensions])
 
         addr = (request.remote.ip, request.remote.port)
         rfile = request.rfile.rfile
@@ -284,9 +285,19 @@ class WebSocketTool(Tool):
             current = current.f_back
 
 class WebSocketPlugin(plugins.SimplePlugin):
-    def __init__(self, bus):
+    def __init__(self, bus, shards=None, policy=None):
+        """
+        Websockets are managed by a single
+        :class:`ws4py.manager.WebSocketManager` unless a number
+        of ``shards`` is given, they are then spread over as many
+        managers by a :class:`ws4py.manager.ShardedWebSocketManager`
+        according to its ``policy``.
+        """
         plugins.SimplePlugin.__init__(self, bus)
-        self.manager = WebSocketManager()
+        if shards:
+            self.manager = ShardedWebSocketManager(shards=shards, policy=policy)
+        else:
+            self.manager = WebSocketManager()
 
     def start(self):
         self.bus.log("Starting WebSocket processing")
@@ -324,7 +335,8 @@ class WebSocketPlugin(plugins.SimplePlugin):
         the server.
 
         :param message: a message suitable to pass to the send() method
-          of the connected handler.
+          of the connected handler or a
+          :class:`ws4py.messaging.PreparedMessage` which is framed only once.
         :param binary: whether or not the message is a binary one
         """
         self.manager.broadcast(message, binary)
@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+__doc__ = """
+A pre-forking server mode running several worker processes
+which share the same listening port. Each worker runs its own
+server and websocket manager so the parsing of websockets
+is spread over as many cores as there are workers.
+
+The port is shared either through ``SO_REUSEPORT``, when
+the platform supports it, each worker then binds its own socket
+and the kernel balances the connections, or through a listening
+socket the supervisor binds before forking its workers.
+
+The supervisor restarts workers which die and, on ``SIGTERM``
+or ``SIGINT``, forwards the signal to its workers so that they
+initiate the closing handshake of their websockets before
+exiting.
+
+.. code-block:: python
+
+    from ws4py.websocket import EchoWebSocket
+    from ws4py.server.prefork import PreforkServer, WSGIRefWorker
+    from ws4py.server.wsgiutils import WebSocketWSGIApplication
+
+    app = WebSocketWSGIApplication(handler_cls=EchoWebSocket)
+    server = PreforkServer(WSGIRefWorker(app), port=9000, workers=4)
+    server.serve_forever()
+
+With the asyncio based server:
+
+.. code-block:: python
+
+    from ws4py.async_websocket import EchoWebSocket
+    from ws4py.server.prefork import PreforkServer, AsyncioWorker
+
+    PreforkServer(AsyncioWorker(EchoWebSocket), port=9000).serve_forever()
+
+Workers are created with ``os.fork`` which is only available on Unix.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger('ws4py')
+
+__all__ = ['PreforkServer', 'WSGIRefWorker', 'AsyncioWorker']
+
+STOP_SIGNALS = (signal.SIGTERM, signal.SIGINT)
+
+def _block_stop_signals():
+    """
+    Blocks the stop signals and returns the previous
+    signal mask, or ``None`` when Python can't block
+    them (before 3.3).
+    """
+    if not hasattr(signal, 'pthread_sigmask'):
+        return None
+    return signal.pthread_sigmask(signal.SIG_BLOCK, STOP_SIGNALS)
+
+def _restore_signals(mask):
+    if mask is not None:
+        signal.pthread_sigmask(signal.SIG_SETMASK, mask)
+
+def _exit_worker(signum, frame):
+    # the worker's own cleanup should not be interrupted
+    for signum in STOP_SIGNALS:
+        signal.signal(signum, signal.SIG_IGN)
+    raise SystemExit(0)
+
+class WSGIRefWorker(object):
+    def __init__(self, app, handler_class=None, server_class=None,
+                 backplane=None, **manager_options):
+        """
+        Serves the WSGI ``app`` from a worker process with a
+        :class:`ws4py.server.wsgirefserver.WSGIServer`, or
+        ``server_class``, and its websockets manager, created
+        with ``manager_options``.
+
+        The ``backplane``, see :mod:`ws4py.backplane`, is attached
+        to the manager of each worker so that broadcasts reach
+        the websockets of all of them.
+        """
+        self.app = app
+        self.handler_class = handler_class
+        self.server_class = server_class
+        self.backplane = backplane
+        self.manager_options = manager_options
+
+    def __call__(self, sock):
+        from ws4py.server.wsgirefserver import WSGIServer, WebSocketWSGIRequestHandler
+
+        server_class = self.server_class or WSGIServer
+        handler_class = self.handler_class or WebSocketWSGIRequestHandler
+
+        host, port = sock.getsockname()[:2]
+        server = server_class((host, port), handler_class, bind_and_activate=False)
+        server.socket.close()
+        server.socket = sock
+        server.server_address = (host, port)
+        server.server_name = socket.getfqdn(host)
+        server.server_port = port
+        server.setup_environ()
+        server.set_app(self.app)
+
+        server.initialize_websockets_manager(**self.manager_options)
+        if self.backplane is not None:
+            self.backplane.attach(server.manager)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+class AsyncioWorker(object):
+    def __init__(self, handler_cls, shutdown_timeout=5.0):
+        """
+        Serves websockets of ``handler_cls`` from a worker process
+        with the asyncio :class:`ws4py.server.tulipserver.WebSocketProtocol`.
+
+        When stopped, the worker waits up to ``shutdown_timeout``
+        seconds for the closing handshakes to complete.
+        """
+        self.handler_cls = handler_cls
+        self.shutdown_timeout = shutdown_timeout
+
+    def __call__(self, sock):
+        import asyncio
+        import weakref
+        from ws4py.server.tulipserver import WebSocketProtocol
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        protocols = weakref.WeakSet()
+
+        def factory():
+            protocol = WebSocketProtocol(self.handler_cls)
+            protocols.add(protocol)
+            return protocol
+
+        server = loop.run_until_complete(loop.create_server(factory, sock=sock))
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            for protocol in list(protocols):
+                try:
+                    protocol.close()
+                except Exception:
+                    pass
+
+            deadline = time.time() + self.shutdown_timeout
+            while time.time() < deadline and \
+                  any(not p.ws.terminated for p in list(protocols)):
+                loop.run_until_complete(asyncio.sleep(0.1))
+            loop.close()
+
+class PreforkServer(object):
+    def __init__(self, worker, host='', port=9000, workers=None,
+                 reuse_port=None, backlog=128, shutdown_timeout=10.0):
+        """
+        Supervises ``workers`` processes, as many as CPUs by
+        default, listening on ``host`` and ``port``.
+
+        The ``worker`` callable is called from each worker process
+        with the listening socket and serves it until the process
+        is asked to stop: ``SystemExit`` is then raised from it.
+        See :class:`WSGIRefWorker` and :class:`AsyncioWorker`.
+
+        Each worker binds its own socket with ``SO_REUSEPORT``
+        when ``reuse_port`` is set, the default when available.
+        Otherwise, workers inherit the socket bound by the supervisor.
+        The port must not be ``0`` with ``SO_REUSEPORT``.
+
+        Workers still running ``shutdown_timeout`` seconds after
+        being asked to stop are killed.
+        """
+        if reuse_port is None:
+            reuse_port = hasattr(socket, 'SO_REUSEPORT')
+        elif reuse_port and not hasattr(socket, 'SO_REUSEPORT'):
+            raise ValueError("SO_REUSEPORT is not supported on this platform")
+
+        self.worker = worker
+        self.host = host
+        self.port = port
+        self.workers = workers or multiprocessing.cpu_count()
+        self.reuse_port = reuse_port
+        self.backlog = backlog
+        self.shutdown_timeout = shutdown_timeout
+
+        self.sock = None
+        """
+        Listening socket shared by the workers when
+        they don't use ``SO_REUSEPORT``.
+        """
+
+        self.pids = {}
+        """
+        Start time of each running worker by process id.
+        """
+
+        self.running = False
+        self._deadline = None
+        self._crashed = False
+
+    def listen(self):
+        """
+        Returns a new socket listening on the
+        server's address.
+        """
+        family, socktype, proto, canonname, address = socket.getaddrinfo(
+            self.host or None, self.port, socket.AF_UNSPEC,
+            socket.SOCK_STREAM, 0, socket.AI_PASSIVE)[0]
+        sock = socket.socket(family, socktype, proto)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if self.reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(address)
+        sock.listen(self.backlog)
+        return sock
+
+    def spawn(self):
+        """
+        Forks a new worker process and returns its process id.
+
+        The stop signals are blocked while forking so the worker
+        never runs the supervisor's handlers: those received
+        before it installed its own are delivered afterwards.
+        """
+        mask = _block_stop_signals()
+        try:
+            pid = os.fork()
+        except BaseException:
+            _restore_signals(mask)
+            raise
+        if pid:
+            _restore_signals(mask)
+            self.pids[pid] = time.time()
+            logger.info("Started worker %d" % pid)
+            return pid
+
+        code = 0
+        try:
+            for signum in STOP_SIGNALS:
+                signal.signal(signum, _exit_worker)
+            _restore_signals(mask)
+            sock = self.sock
+            if sock is None:
+                sock = self.listen()
+            self.worker(sock)
+        except SystemExit:
+            pass
+        except BaseException:
+            logger.exception("Worker %d failed" % os.getpid())
+            code = 1
+        finally:
+            os._exit(code)
+
+    def start(self):
+        """
+        Binds the shared listening socket, unless workers
+        use ``SO_REUSEPORT``, and spawns the workers.
+        """
+        self.running = True
+        if not self.reuse_port and self.sock is None:
+            self.sock = self.listen()
+        while len(self.pids) < self.workers:
+            self.spawn()
+
+    def stop(self, signum=signal.SIGTERM):
+        """
+        Stops restarting workers and forwards ``signum``
+        to them so that they exit gracefully.
+        """
+        if not self.running:
+            return
+
+        logger.info("Stopping %d workers" % len(self.pids))
+        self.running = False
+        self._deadline = time.time() + self.shutdown_timeout
+        self._signal(signum)
+
+    def _signal(self, signum):
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+    def _reap(self):
+        """
+        Collects the workers which exited.
+        """
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError:
+                # not our children anymore
+                self.pids.clear()
+                return
+            if not pid:
+                return
+            started = self.pids.pop(pid, None)
+            if started is not None and self.running:
+                logger.warning("Worker %d exited with status %d" % (pid, status))
+                if time.time() - started < 1:
+                    self._crashed = True
+
+    def serve_forever(self, poll_interval=0.1):
+        """
+        Starts the workers and supervises them, every ``poll_interval``
+        seconds, until ``SIGTERM`` or ``SIGINT`` is received. It is
+        then forwarded to the workers and their exit is awaited.
+
+        Workers dying in the meantime are replaced. Those which
+        didn't even last one second are restarted a second later
+        not to fork endlessly.
+        """
+        supervisor = os.getpid()
+
+        def handle(signum, frame):
+            # a worker forked without blocking signals
+            # may receive one before its handlers are set
+            if os.getpid() != supervisor:
+                _exit_worker(signum, frame)
+            self.stop(signum)
+
+        previous = dict((signum, signal.signal(signum, handle)) for signum in STOP_SIGNALS)
+        try:
+            self.start()
+            while self.running or self.pids:
+                time.sleep(poll_interval)
+                self._reap()
+                if self.running:
+                    self._respawn()
+                elif self.pids and time.time() > self._deadline:
+                    logger.warning("Killing %d workers" % len(self.pids))
+                    self._signal(signal.SIGKILL)
+                    self._deadline = time.time() + self.shutdown_timeout
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+            self.stop()
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+
+    def _respawn(self):
+        if self._crashed:
+            self._crashed = False
+            time.sleep(1)
+        while self.running and len(self.pids) < self.workers:
+            self.spawn()
@@ -72,6 +72,18 @@ class WebSocketProtocol(asyncio.StreamReaderProtocol):
         """
         self.ws.close()
 
+    def pause_writing(self):
+        """
+        The transport buffers more than the high amount of
+        the websocket's :attr:`write_limits <ws4py.websocket.WebSocket.write_limits>`.
+        """
+        asyncio.StreamReaderProtocol.pause_writing(self)
+        self.ws._writing_paused = True
+
+    def resume_writing(self):
+        asyncio.StreamReaderProtocol.resume_writing(self)
+        self.ws._writing_paused = False
+
     def timeout(self):
         self.ws.close_connection()
         if self.ws.started:
@@ -35,7 +35,7 @@ from wsgiref import util
 
 util._hoppish = {}.__contains__
 
-from ws4py.manager import WebSocketManager
+from ws4py.manager import WebSocketManager, ShardedWebSocketManager
 from ws4py import format_addresses
 from ws4py.server.wsgiutils import WebSocketWSGIApplication
 from ws4py.compat import get_connection
@@ -105,13 +105,19 @@ class WebSocketWSGIRequestHandler(WSGIRequestHandler):
         handler.run(self.server.get_app())
 
 class WSGIServer(_WSGIServer):
-    def initialize_websockets_manager(self):
+    def initialize_websockets_manager(self, shards=None, policy=None):
         """
         Call thos to start the underlying websockets
         manager. Make sure to call it once your server
         is created.
+
+        Set ``shards`` to spread websockets over several
+        managers, see :class:`ws4py.manager.ShardedWebSocketManager`.
         """
-        self.manager = WebSocketManager()
+        if shards:
+            self.manager = ShardedWebSocketManager(shards=shards, policy=policy)
+        else:
+            self.manager = WebSocketManager()
         self.manager.start()
 
     def shutdown_request(self, request):
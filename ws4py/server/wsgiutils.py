@@ -53,6 +53,7 @@ import sys
 
 from ws4py.websocket import WebSocket
 from ws4py.exc import HandshakeError
+from ws4py.extensions import negotiate_extensions
 from ws4py.compat import unicode, py3k
 from ws4py import WS_VERSION, WS_KEY, format_addresses
 
@@ -67,6 +68,10 @@ class WebSocketWSGIApplication(object):
         by validating the requested protocols and extensions as
         well as the websocket version.
 
+        Extensions are given by name or, for those implemented
+        by ws4py such as :class:`ws4py.extensions.PerMessageDeflate`,
+        as a configured instance.
+
         If the upgrade validates, the `handler_cls` class
         is instanciated and stored inside the WSGI `environ`
         under the `'ws4py.websocket'` key to make it
@@ -130,14 +135,8 @@ class WebSocketWSGIApplication(object):
                 if s in protocols:
                     ws_protocols.append(s)
 
-        ws_extensions = []
-        exts = self.extensions or []
-        extensions = environ.get('HTTP_SEC_WEBSOCKET_EXTENSIONS')
-        if extensions:
-            for ext in extensions.split(','):
-                ext = ext.strip()
-                if ext in exts:
-                    ws_extensions.append(ext)
+        ws_extensions = negotiate_extensions(environ.get('HTTP_SEC_WEBSOCKET_EXTENSIONS'),
+                                             self.extensions)
 
         accept_value = base64.b64encode(sha1(key.encode('utf-8') + WS_KEY).digest())
         if py3k: accept_value = accept_value.decode('utf-8')
@@ -150,7 +149,7 @@ class WebSocketWSGIApplication(object):
         if ws_protocols:
             upgrade_headers.append(('Sec-WebSocket-Protocol', ', '.join(ws_protocols)))
         if ws_extensions:
-            upgrade_headers.append(('Sec-WebSocket-Extensions', ','.join(ws_extensions)))
+            upgrade_headers.append(('Sec-WebSocket-Extensions', ','.join([str(ext) for ext in ws_extensions])))
 
         start_response("101 Switching Protocols", upgrade_headers)
 
@@ -1,18 +1,74 @@
 # -*- coding: utf-8 -*-
 import struct
+import tempfile
+import zlib
 from struct import unpack
 
 from ws4py.utf8validator import Utf8Validator
 from ws4py.messaging import TextMessage, BinaryMessage, CloseControlMessage,\
      PingControlMessage, PongControlMessage
-from ws4py.framing import Frame, OPCODE_CONTINUATION, OPCODE_TEXT, \
+from ws4py import masking
+from ws4py.compat import py3k
+from ws4py.framing import FrameParser, FrameChunk, OPCODE_CONTINUATION, OPCODE_TEXT, \
      OPCODE_BINARY, OPCODE_CLOSE, OPCODE_PING, OPCODE_PONG
-from ws4py.exc import FrameTooLargeException, ProtocolException, InvalidBytesError,\
+from ws4py.exc import FrameTooLargeException, MessageTooLargeException, \
+     ProtocolException, InvalidBytesError,\
      TextFrameEncodingException, UnsupportedFrameTypeException, StreamClosed
-from ws4py.compat import py3k
 
 VALID_CLOSING_CODES = [1000, 1001, 1002, 1003, 1007, 1008, 1009, 1010, 1011]
 
+class Event(object):
+    def __init__(self, message):
+        """
+        Something that happened on the stream while parsing
+        incoming bytes, as returned by :meth:`Stream.feed`.
+
+        The ``message`` attribute holds the related
+        :class:`ws4py.messaging.Message` instance.
+        """
+        self.message = message
+
+    def __repr__(self):
+        return "<%s %r>" % (self.__class__.__name__, self.message)
+
+class MessageReceived(Event):
+    """
+    A text or binary message was completely received. If
+    it was fragmented, all its fragments have been reassembled.
+    """
+
+class FragmentReceived(Event):
+    """
+    A frame of a text or binary message was received while
+    :attr:`Stream.stream_fragments` is set. The ``message``
+    holds that frame's payload only, as the opcode of the
+    message it belongs to, and is ``completed`` when it is
+    the last one of the message.
+    """
+
+class PingReceived(Event):
+    """
+    A :class:`ws4py.messaging.PingControlMessage` was received.
+    """
+
+class PongReceived(Event):
+    """
+    A :class:`ws4py.messaging.PongControlMessage` was received.
+    """
+
+class CloseReceived(Event):
+    """
+    The peer sent a :class:`ws4py.messaging.CloseControlMessage`.
+    Nothing following it is parsed.
+    """
+
+class StreamError(Event):
+    """
+    The received bytes violate the protocol. The ``message``
+    is the :class:`ws4py.messaging.CloseControlMessage` to send
+    back to the peer. Nothing following it is parsed.
+    """
+
 class Stream(object):
     def __init__(self, always_mask=False, expect_masking=True):
         """ Represents a websocket stream of bytes flowing in and out.
@@ -27,19 +83,37 @@ class Stream(object):
            :linenos:
 
            >>> s = Stream()
-           >>> s.parser.send(BYTES)
-           >>> s.has_messages
-           False
-           >>> s.parser.send(MORE_BYTES)
-           >>> s.has_messages
-           True
-           >>> s.message
-           <TextMessage ... >
+           >>> s.feed(BYTES)
+           []
+           >>> s.feed(MORE_BYTES)
+           [<MessageReceived <TextMessage ... >>, <PingReceived <PingControlMessage ... >>]
+
+        :meth:`feed` accepts any amount of bytes and returns the list
+        of :class:`Event` they completed. The older :attr:`parser`
+        generator, which exposes its results through the :attr:`message`,
+        :attr:`pings`, :attr:`pongs`, :attr:`closing` and :attr:`errors`
+        attributes, is still available but both interfaces should not
+        be used on the same stream.
 
         Set ``always_mask`` to mask all frames built.
 
         Set ``expect_masking`` to indicate masking will be
         checked on all parsed frames.
+
+        Set :attr:`deflate` to the negotiated
+        :class:`ws4py.extensions.PerMessageDeflate` extension
+        to accept compressed messages.
+
+        Set :attr:`stream_fragments` to be handed each frame of
+        the data messages as it arrives rather than the whole
+        message once reassembled.
+
+        Set :attr:`spool_threshold` to move large binary
+        messages to temporary files.
+
+        Set :attr:`max_frame_size` and :attr:`max_message_size`
+        to close the connection with a 1009 status code rather
+        than receive larger frames or messages.
         """
 
         self.message = None
@@ -78,9 +152,82 @@ class Stream(object):
         Parser in charge to process bytes it is fed with.
         """
 
+        self._frames = FrameParser()
+        self._utf8validator = Utf8Validator()
+        self._stopped = False
+
+        self._deflate = None
+        self._inflating = False
+
         self.always_mask = always_mask
         self.expect_masking = expect_masking
 
+        self.stream_fragments = False
+        """
+        When set, :meth:`feed` returns a :class:`FragmentReceived`
+        event for every frame of a text or binary message instead
+        of buffering them until a :class:`MessageReceived` one.
+        Only the current frame is then held in memory. Text frames
+        are still validated but may end in the middle of a
+        character which the next frame completes.
+        """
+
+        self.spool_threshold = None
+        """
+        Size, in bytes, past which a binary message being
+        received is moved to a temporary file, see
+        :meth:`ws4py.messaging.Message.spool`, so that its
+        following fragments don't stay in memory. The message's
+        ``data`` is then that file rather than ``bytes``.
+        Not spooled when ``None``.
+
+        Frames larger than this are written to the file as their
+        bytes arrive, and inflated into it piece by piece when
+        compressed, rather than buffered whole first.
+        """
+        self._message_size = 0
+
+    @property
+    def deflate(self):
+        """
+        The negotiated :class:`ws4py.extensions.PerMessageDeflate`
+        extension, if any. Incoming messages with the RSV1 bit
+        set are then decompressed with it.
+        """
+        return self._deflate
+
+    @deflate.setter
+    def deflate(self, deflate):
+        self._deflate = deflate
+        self._frames.allowed_rsv = 0x4 if deflate is not None else 0
+
+    @property
+    def max_frame_size(self):
+        """
+        Largest payload, in bytes, accepted in a single frame.
+        Larger frames are rejected from their header, before
+        their payload is buffered. Not limited when ``None``.
+        """
+        return self._frames.max_frame_size
+
+    @max_frame_size.setter
+    def max_frame_size(self, size):
+        self._frames.max_frame_size = size
+
+    @property
+    def max_message_size(self):
+        """
+        Largest payload, in bytes, accepted in a text or binary
+        message, fragmented or not. Checked from the frame headers
+        and, for compressed messages, once inflated. Not limited
+        when ``None``.
+        """
+        return self._frames.max_message_size
+
+    @max_message_size.setter
+    def max_message_size(self, size):
+        self._frames.max_message_size = size
+
     @property
     def parser(self):
         if self._parser is None:
@@ -102,6 +249,9 @@ class Stream(object):
         self.pings = None
         self.pongs = None
         self.closing = None
+        self._frames.reset()
+        self._utf8validator.reset()
+        self._stopped = True
 
     def text_message(self, text):
         """
@@ -154,6 +304,158 @@ class Stream(object):
         """
         return PongControlMessage(data).single(mask=self.always_mask)
 
+    def feed(self, data):
+        """
+        Parses ``data``, of any size, and returns the list of
+        :class:`Event` instances for every complete message, control
+        frame and protocol error found in it. Incomplete frames are
+        kept until more bytes are fed.
+
+        Once a :class:`CloseReceived` or :class:`StreamError` event
+        is returned, any further bytes are ignored.
+        """
+        if self._stopped:
+            return []
+
+        events = []
+        frames = self._frames
+        frames.chunk_threshold = None if self.stream_fragments else self.spool_threshold
+        if data:
+            frames.feed(data)
+
+        try:
+            for frame in frames:
+                event = self._handle_frame(frame, self._utf8validator)
+                if event is None:
+                    continue
+
+                events.append(event)
+                if isinstance(event, MessageReceived) or \
+                   (isinstance(event, FragmentReceived) and event.message.completed):
+                    self.message = None
+                    self._utf8validator.reset()
+                elif isinstance(event, (CloseReceived, StreamError)):
+                    if isinstance(event, CloseReceived):
+                        self.closing = event.message
+                    self._stopped = True
+                    frames.reset()
+                    break
+        except ProtocolException:
+            events.append(StreamError(CloseControlMessage(code=1002)))
+        except MessageTooLargeException:
+            events.append(StreamError(CloseControlMessage(code=1009, reason="Message too big")))
+        except FrameTooLargeException:
+            events.append(StreamError(CloseControlMessage(code=1002, reason="Frame was too large")))
+        except (IOError, OSError):
+            # a spooled message couldn't be written
+            events.append(StreamError(CloseControlMessage(code=1011, reason="Could not spool the message")))
+        else:
+            return events
+
+        self._stopped = True
+        frames.reset()
+        return events
+
+    def _spool(self, m):
+        """
+        Moves the payload of the binary message ``m`` to a
+        temporary file once it grew past :attr:`spool_threshold`.
+        """
+        threshold = self.spool_threshold
+        if threshold is not None and self._message_size > threshold and not m.spooled:
+            m.spool(tempfile.TemporaryFile())
+
+    def _handle_chunk(self, chunk):
+        """
+        Interprets a :class:`ws4py.framing.FrameChunk`, part of a
+        frame of a binary message larger than :attr:`spool_threshold`,
+        by writing it straight to the spooled message.
+        """
+        some_bytes = chunk.payload
+        masking_key = chunk.masking_key
+        if masking_key and self.expect_masking:
+            # the key goes on from where the previous chunk stopped
+            shift = chunk.offset % 4
+            some_bytes = masking.mask(masking_key[shift:] + masking_key[:shift], some_bytes)
+        elif not masking_key and self.expect_masking:
+            return StreamError(CloseControlMessage(code=1002, reason='Missing masking when expected'))
+        elif masking_key and not self.expect_masking:
+            return StreamError(CloseControlMessage(code=1002, reason='Masked when not expected'))
+        elif not py3k:
+            some_bytes = some_bytes.tobytes()
+
+        if chunk.offset == 0:
+            if chunk.opcode == OPCODE_BINARY:
+                if self.message and not self.message.completed:
+                    return StreamError(CloseControlMessage(code=1002, reason='Received a new message before completing previous'))
+                self.message = BinaryMessage(b'')
+                self._message_size = 0
+                self._inflating = bool(chunk.rsv)
+            else:
+                if self.message is None or self.message.completed:
+                    return StreamError(CloseControlMessage(code=1002, reason='Message not started yet'))
+                if chunk.rsv:
+                    return StreamError(CloseControlMessage(code=1002, reason='RSV1 set on a frame not starting a message'))
+            if not self.message.spooled:
+                self.message.spool(tempfile.TemporaryFile())
+
+        m = self.message
+        final = chunk.last and chunk.fin == 1
+        limit = self.max_message_size
+        if self._inflating:
+            max_length = 0
+            if limit is not None:
+                # inflate one byte too many at most to tell the message is too big
+                max_length = limit + 1 - self._message_size
+            try:
+                for data in self._deflate.decompress_chunks(some_bytes, final=final,
+                                                            max_length=max_length):
+                    m.extend(data)
+                    self._message_size += len(data)
+            except zlib.error:
+                return StreamError(CloseControlMessage(code=1007, reason='Invalid compressed data'))
+        else:
+            m.extend(some_bytes)
+            self._message_size += len(some_bytes)
+
+        if limit is not None and self._message_size > limit:
+            return StreamError(CloseControlMessage(code=1009, reason='Message too big'))
+
+        if final:
+            m.completed = True
+            return MessageReceived(m)
+
+    def _handle_fragment(self, frame, some_bytes, utf8validator):
+        """
+        Interprets a frame of a data message when
+        :attr:`stream_fragments` is set. Only the frame's payload
+        is kept in :attr:`message` so the next frame can
+        be checked against it.
+        """
+        previous = self.message
+        opcode = frame.opcode
+        if opcode == OPCODE_CONTINUATION:
+            if previous is None or previous.completed:
+                return StreamError(CloseControlMessage(code=1002, reason='Message not started yet'))
+            opcode = previous.opcode
+        elif previous is not None and not previous.completed:
+            return StreamError(CloseControlMessage(code=1002, reason='Received a new message before completing previous'))
+
+        if opcode == OPCODE_TEXT:
+            m = TextMessage(some_bytes)
+        else:
+            m = BinaryMessage(some_bytes)
+        m.completed = (frame.fin == 1)
+        self.message = m
+
+        if opcode == OPCODE_TEXT and some_bytes:
+            is_valid, end_on_code_point, _, _ = utf8validator.validate(some_bytes)
+
+            if not is_valid or (m.completed and not end_on_code_point):
+                return StreamError(CloseControlMessage(code=1007, reason='Invalid UTF-8 bytes'))
+
+        return FragmentReceived(m)
+
     def receiver(self):
         """
         Parser that keeps trying to interpret bytes it is fed with as
@@ -162,158 +464,224 @@ class Stream(object):
         Control message are single frames only while data messages, like text
         and binary, may be fragmented accross frames.
 
-        The way it works is by instanciating a :class:`wspy.framing.Frame` object,
-        then running its parser generator which yields how much bytes
-        it requires to performs its task. The stream parser yields this value
-        to its caller and feeds the frame parser.
+        The way it works is by feeding a :class:`ws4py.framing.FrameParser`
+        with the received bytes, whatever their size. The stream parser
+        yields how many bytes are still required to complete the
+        current frame.
 
-        When the frame parser raises :exc:`StopIteration`, the stream parser
-        tries to make sense of the parsed frame. It dispatches the frame's bytes
-        to the most appropriate message type based on the frame's opcode.
+        Each complete frame is then interpreted by :meth:`_handle_frame`
+        which dispatches the frame's bytes to the most appropriate
+        message type based on the frame's opcode.
 
         Overall this makes the stream parser totally agonstic to
         the data provider.
         """
         utf8validator = Utf8Validator()
-        running = True
-        frame = None
-        while running:
-            frame = Frame()
-            while 1:
-                try:
-                    some_bytes = (yield next(frame.parser))
-                    frame.parser.send(some_bytes)
-                except GeneratorExit:
-                    running = False
-                    break
-                except StopIteration:
-                    frame._cleanup()
-                    some_bytes = frame.body
-
-                    # Let's avoid unmasking when there is no payload
-                    if some_bytes:
-                        if frame.masking_key and self.expect_masking:
-                            some_bytes = frame.unmask(some_bytes)
-                        elif not frame.masking_key and self.expect_masking:
-                            msg = CloseControlMessage(code=1002, reason='Missing masking when expected')
-                            self.errors.append(msg)
-                            break
-                        elif frame.masking_key and not self.expect_masking:
-                            msg = CloseControlMessage(code=1002, reason='Masked when not expected')
-                            self.errors.append(msg)
-                            break
-                        else:
-                            # If we reach this stage, it's because
-                            # the frame wasn't masked and we didn't expect
-                            # it anyway. Therefore, on py2k, the bytes
-                            # are actually a str object and can't be used
-                            # in the utf8 validator as we need integers
-                            # when we get each byte one by one.
-                            # Our only solution here is to convert our
-                            # string to a bytearray.
-                            some_bytes = bytearray(some_bytes)
-
-                    if frame.opcode == OPCODE_TEXT:
-                        if self.message and not self.message.completed:
-                            # We got a text frame before we completed the previous one
-                            msg = CloseControlMessage(code=1002, reason='Received a new message before completing previous')
-                            self.errors.append(msg)
-                            break
-
-                        m = TextMessage(some_bytes)
-                        m.completed = (frame.fin == 1)
-                        self.message = m
-
-                        if some_bytes:
-                            is_valid, end_on_code_point, _, _ = utf8validator.validate(some_bytes)
-
-                            if not is_valid or (m.completed and not end_on_code_point):
-                                self.errors.append(CloseControlMessage(code=1007, reason='Invalid UTF-8 bytes'))
-                                break
-
-                    elif frame.opcode == OPCODE_BINARY:
-                        if self.message and not self.message.completed:
-                            # We got a text frame before we completed the previous one
-                            msg = CloseControlMessage(code=1002, reason='Received a new message before completing previous')
-                            self.errors.append(msg)
-                            break
-
-                        m = BinaryMessage(some_bytes)
-                        m.completed = (frame.fin == 1)
-                        self.message = m
-
-                    elif frame.opcode == OPCODE_CONTINUATION:
-                        m = self.message
-                        if m is None:
-                            self.errors.append(CloseControlMessage(code=1002, reason='Message not started yet'))
-                            break
-
-                        m.extend(some_bytes)
-                        m.completed = (frame.fin == 1)
-                        if m.opcode == OPCODE_TEXT:
-                            if some_bytes:
-                                is_valid, end_on_code_point, _, _ = utf8validator.validate(some_bytes)
-
-                                if not is_valid or (m.completed and not end_on_code_point):
-                                    self.errors.append(CloseControlMessage(code=1007, reason='Invalid UTF-8 bytes'))
-                                    break
-
-                    elif frame.opcode == OPCODE_CLOSE:
-                        code = 1005
-                        reason = ""
-                        if frame.payload_length == 0:
-                            self.closing = CloseControlMessage(code=1005)
-                        elif frame.payload_length == 1:
-                            self.closing = CloseControlMessage(code=1005, reason='Payload has invalid length')
-                        else:
-                            try:
-                                # at this stage, some_bytes have been unmasked
-                                # so actually are held in a bytearray
-                                code = int(unpack("!H", bytes(some_bytes[0:2]))[0])
-                            except struct.error:
-                                reason = 'Failed at decoding closing code'
-                            else:
-                                # Those codes are reserved or plainly forbidden
-                                if code not in VALID_CLOSING_CODES and not (2999 < code < 5000):
-                                    reason = 'Invalid Closing Frame Code: %d' % code
-                                    code = 1005
-                                elif frame.payload_length > 1:
-                                    reason = some_bytes[2:] if frame.masking_key else frame.body[2:]
-
-                                    if not py3k: reason = bytearray(reason)
-                                    is_valid, end_on_code_point, _, _ = utf8validator.validate(reason)
-                                    if not is_valid or not end_on_code_point:
-                                        self.errors.append(CloseControlMessage(code=1007, reason='Invalid UTF-8 bytes'))
-                                        break
-                                    reason = bytes(reason)
-                            self.closing = CloseControlMessage(code=code, reason=reason)
-
-                    elif frame.opcode == OPCODE_PING:
-                        self.pings.append(PingControlMessage(some_bytes))
-
-                    elif frame.opcode == OPCODE_PONG:
-                        self.pongs.append(PongControlMessage(some_bytes))
-
-                    else:
-                        self.errors.append(CloseControlMessage(code=1003))
-
-                    break
-
-                except ProtocolException:
-                    self.errors.append(CloseControlMessage(code=1002))
-                    break
-                except FrameTooLargeException:
-                    self.errors.append(CloseControlMessage(code=1002, reason="Frame was too large"))
-                    break
-
-            frame._cleanup()
-            frame.body = None
-            frame = None
-
-            if self.message is not None and self.message.completed:
-                utf8validator.reset()
-
+        frames = FrameParser(allowed_rsv=self._frames.allowed_rsv,
+                             max_frame_size=self.max_frame_size,
+                             max_message_size=self.max_message_size)
+        while True:
+            try:
+                some_bytes = (yield frames.needed)
+            except GeneratorExit:
+                break
+
+            if some_bytes:
+                frames.feed(some_bytes)
+
+            try:
+                for frame in frames:
+                    event = self._handle_frame(frame, utf8validator)
+                    if isinstance(event, StreamError):
+                        self.errors.append(event.message)
+                        # Stop interpreting anything that follows
+                        frames.reset()
+                        break
+                    elif isinstance(event, CloseReceived):
+                        self.closing = event.message
+                    elif isinstance(event, PingReceived):
+                        self.pings.append(event.message)
+                    elif isinstance(event, PongReceived):
+                        self.pongs.append(event.message)
+
+                    if self.message is not None and self.message.completed:
+                        utf8validator.reset()
+            except ProtocolException:
+                self.errors.append(CloseControlMessage(code=1002))
+                frames.reset()
+            except MessageTooLargeException:
+                self.errors.append(CloseControlMessage(code=1009, reason="Message too big"))
+                frames.reset()
+            except FrameTooLargeException:
+                self.errors.append(CloseControlMessage(code=1002, reason="Frame was too large"))
+                frames.reset()
+
+        frames.reset()
         utf8validator.reset()
         utf8validator = None
 
         self._cleanup()
+
+    def _handle_frame(self, frame, utf8validator):
+        """
+        Interprets a complete :class:`ws4py.framing.FrameRecord`
+        and returns the resulting :class:`Event` or ``None`` when
+        the frame is part of a message not yet completed.
+
+        The message being received is kept in :attr:`message`
+        until its last fragment arrives.
+        """
+        if isinstance(frame, FrameChunk):
+            return self._handle_chunk(frame)
+
+        some_bytes = frame.payload
+        masking_key = frame.masking_key
+        payload_length = len(some_bytes)
+
+        # Let's avoid unmasking when there is no payload
+        if payload_length:
+            if masking_key and self.expect_masking:
+                some_bytes = masking.mask(masking_key, some_bytes)
+            elif not masking_key and self.expect_masking:
+                return StreamError(CloseControlMessage(code=1002, reason='Missing masking when expected'))
+            elif masking_key and not self.expect_masking:
+                return StreamError(CloseControlMessage(code=1002, reason='Masked when not expected'))
+            else:
+                # If we reach this stage, it's because
+                # the frame wasn't masked and we didn't expect
+                # it anyway. The payload is a view over the
+                # receive buffer so we must copy it out, straight
+                # to the bytes messages hold. On py2k, we use
+                # a bytearray since we need integers when we get
+                # each byte one by one in the utf8 validator.
+                some_bytes = some_bytes.tobytes() if py3k else bytearray(some_bytes)
+        else:
+            some_bytes = b''
+
+        if frame.rsv:
+            # only RSV1 may be set, by permessage-deflate, on
+            # the first frame of a message
+            if frame.opcode not in (OPCODE_TEXT, OPCODE_BINARY):
+                return StreamError(CloseControlMessage(code=1002, reason='RSV1 set on a frame not starting a message'))
+            self._inflating = True
+        elif frame.opcode in (OPCODE_TEXT, OPCODE_BINARY):
+            self._inflating = False
+        elif frame.opcode == OPCODE_CONTINUATION and \
+             (self.message is None or self.message.completed):
+            self._inflating = False
+
+        if self._inflating and frame.opcode <= OPCODE_BINARY:
+            max_length = 0
+            if self.max_message_size is not None:
+                # inflate one byte too many at most to tell the message is too big
+                max_length = self.max_message_size + 1
+                if frame.opcode == OPCODE_CONTINUATION:
+                    max_length -= self._message_size
+            try:
+                some_bytes = self._deflate.decompress(some_bytes, final=frame.fin == 1,
+                                                      max_length=max_length)
+            except zlib.error:
+                return StreamError(CloseControlMessage(code=1007, reason='Invalid compressed data'))
+            if not py3k:
+                some_bytes = bytearray(some_bytes)
+
+        if frame.opcode <= OPCODE_BINARY:
+            if frame.opcode == OPCODE_CONTINUATION:
+                self._message_size += len(some_bytes)
+            else:
+                self._message_size = len(some_bytes)
+            # the frame parser only checked the compressed size
+            limit = self.max_message_size
+            if limit is not None and self._message_size > limit:
+                return StreamError(CloseControlMessage(code=1009, reason='Message too big'))
+
+        if self.stream_fragments and frame.opcode <= OPCODE_BINARY:
+            return self._handle_fragment(frame, some_bytes, utf8validator)
+
+        if frame.opcode == OPCODE_TEXT:
+            if self.message and not self.message.completed:
+                # We got a text frame before we completed the previous one
+                return StreamError(CloseControlMessage(code=1002, reason='Received a new message before completing previous'))
+
+            m = TextMessage(some_bytes)
+            m.completed = (frame.fin == 1)
+            self.message = m
+
+            if some_bytes:
+                is_valid, end_on_code_point, _, _ = utf8validator.validate(some_bytes)
+
+                if not is_valid or (m.completed and not end_on_code_point):
+                    return StreamError(CloseControlMessage(code=1007, reason='Invalid UTF-8 bytes'))
+
+            if m.completed:
+                return MessageReceived(m)
+
+        elif frame.opcode == OPCODE_BINARY:
+            if self.message and not self.message.completed:
+                # We got a text frame before we completed the previous one
+                return StreamError(CloseControlMessage(code=1002, reason='Received a new message before completing previous'))
+
+            m = BinaryMessage(some_bytes)
+            self._spool(m)
+            m.completed = (frame.fin == 1)
+            self.message = m
+
+            if m.completed:
+                return MessageReceived(m)
+
+        elif frame.opcode == OPCODE_CONTINUATION:
+            m = self.message
+            if m is None:
+                return StreamError(CloseControlMessage(code=1002, reason='Message not started yet'))
+
+            if m.opcode == OPCODE_BINARY:
+                self._spool(m)
+            m.extend(some_bytes)
+            m.completed = (frame.fin == 1)
+            if m.opcode == OPCODE_TEXT:
+                if some_bytes:
+                    is_valid, end_on_code_point, _, _ = utf8validator.validate(some_bytes)
+
+                    if not is_valid or (m.completed and not end_on_code_point):
+                        return StreamError(CloseControlMessage(code=1007, reason='Invalid UTF-8 bytes'))
+
+            if m.completed:
+                return MessageReceived(m)
+
+        elif frame.opcode == OPCODE_CLOSE:
+            code = 1005
+            reason = ""
+            if payload_length == 0:
+                return CloseReceived(CloseControlMessage(code=1005))
+            elif payload_length == 1:
+                return CloseReceived(CloseControlMessage(code=1005, reason='Payload has invalid length'))
+            else:
+                try:
+                    # at this stage, some_bytes have been unmasked
+                    # so actually are held in a bytearray
+                    code = int(unpack("!H", bytes(some_bytes[0:2]))[0])
+                except struct.error:
+                    reason = 'Failed at decoding closing code'
+                else:
+                    # Those codes are reserved or plainly forbidden
+                    if code not in VALID_CLOSING_CODES and not (2999 < code < 5000):
+                        reason = 'Invalid Closing Frame Code: %d' % code
+                        code = 1005
+                    elif payload_length > 1:
+                        reason = some_bytes[2:]
+                        # control frames may be interleaved with the fragments
+                        # of a text message, don't mess with its validation
+                        is_valid, end_on_code_point, _, _ = Utf8Validator().validate(reason)
+                        if not is_valid or not end_on_code_point:
+                            return StreamError(CloseControlMessage(code=1007, reason='Invalid UTF-8 bytes'))
+                        reason = bytes(reason)
+                return CloseReceived(CloseControlMessage(code=code, reason=reason))
+
+        elif frame.opcode == OPCODE_PING:
+            return PingReceived(PingControlMessage(some_bytes))
+
+        elif frame.opcode == OPCODE_PONG:
+            return PongReceived(PongControlMessage(some_bytes))
+
+        else:
+            return StreamError(CloseControlMessage(code=1003))
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+__doc__ = """
+A hierarchical timer wheel scheduling callbacks, such as
+heartbeats or timeouts, for many connections at once
+without a thread, nor a sorted structure, per timer.
+
+Time is divided into ticks of ``resolution`` seconds. The
+first wheel has one slot per tick, each following wheel has
+one slot per full turn of the previous one. Timers are put
+in the wheel matching how far their deadline is and moved
+down to the lower wheels as their deadline gets closer.
+Scheduling and cancelling are therefore done in constant time.
+
+The wheel doesn't run by itself, its owner calls
+:meth:`TimerWheel.advance` periodically and can wait up
+to :meth:`TimerWheel.next_timeout` seconds in between:
+
+.. code-block:: python
+
+    >>> from ws4py.timers import TimerWheel
+    >>> wheel = TimerWheel()
+    >>> timer = wheel.call_later(2.0, callback, 'arg')
+    >>> wheel.advance()  # runs the callbacks which are due
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger('ws4py')
+
+__all__ = ['Timer', 'TimerWheel']
+
+class Timer(object):
+    __slots__ = ('deadline', 'tick', 'callback', 'args', 'cancelled')
+
+    def __init__(self, deadline, tick, callback, args):
+        """
+        A callback scheduled by a :class:`TimerWheel`
+        to be run once its ``deadline`` is reached.
+        """
+        self.deadline = deadline
+        self.tick = tick
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Prevents the callback from being run. Cancelling
+        a timer which has already been run does nothing.
+        """
+        self.cancelled = True
+
+class TimerWheel(object):
+    def __init__(self, resolution=0.1, slots=64, levels=4, clock=time.time):
+        """
+        A timer wheel of ``levels`` wheels of ``slots`` slots.
+
+        Timers are run at the first tick, of ``resolution``
+        seconds, past their deadline. Those further away than
+        ``slots ** levels`` ticks are kept in the last wheel
+        until they get close enough.
+
+        The ``clock`` returns the current time in seconds.
+        """
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self._wheels = [[[] for i in range(slots)] for level in range(levels)]
+        self._due = []
+        self._count = 0
+        self._tick = self._ticks(clock())
+
+    def __len__(self):
+        """
+        Number of timers scheduled, cancelled ones included
+        until they get dropped.
+        """
+        return self._count
+
+    def _ticks(self, t):
+        return int(t / self.resolution)
+
+    def call_later(self, delay, callback, *args):
+        """
+        Schedules ``callback(*args)`` to be run in ``delay``
+        seconds and returns its :class:`Timer`.
+        """
+        deadline = self.clock() + delay
+        # rounded up so that timers never run early
+        tick = self._ticks(deadline)
+        if tick * self.resolution < deadline:
+            tick += 1
+
+        timer = Timer(deadline, tick, callback, args)
+        with self.lock:
+            self._place(timer)
+            self._count += 1
+        return timer
+
+    def _place(self, timer):
+        delta = timer.tick - self._tick
+        if delta <= 0:
+            self._due.append(timer)
+            return
+
+        span = self.slots
+        for level in range(self.levels):
+            if delta < span or level == self.levels - 1:
+                tick = min(timer.tick, self._tick + span - 1)
+                index = (tick // (span // self.slots)) % self.slots
+                self._wheels[level][index].append(timer)
+                return
+            span *= self.slots
+
+    def _cascade(self):
+        """
+        Moves the timers of the higher wheels whose slot
+        starts at the current tick down to the lower wheels.
+        """
+        span = self.slots
+        cascading = []
+        for level in range(1, self.levels):
+            if self._tick % span:
+                break
+            cascading.append((level, (self._tick // span) % self.slots))
+            span *= self.slots
+
+        # highest first so that their timers can land in
+        # the slots of the lower wheels about to cascade
+        for level, index in reversed(cascading):
+            timers = self._wheels[level][index]
+            self._wheels[level][index] = []
+            for timer in timers:
+                if timer.cancelled:
+                    self._count -= 1
+                else:
+                    self._place(timer)
+
+    def advance(self, now=None):
+        """
+        Moves the wheel up to ``now``, the current time by
+        default, and runs the callbacks of the timers
+        which are due. Errors they raise are logged.
+
+        Returns the number of callbacks run.
+        """
+        if now is None:
+            now = self.clock()
+        target = self._ticks(now)
+
+        with self.lock:
+            due = []
+            while self._tick < target:
+                self._tick += 1
+                self._cascade()
+                index = self._tick % self.slots
+                due.extend(self._wheels[0][index])
+                self._wheels[0][index] = []
+            # cascading may also find timers due right now
+            due.extend(self._due)
+            self._due = []
+            self._count -= len(due)
+
+        run = 0
+        for timer in due:
+            if timer.cancelled:
+                continue
+            timer.cancelled = True
+            run += 1
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                logger.exception("Timer callback %r failed: %s" % (timer.callback, repr(e)))
+        return run
+
+    def next_timeout(self):
+        """
+        Returns how long, in seconds, until the next timer may
+        be due or ``None`` when none is scheduled. Timers of the
+        higher wheels are only accounted for by when their
+        next slot is moved down.
+        """
+        with self.lock:
+            if self._due:
+                return 0
+            if not self._count:
+                return None
+
+            tick = None
+            for offset in range(1, self.slots + 1):
+                if self._wheels[0][(self._tick + offset) % self.slots]:
+                    tick = self._tick + offset
+                    break
+            if tick is None:
+                tick = (self._tick // self.slots + 1) * self.slots
+
+        return max(0, tick * self.resolution - self.clock())
+
+    def clear(self):
+        """
+        Drops every scheduled timer.
+        """
+        with self.lock:
+            for wheel in self._wheels:
+                for index in range(self.slots):
+                    wheel[index] = []
+            self._due = []
+            self._count = 0
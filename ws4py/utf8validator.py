@@ -29,6 +29,9 @@
 ##
 ###############################################################################
 
+import codecs
+
+from ws4py.compat import py3k
 
 class Utf8Validator(object):
     """
@@ -36,6 +39,11 @@ class Utf8Validator(object):
 
     Implements the algorithm "Flexible and Economical UTF-8 Decoder" by
     Bjoern Hoehrmann (http://bjoern.hoehrmann.de/utf-8/decoder/dfa/).
+
+    On Python 3, chunks are first checked for ASCII and otherwise fed
+    to the incremental UTF-8 decoder of :mod:`codecs`, both running
+    in C. The DFA only runs on invalid chunks to find where they fail.
+    Python 2's decoder accepts surrogates so the DFA is always used.
     """
 
     ## DFA transitions
@@ -60,6 +68,9 @@ class Utf8Validator(object):
     UTF8_REJECT = 1
 
     def __init__(self):
+        self._decoder = None
+        if py3k:
+            self._decoder = codecs.getincrementaldecoder('utf-8')()
         self.reset()
 
     def decode(self, b):
@@ -88,6 +99,8 @@ class Utf8Validator(object):
         self.state = Utf8Validator.UTF8_ACCEPT
         self.codepoint = 0
         self.i = 0
+        if self._decoder is not None:
+            self._decoder.reset()
 
     def validate(self, ba):
         """
@@ -102,6 +115,39 @@ class Utf8Validator(object):
         When valid? == True, currentIndex will be len(ba) and totalIndex the
         total amount of consumed bytes.
         """
+        decoder = self._decoder
+        if decoder is None or self.state == Utf8Validator.UTF8_REJECT:
+            return self.validate_dfa(ba)
+
+        isascii = getattr(ba, 'isascii', None)
+        if self.state != Utf8Validator.UTF8_ACCEPT or isascii is None or not isascii():
+            try:
+                decoder.decode(ba)
+            except UnicodeDecodeError:
+                state = Utf8Validator.UTF8_REJECT
+            else:
+                # the DFA state matching the incomplete code point left, if any
+                state = Utf8Validator.UTF8_ACCEPT
+                DFA = Utf8Validator.UTF8VALIDATOR_DFA
+                for b in bytearray(decoder.getstate()[0]):
+                    state = DFA[256 + (state << 4) + DFA[b]]
+
+            if state == Utf8Validator.UTF8_REJECT:
+                # self.state is still the one the chunk started with
+                decoder.reset()
+                return self.validate_dfa(ba)
+            self.state = state
+
+        # same indices as the DFA would return
+        i = len(ba) - 1 if len(ba) else 0
+        self.i += i
+        return True, self.state == Utf8Validator.UTF8_ACCEPT, i, self.i
+
+    def validate_dfa(self, ba):
+        """
+        Same as :meth:`validate` but always running the DFA
+        over each byte of ``ba``.
+        """
         state = self.state
         DFA = Utf8Validator.UTF8VALIDATOR_DFA
         i = 0  # make sure 'i' is set if when 'ba' is empty
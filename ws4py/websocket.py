@@ -1,29 +1,82 @@
 # -*- coding: utf-8 -*-
 import logging
+import select
 import socket
 import ssl
 import time
 import threading
 import types
 import errno
+from collections import deque
+from itertools import islice
 
 try:
-    from OpenSSL.SSL import Error as pyOpenSSLError
+    from OpenSSL.SSL import Error as pyOpenSSLError,\
+        WantReadError as pyOpenSSLWantReadError,\
+        WantWriteError as pyOpenSSLWantWriteError
 except ImportError:
     class pyOpenSSLError(Exception):
         pass
 
+    class pyOpenSSLWantReadError(pyOpenSSLError):
+        pass
+
+    class pyOpenSSLWantWriteError(pyOpenSSLError):
+        pass
+
 from ws4py import WS_KEY, WS_VERSION
 from ws4py.exc import HandshakeError, StreamClosed
-from ws4py.streaming import Stream
+from ws4py.streaming import Stream, MessageReceived, FragmentReceived, PingReceived,\
+    PongReceived, CloseReceived, StreamError
 from ws4py.messaging import Message, PingControlMessage,\
-    PongControlMessage
+    PongControlMessage, PreparedMessage
+from ws4py.extensions import PerMessageDeflate
 from ws4py.compat import basestring, unicode
 
-DEFAULT_READING_SIZE = 2
+DEFAULT_READING_SIZE = 65536
+
+# Seconds given to a non-blocking connection to send
+# what is left in its outbound queue before being closed.
+CLOSE_FLUSH_TIMEOUT = 2.0
+
+# Raised by non-blocking sockets when the operation
+# would have blocked.
+WOULD_BLOCK_ERRORS = (ssl.SSLWantReadError, ssl.SSLWantWriteError,
+                      pyOpenSSLWantReadError, pyOpenSSLWantWriteError)
+WOULD_BLOCK_ERRNOS = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+# Largest amount of buffers handed over to a single
+# ``socket.sendmsg`` call. Linux and BSDs accept 1024.
+IOV_MAX = 1024
+
+# SSL sockets do not implement ``sendmsg`` and
+# Python 2 does not provide it at all.
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
 
 logger = logging.getLogger('ws4py')
 
+def _consume(buffers, sent):
+    """
+    Drops ``sent`` bytes from the head of the ``buffers`` deque.
+    """
+    while buffers and sent >= len(buffers[0]):
+        sent -= len(buffers[0])
+        buffers.popleft()
+    if sent:
+        buffers[0] = memoryview(buffers[0])[sent:]
+
+def _wait_writable(sock, timeout=None):
+    """
+    Waits until the socket can be written to, or for
+    ``timeout`` seconds.
+    """
+    if hasattr(select, 'poll'):
+        poller = select.poll()
+        poller.register(sock, select.POLLOUT)
+        poller.poll(None if timeout is None else int(timeout * 1000) + 1)
+    else:
+        select.select([], [sock], [], timeout)
+
 __all__ = ['WebSocket', 'EchoWebSocket', 'Heartbeat']
 
 class Heartbeat(threading.Thread):
@@ -99,8 +152,10 @@ class WebSocket(object):
 
         self.extensions = extensions
         """
-        List of extensions supported by this endpoint.
-        Unused for now.
+        List of extensions negotiated during the handshake.
+        Those implemented by ws4py, such as
+        :class:`ws4py.extensions.PerMessageDeflate`, are
+        enabled on the :attr:`stream`.
         """
 
         self.sock = sock
@@ -125,7 +180,14 @@ class WebSocket(object):
 
         self.reading_buffer_size = DEFAULT_READING_SIZE
         """
-        Current connection reading buffer size.
+        Maximum amount of bytes read from the connection at once.
+        The stream accepts any amount of bytes so this is
+        merely the size of the receiving buffer.
+        """
+
+        self.bytes_received = 0
+        """
+        Amount of bytes read from the connection so far.
         """
 
         self.environ = environ
@@ -138,8 +200,9 @@ class WebSocket(object):
         At which interval the heartbeat will be running.
         Set this to `0` or `None` to disable it entirely.
         """
-        "Internal buffer to get around SSL problems"
-        self.buf = b''
+        self._recv_buffer = None
+        self._recv_view = None
+        self._read_exhausted = False
 
         self.sock_timeout = None
         """
@@ -152,9 +215,147 @@ class WebSocket(object):
         If None is given, the socket is put in blocking mode.
         """
 
+        self._outbound = None
+        """
+        Buffers waiting to be sent once the connection is
+        writable. Only used by non-blocking connections,
+        see :meth:`set_nonblocking`.
+        """
+        self._send_lock = threading.Lock()
+        """
+        Held while a frame is built and written so that frames
+        sent from several threads are queued in the order the
+        shared compressor produced them.
+        """
+        self._outbound_lock = threading.Lock()
+        self._outbound_drained = threading.Condition(self._outbound_lock)
+        self._outbound_size = 0
+        self._write_notifier = None
+        self._linger = None
+        self._close_deadline = None
+        self._write_pending = False
+        self._writing_paused = False
+
+        self.write_limits = None
+        """
+        ``(high, low)`` amounts of bytes bounding the outbound
+        queue of a non-blocking connection. Once more than ``high``
+        bytes are queued, :attr:`writing_paused` is set until no
+        more than ``low`` bytes are left. Producers should then
+        wait with :meth:`drain`.
+        """
+
+        self.dispatcher = None
+        """
+        The :class:`Dispatcher <ws4py.dispatcher.Dispatcher>` running
+        :meth:`received_message`, :meth:`ponged` and :meth:`closed`
+        in a thread pool, if any. They are called straight away
+        by the thread reading the connection otherwise.
+        """
+
+        self.manager = None
+        """
+        The :class:`WebSocketManager <ws4py.manager.WebSocketManager>`
+        this websocket is managed by, if any. Its timers,
+        see :meth:`call_later() <ws4py.manager.WebSocketManager.call_later>`,
+        are run from the manager's thread.
+        """
+
+        self.inbound_limits = None
+        """
+        ``(high, low)`` amounts of bytes limiting the
+        :attr:`inbound_backlog`. Once it goes above ``high``,
+        :attr:`reading_paused` is set until it drops back
+        to ``low``. Not limited when ``None``.
+        """
+
+        self.inbound_backlog = 0
+        """
+        Amount of bytes of the messages received and
+        waiting to be handled by the :attr:`dispatcher`.
+        """
+
+        self.reading_paused = False
+        """
+        Whether reading from the connection is paused because
+        of the :attr:`inbound_limits`. Backends stop reading
+        so that TCP flow control pushes back on the peer.
+        """
+        self._inbound_lock = threading.Lock()
+
         self._local_address = None
         self._peer_address = None
 
+        self._setup_extensions()
+
+    def _setup_extensions(self):
+        """
+        Enables on the stream the negotiated :attr:`extensions`
+        implemented by ws4py.
+        """
+        for ext in self.extensions or []:
+            if isinstance(ext, PerMessageDeflate) and ext.is_server is not None:
+                self.stream.deflate = ext
+
+    @property
+    def stream_fragments(self):
+        """
+        When set, the frames of text and binary messages are
+        passed to :meth:`received_fragment` as they arrive
+        instead of being reassembled for :meth:`received_message`.
+        Set it before the first message is received, in
+        :meth:`opened` for instance.
+        """
+        return self.stream.stream_fragments
+
+    @stream_fragments.setter
+    def stream_fragments(self, enabled):
+        self.stream.stream_fragments = enabled
+
+    @property
+    def spool_threshold(self):
+        """
+        Size, in bytes, past which binary messages are
+        moved to a temporary file while being received. The
+        ``data`` of the messages passed to :meth:`received_message`
+        is then a file object rather than ``bytes``. See
+        :attr:`ws4py.streaming.Stream.spool_threshold`.
+        """
+        return self.stream.spool_threshold
+
+    @spool_threshold.setter
+    def spool_threshold(self, threshold):
+        self.stream.spool_threshold = threshold
+
+    @property
+    def max_frame_size(self):
+        """
+        Largest frame payload, in bytes, accepted from the peer.
+        The connection is closed with a 1009 status code as soon
+        as a larger frame header is received. See
+        :attr:`ws4py.streaming.Stream.max_frame_size`.
+        """
+        return self.stream.max_frame_size
+
+    @max_frame_size.setter
+    def max_frame_size(self, size):
+        self.stream.max_frame_size = size
+
+    @property
+    def max_message_size(self):
+        """
+        Largest text or binary message, in bytes, accepted from
+        the peer, whether fragmented or not. The connection is
+        closed with a 1009 status code as soon as a frame header
+        shows the message goes past it. See
+        :attr:`ws4py.streaming.Stream.max_message_size`.
+        """
+        return self.stream.max_message_size
+
+    @max_message_size.setter
+    def max_message_size(self, size):
+        self.stream.max_message_size = size
+
     @property
     def local_address(self):
         """
@@ -204,6 +405,9 @@ class WebSocket(object):
                 self._write(self.stream.close(code=code, reason=reason).single(mask=self.stream.always_mask))
             except Exception as ex:
                 logger.error("Error when terminating the connection: %s", str(ex))
+            manager = self.manager
+            if manager is not None:
+                manager.closing(self)
 
     def closed(self, code, reason=None):
         """
@@ -215,6 +419,30 @@ class WebSocket(object):
         """
         pass
 
+    @property
+    def has_pending_data(self):
+        """
+        Returns ``True`` when bytes were already pulled off
+        the connection, by the SSL layer, but not read yet.
+        The poller won't report them so :meth:`once` must be
+        called again without waiting for it.
+        """
+        if not self._is_secure or self.terminated:
+            return False
+        return bool(self.sock.pending())
+
+    @property
+    def read_exhausted(self):
+        """
+        Returns ``True`` when the last call to :meth:`once`
+        left nothing to read on the connection: reading would
+        block or fewer bytes than asked for were received from
+        a plain socket. Edge-triggered pollers don't report a
+        connection again until new bytes arrive so it must be
+        read until then.
+        """
+        return self._read_exhausted
+
     @property
     def terminated(self):
         """
@@ -230,8 +458,32 @@ class WebSocket(object):
     def close_connection(self):
         """
         Shutdowns then closes the underlying connection.
+
+        A non-blocking connection is given up to
+        ``CLOSE_FLUSH_TIMEOUT`` seconds overall to send what is
+        left in its outbound queue first. When its ``linger``
+        callable, see :meth:`set_nonblocking`, takes care of it,
+        the connection is left open for now and this method is
+        called again once the queue was sent or the time is up.
         """
         if self.sock:
+            with self._outbound_lock:
+                if self._outbound:
+                    if self._close_deadline is None:
+                        self._close_deadline = time.time() + CLOSE_FLUSH_TIMEOUT
+                        linger, self._linger = self._linger, None
+                        if linger is not None and linger(self):
+                            return
+                    try:
+                        while True:
+                            self._send_outbound()
+                            remaining = self._close_deadline - time.time()
+                            if not self._outbound or remaining <= 0:
+                                break
+                            _wait_writable(self.sock, remaining)
+                    except:
+                        pass
+                    self._discard_outbound()
             try:
                 self.sock.shutdown(socket.SHUT_RDWR)
             except:
@@ -263,7 +515,24 @@ class WebSocket(object):
         is received and ready for application's processing.
 
         The passed message is an instance of :class:`messaging.TextMessage`
-        or :class:`messaging.BinaryMessage`.
+        or :class:`messaging.BinaryMessage`. The ``data`` of binary
+        messages larger than :attr:`spool_threshold` is a file object.
+
+        .. note:: You should override this method in your subclass.
+        """
+        pass
+
+    def received_fragment(self, opcode, chunk, is_last):
+        """
+        Called, when :attr:`stream_fragments` is set, with
+        the payload of each frame of a message, as ``bytes``,
+        in order. The ``opcode`` is the one of the message,
+        :data:`ws4py.framing.OPCODE_TEXT` or
+        :data:`ws4py.framing.OPCODE_BINARY`, and ``is_last``
+        tells whether the message is now complete.
+
+        Text chunks are valid UTF-8 as a whole but a
+        character may be split across two chunks.
 
         .. note:: You should override this method in your subclass.
         """
@@ -292,11 +561,248 @@ class WebSocket(object):
 
         This cannot be bullet proof but hopefully
         will catch almost all use cases.
+
+        On a non-blocking connection, whatever cannot be sent
+        right away is queued until :meth:`flush` is called.
         """
         if self.terminated or self.sock is None:
             raise RuntimeError("Cannot send on a terminated websocket")
 
-        self.sock.sendall(b)
+        if self._outbound is None:
+            self.sock.sendall(b)
+            return
+
+        self._enqueue((b,))
+
+    def _writev(self, buffers):
+        """
+        Writes the given sequence of buffers, the parts
+        of one or several frames, as if they had been
+        joined together.
+
+        Plain sockets get them all at once through
+        ``socket.sendmsg`` so that they are neither copied
+        nor sent with one system call each. Other connections
+        go through :meth:`_write` with the joined buffers.
+        """
+        if not self._can_sendmsg():
+            self._write(b''.join(buffers))
+            return
+
+        if self.terminated:
+            raise RuntimeError("Cannot send on a terminated websocket")
+
+        if self._outbound is None:
+            buffers = deque(buffers)
+            while buffers:
+                _consume(buffers, self.sock.sendmsg(list(islice(buffers, IOV_MAX))))
+            return
+
+        self._enqueue(buffers)
+
+    def _throttle(self):
+        """
+        Waits for the outbound queue to drain
+        while writing is paused. The manager's thread
+        doesn't wait, the queue then keeps growing.
+        """
+        if self._writing_paused and not self._on_manager_thread():
+            self.drain()
+
+    def _on_manager_thread(self):
+        manager = self.manager
+        return manager is not None and manager._is_loop_thread()
+
+    def _can_sendmsg(self):
+        return HAS_SENDMSG and not self._is_secure \
+            and isinstance(self.sock, socket.socket)
+
+    def _enqueue(self, buffers):
+        with self._outbound_lock:
+            was_empty = not self._outbound
+            self._outbound.extend(buffers)
+            self._outbound_size += sum(len(b) for b in buffers)
+            if was_empty:
+                self._send_outbound()
+            self._notify_write_pending()
+
+    def set_nonblocking(self, notifier=None, linger=None):
+        """
+        Puts the connection in non-blocking mode so that
+        sending to a slow peer never blocks the caller.
+        Bytes that cannot be sent straight away are queued
+        and sent by :meth:`flush` once the connection
+        becomes writable again.
+
+        The ``notifier`` callable, when provided, is called
+        with this websocket and a boolean every time there starts
+        being, or stops being, data queued. Managers use it to
+        watch the connection for writability only when needed.
+        It is called while the outbound queue is locked.
+
+        The ``linger`` callable, when provided, is called with
+        this websocket when its connection is closed with data still
+        queued. Returning ``True``, it takes care of flushing the
+        queue then of calling :meth:`close_connection` again, within
+        ``CLOSE_FLUSH_TIMEOUT`` seconds, without blocking the caller.
+        """
+        with self._outbound_lock:
+            if self._outbound is None:
+                self._outbound = deque()
+            self._write_notifier = notifier
+            self._linger = linger
+        self.sock.setblocking(False)
+
+    @property
+    def write_pending(self):
+        """
+        Returns ``True`` when some data is queued,
+        waiting for the connection to be writable.
+        """
+        return bool(self._outbound)
+
+    @property
+    def buffered_amount(self):
+        """
+        Amount of bytes queued, waiting for
+        the connection to be writable.
+        """
+        return self._outbound_size
+
+    @property
+    def writing_paused(self):
+        """
+        Returns ``True`` while more bytes are queued than
+        :attr:`write_limits` allow. Producers should stop
+        sending until :meth:`drain` returns.
+        """
+        return self._writing_paused
+
+    def drain(self, timeout=None):
+        """
+        Blocks until no more than the low amount of
+        :attr:`write_limits` is queued, nothing at all without
+        limits, or until ``timeout`` seconds elapsed. Returns
+        ``True`` unless it timed out or the connection
+        was closed with data still queued.
+
+        The manager of a websocket sends its queue as the
+        connection becomes writable. Without a running manager,
+        the queue is sent from here instead.
+
+        Any thread may wait but the one running the manager's
+        mainloop, handlers run without a :attr:`dispatcher` for
+        instance: it would hold up every other websocket of
+        the manager, a ``RuntimeError`` is raised instead.
+        Generators given to :meth:`send` from there are
+        therefore not throttled.
+
+        Socket errors are raised to the caller.
+        """
+        if self._on_manager_thread():
+            raise RuntimeError("Cannot wait for the outbound queue to drain "
+                               "from the manager's thread")
+
+        deadline = None if timeout is None else time.time() + timeout
+        manager = self.manager
+        sends = manager is None or manager._in_loop()
+        low = self.write_limits[1] if self.write_limits else 0
+
+        while True:
+            with self._outbound_lock:
+                if self._outbound_size <= low:
+                    return True
+                sock = self.sock
+                if sock is None:
+                    return False
+
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        return False
+
+                if not sends:
+                    self._outbound_drained.wait(remaining)
+                    continue
+
+                self._send_outbound()
+                self._notify_write_pending()
+                if self._outbound_size <= low:
+                    return True
+
+            _wait_writable(sock, remaining)
+
+    def flush(self):
+        """
+        Sends as much of the outbound queue as the
+        connection accepts without blocking. Returns ``True``
+        when nothing is left to send.
+
+        Socket errors are raised to the caller.
+        """
+        with self._outbound_lock:
+            if not self._outbound:
+                return True
+            if self.sock is None:
+                raise RuntimeError("Cannot send on a closed websocket")
+            self._send_outbound()
+            self._notify_write_pending()
+            return not self._outbound
+
+    def _discard_outbound(self):
+        """
+        Drops whatever is left in the outbound queue.
+        Must be called with the queue locked.
+        """
+        self._outbound.clear()
+        self._outbound_size = 0
+        self._writing_paused = False
+        self._outbound_drained.notify_all()
+
+    def _send_outbound(self):
+        outbound = self._outbound
+        sendmsg = self._can_sendmsg()
+        while outbound:
+            if sendmsg and len(outbound) > 1:
+                batch = list(islice(outbound, IOV_MAX))
+            else:
+                batch = [outbound[0]]
+            try:
+                if len(batch) > 1:
+                    sent = self.sock.sendmsg(batch)
+                else:
+                    sent = self.sock.send(batch[0])
+            except WOULD_BLOCK_ERRORS:
+                return
+            except (socket.error, OSError) as e:
+                if e.errno in WOULD_BLOCK_ERRNOS:
+                    return
+                raise
+
+            _consume(outbound, sent)
+            self._outbound_size -= sent
+            if sent < sum(len(b) for b in batch):
+                return
+
+    def _notify_write_pending(self):
+        size = self._outbound_size
+        limits = self.write_limits
+        low = 0
+        if limits is not None:
+            high, low = limits
+            if size > high:
+                self._writing_paused = True
+            elif size <= low:
+                self._writing_paused = False
+        if size <= low:
+            self._outbound_drained.notify_all()
+
+        pending = bool(self._outbound)
+        if pending is not self._write_pending:
+            self._write_pending = pending
+            if self._write_notifier:
+                self._write_notifier(self, pending)
 
     def send(self, payload, binary=False):
         """
@@ -308,90 +814,100 @@ class WebSocket(object):
         If ``payload`` is a generator, each chunk is sent as part of
         fragmented message.
 
+        If ``payload`` is a :class:`ws4py.messaging.PreparedMessage`,
+        its frame is sent as-is unless this websocket masks
+        or compresses what it sends.
+
         If ``binary`` is set, handles the payload as a binary message.
+
+        Data messages are compressed when the permessage-deflate
+        extension was negotiated, see :attr:`Stream.deflate <ws4py.streaming.Stream.deflate>`.
+        Each frame is compressed and written, or queued, at once
+        so that several threads may send at the same time.
+
+        Returns the amount of bytes still queued on a non-blocking
+        connection, see :attr:`buffered_amount`. Senders of generators
+        wait with :meth:`drain` when :attr:`writing_paused` is set,
+        unless they run on the manager's thread.
         """
         message_sender = self.stream.binary_message if binary else self.stream.text_message
+        mask = self.stream.always_mask
+        deflate = self.stream.deflate
 
         if isinstance(payload, basestring) or isinstance(payload, bytearray):
-            m = message_sender(payload).single(mask=self.stream.always_mask)
-            self._write(m)
+            with self._send_lock:
+                m = message_sender(payload).single_parts(mask=mask, deflate=deflate)
+                self._writev(m)
 
         elif isinstance(payload, Message):
-            data = payload.single(mask=self.stream.always_mask)
-            self._write(data)
+            with self._send_lock:
+                data = payload.single_parts(mask=mask, deflate=deflate)
+                self._writev(data)
+
+        elif isinstance(payload, PreparedMessage):
+            with self._send_lock:
+                if mask or deflate is not None:
+                    self._writev(payload.message.single_parts(mask=mask, deflate=deflate))
+                else:
+                    self._writev(payload.parts)
 
         elif type(payload) == types.GeneratorType:
             bytes = next(payload)
             first = True
             for chunk in payload:
-                self._write(message_sender(bytes).fragment(first=first, mask=self.stream.always_mask))
+                with self._send_lock:
+                    self._writev(message_sender(bytes).fragment_parts(first=first, mask=mask, deflate=deflate))
+                self._throttle()
                 bytes = chunk
                 first = False
 
-            self._write(message_sender(bytes).fragment(first=first, last=True, mask=self.stream.always_mask))
+            with self._send_lock:
+                self._writev(message_sender(bytes).fragment_parts(first=first, last=True, mask=mask, deflate=deflate))
 
         else:
             raise ValueError("Unsupported type '%s' passed to send()" % type(payload))
 
-    def _get_from_pending(self):
-        """
-        The SSL socket object provides the same interface
-        as the socket interface but behaves differently.
-
-        When data is sent over a SSL connection
-        more data may be read than was requested from by
-        the ws4py websocket object.
-
-        In that case, the data may have been indeed read
-        from the underlying real socket, but not read by the
-        application which will expect another trigger from the
-        manager's polling mechanism as if more data was still on the
-        wire. This will happen only when new data is
-        sent by the other peer which means there will be
-        some delay before the initial read data is handled
-        by the application.
-
-        Due to this, we have to rely on a non-public method
-        to query the internal SSL socket buffer if it has indeed
-        more data pending in its buffer.
-
-        Now, some people in the Python community
-        `discourage <https://bugs.python.org/issue21430>`_
-        this usage of the ``pending()`` method because it's not
-        the right way of dealing with such use case. They advise
-        `this approach <https://docs.python.org/dev/library/ssl.html#notes-on-non-blocking-sockets>`_
-        instead. Unfortunately, this applies only if the
-        application can directly control the poller which is not
-        the case with the WebSocket abstraction here.
-
-        We therefore rely on this `technic <http://stackoverflow.com/questions/3187565/select-and-ssl-in-python>`_
-        which seems to be valid anyway.
-
-        This is a bit of a shame because we have to process
-        more data than what wanted initially.
-        """
-        data = b""
-        pending = self.sock.pending()
-        while pending:
-            data += self.sock.recv(pending)
-            pending = self.sock.pending()
-        return data
+        return self.buffered_amount
+
+    def _recv(self):
+        """
+        Reads whatever is available on the connection, up to
+        ``reading_buffer_size`` bytes, straight into the receive
+        buffer allocated once per connection and returns the
+        number of bytes read.
+
+        SSL sockets may have already read and decrypted more
+        data than was requested. That data is not on the wire
+        anymore so the manager's poller would not trigger again
+        for it. We therefore keep reading while the socket reports
+        `pending <https://docs.python.org/3/library/ssl.html#ssl.SSLSocket.pending>`_
+        bytes and there is room left in the buffer.
+        """
+        size = self.reading_buffer_size
+        if self._recv_buffer is None or len(self._recv_buffer) != size:
+            self._recv_buffer = bytearray(size)
+            self._recv_view = memoryview(self._recv_buffer)
+
+        view = self._recv_view
+        self._read_exhausted = False
+        received = self.sock.recv_into(view)
+        if self._is_secure:
+            while received and received < size and self.sock.pending():
+                received += self.sock.recv_into(view[received:])
+        elif received < size:
+            # a short read empties the socket's receive queue
+            self._read_exhausted = True
+        return received
 
     def once(self):
         """
         Performs the operation of reading from the underlying
         connection in order to feed the stream of bytes.
 
-        Because this needs to support SSL sockets, we must always
-        read as much as might be in the socket at any given time,
-        however process expects to have itself called with only a certain
-        number of bytes at a time. That number is found in
-        self.reading_buffer_size, so we read everything into our own buffer,
-        and then from there feed self.process.
-
-        Then the stream indicates
-        whatever size must be read from the connection since
-        it knows the frame payload length.
+        Up to ``reading_buffer_size`` bytes are read at once
+        with ``recv_into`` and every frame they hold is
+        processed before returning. Incomplete frames remain
+        buffered by the stream until more bytes come in.
 
         It returns `False` if an error occurred at the
         socket level or during the bytes processing. Otherwise,
@@ -401,31 +917,24 @@ class WebSocket(object):
             logger.debug("WebSocket is already terminated")
             return False
         try:
-            b = b''
-            if self._is_secure:
-                b = self._get_from_pending()
-            if not b and not self.buf:
-                b = self.sock.recv(self.reading_buffer_size)
-            if not b and not self.buf:
-                return False
-            self.buf += b
+            received = self._recv()
+        except WOULD_BLOCK_ERRORS:
+            self._read_exhausted = True
+            return True
         except (socket.error, OSError, pyOpenSSLError) as e:
-            if hasattr(e, "errno") and e.errno == errno.EINTR:
-                pass
-            else:
-                self.unhandled_error(e)
-                return False
-        else:
-            # process as much as we can
-            # the process will stop either if there is no buffer left
-            # or if the stream is closed
-            # only pass the requested number of bytes, leave the rest in the buffer
-            requested = self.reading_buffer_size
-            if not self.process(self.buf[:requested]):
-                return False
-            self.buf = self.buf[requested:]
+            if getattr(e, "errno", None) in WOULD_BLOCK_ERRNOS:
+                self._read_exhausted = True
+                return True
+            if getattr(e, "errno", None) == errno.EINTR:
+                return True
+            self.unhandled_error(e)
+            return False
 
-        return True
+        if not received:
+            return False
+
+        self.bytes_received += received
+        return self.process(self._recv_view[:received])
 
     def terminate(self):
         """
@@ -442,9 +951,9 @@ class WebSocket(object):
 
         try:
             if s.closing is None:
-                self.closed(1006, "Going away")
+                self._dispatch(self.closed, 1006, "Going away")
             else:
-                self.closed(s.closing.code, s.closing.reason)
+                self._dispatch(self.closed, s.closing.code, s.closing.reason)
         finally:
             self.client_terminated = self.server_terminated = True
             self.close_connection()
@@ -456,69 +965,120 @@ class WebSocket(object):
 
     def process(self, data):
         """ Takes some bytes and process them through the
-        internal stream's parser. If a message of any kind is
-        found, performs one of these actions:
+        internal stream's parser. The bytes may contain any number
+        of frames, even incomplete ones. For each event found,
+        performs one of these actions:
 
         * A closing message will initiate the closing handshake
         * Errors will initiate a closing handshake
         * A message will be passed to the ``received_message`` method
+        * A message fragment will be passed to the ``received_fragment``
+          method when :attr:`stream_fragments` is set
         * Pings will see pongs be sent automatically
         * Pongs will be passed to the ``ponged`` method
 
+        Those methods are run by the :attr:`dispatcher` when set.
+
         The process should be terminated when this method
         returns ``False``.
         """
         s = self.stream
 
-        if not data and self.reading_buffer_size > 0:
+        if not data:
             return False
 
-        self.reading_buffer_size = s.parser.send(data) or DEFAULT_READING_SIZE
-
-        if s.closing is not None:
-            logger.debug("Closing message received (%d): %s" % (s.closing.code, s.closing.reason.decode() if isinstance(s.closing.reason, bytes) else s.closing.reason))
-            if not self.server_terminated:
-                self.close(s.closing.code, s.closing.reason)
-            else:
-                self.client_terminated = True
-            return False
+        for event in s.feed(data):
+            if isinstance(event, MessageReceived):
+                if self.dispatcher is not None:
+                    self._dispatch_received(event.message.size,
+                                            self.received_message, event.message)
+                else:
+                    self.received_message(event.message)
+                    event.message.data = None
+
+            elif isinstance(event, FragmentReceived):
+                m = event.message
+                self._dispatch_received(len(m.data), self.received_fragment,
+                                        m.opcode, m.data, m.completed)
+
+            elif isinstance(event, PingReceived):
+                self._write(s.pong(event.message.data))
+
+            elif isinstance(event, PongReceived):
+                self._dispatch(self.ponged, event.message)
+
+            elif isinstance(event, CloseReceived):
+                closing = event.message
+                logger.debug("Closing message received (%d): %s" % (closing.code, closing.reason.decode() if isinstance(closing.reason, bytes) else closing.reason))
+                if not self.server_terminated:
+                    self.close(closing.code, closing.reason)
+                else:
+                    self.client_terminated = True
+                return False
 
-        if s.errors:
-            for error in s.errors:
+            elif isinstance(event, StreamError):
+                error = event.message
                 logger.debug("Error message received (%d): %s" % (error.code, error.reason.decode() if isinstance(error.reason, bytes) else error.reason))
                 self.close(error.code, error.reason)
-            s.errors = []
-            return False
+                return False
 
-        if s.has_message:
-            self.received_message(s.message)
-            if s.message is not None:
-                s.message.data = None
-                s.message = None
-            return True
+        return True
 
-        if s.pings:
-            for ping in s.pings:
-                self._write(s.pong(ping.data))
-            s.pings = []
+    def _inbound(self, size):
+        """
+        Accounts for ``size`` bytes of messages waiting for the
+        dispatcher, negative once they were handled, and pauses
+        or resumes reading according to :attr:`inbound_limits`.
+        """
+        with self._inbound_lock:
+            self.inbound_backlog += size
+            limits = self.inbound_limits
+            if limits is not None:
+                high, low = limits
+                if self.inbound_backlog > high:
+                    self.reading_paused = True
+                elif self.inbound_backlog <= low:
+                    self.reading_paused = False
+
+        manager = self.manager
+        if manager is not None:
+            manager.inbound(self, size)
+
+    def _dispatch_received(self, size, callback, *args):
+        """
+        Calls ``callback(*args)`` with ``size`` bytes of received
+        data. Through the :attr:`dispatcher`, those bytes count
+        in the :attr:`inbound_backlog` until the callback ran.
+        """
+        dispatcher = self.dispatcher
+        if dispatcher is None:
+            callback(*args)
+            return
 
-        if s.pongs:
-            for pong in s.pongs:
-                self.ponged(pong)
-            s.pongs = []
+        self._inbound(size)
+        dispatcher.submit(self, callback, *args)
+        # run once the data was handled
+        dispatcher.submit(self, self._inbound, -size)
 
-        return True
+    def _dispatch(self, callback, *args):
+        """
+        Calls ``callback(*args)`` through the :attr:`dispatcher`,
+        when there is one, or straight away.
+        """
+        dispatcher = self.dispatcher
+        if dispatcher is not None:
+            dispatcher.submit(self, callback, *args)
+        else:
+            callback(*args)
 
     def run(self):
         """
         Performs the operation of reading from the underlying
         connection in order to feed the stream of bytes.
 
-        We start with a small size of two bytes to be read
-        from the connection so that we can quickly parse an
-        incoming frame header. Then the stream indicates
-        whatever size must be read from the connection since
-        it knows the frame payload length.
+        Whatever is available on the connection, up to
+        ``reading_buffer_size`` bytes, is read and handed over
+        to the stream at once.
 
         Note that we perform some automatic opererations:
 